@@ -1,17 +1,27 @@
 from crewai import Agent
 from textwrap import dedent
 from agents.custom_llm import BedrockCustomLLM
+from agents.rate_limiter import BACKGROUND
 
 
 class CustomAgents:
-    def __init__(self):
+    def __init__(self, on_token=None, priority=BACKGROUND, task_id=None, cancel_token=None):
+        # on_token receives streamed tokens so partial output can be shown live;
+        # priority orders this crew's requests in the shared rate limiter;
+        # task_id attributes LLM usage metrics to the task;
+        # cancel_token stops the agents' loops and aborts their in-flight requests
+        self.cancel_token = cancel_token
         # Using our custom Bedrock LLM implementation that works with the proxy
         # Main model with higher token limit for complex tasks
         self.OpenAIGPT4 = BedrockCustomLLM(
             model_name="gpt-3.5-turbo",
             temperature=0.7,
             max_tokens=800,
-            request_timeout=60
+            request_timeout=60,
+            on_token=on_token,
+            priority=priority,
+            task_id=task_id,
+            cancel_token=cancel_token
         )
         
         # Secondary model with lower token limit for simpler tasks
@@ -19,10 +29,23 @@ class CustomAgents:
             model_name="gpt-3.5-turbo", 
             temperature=0.7,
             max_tokens=500,
-            request_timeout=60
+            request_timeout=60,
+            on_token=on_token,
+            priority=priority,
+            task_id=task_id,
+            cancel_token=cancel_token
         )
         #self.Ollama = ChatOpenAI(model_name="devainllama3", base_url="http://localhost:11434/v1")
     
+    def _for_agent(self, llm, agent_name):
+        # Per-agent copy of a shared model so metrics are broken down by agent
+        return llm.model_copy(update={"agent_name": agent_name})
+    
+    def _step_callback(self, step):
+        # Checked after every agent step so a cancelled crew stops between tool calls
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+    
     def project_manager_agent(self, tools):
         return Agent(
             role="Project Manager",
@@ -36,7 +59,8 @@ class CustomAgents:
             tools=tools,
             allow_delegation=False,
             verbose=True,
-            llm=self.OpenAIGPT4,
+            step_callback=self._step_callback,
+            llm=self._for_agent(self.OpenAIGPT4, "project_manager"),
         )
         
     def architect_agent(self, tools):
@@ -51,7 +75,8 @@ class CustomAgents:
             tools=tools,
             allow_delegation=False,
             verbose=True,
-            llm=self.OpenAIGPT4,
+            step_callback=self._step_callback,
+            llm=self._for_agent(self.OpenAIGPT4, "architect"),
         )
 
     def programmer_agent(self, tools):
@@ -64,7 +89,8 @@ class CustomAgents:
             tools=tools,
             allow_delegation=False,
             verbose=True,
-            llm=self.OpenAIGPT4,
+            step_callback=self._step_callback,
+            llm=self._for_agent(self.OpenAIGPT4, "programmer"),
         )
     
     def security_agent(self, tools):
@@ -79,7 +105,8 @@ class CustomAgents:
             tools=tools,
             allow_delegation=False,
             verbose=True,
-            llm=self.OpenAIGPT35,  # Using the smaller model for security agent
+            step_callback=self._step_callback,
+            llm=self._for_agent(self.OpenAIGPT35, "security"),  # Using the smaller model for security agent
         )
 
     def tester_agent(self, tools):
@@ -93,7 +120,8 @@ class CustomAgents:
             tools=tools,
             allow_delegation=False,
             verbose=True,
-            llm=self.OpenAIGPT35,  # Using the smaller model for tester agent
+            step_callback=self._step_callback,
+            llm=self._for_agent(self.OpenAIGPT35, "tester"),  # Using the smaller model for tester agent
         )
 
     def reviewer_agent(self, tools):
@@ -106,5 +134,6 @@ class CustomAgents:
             tools=tools,            
             allow_delegation=False,
             verbose=True,
-            llm=self.OpenAIGPT35,  # Using the smaller model for reviewer agent
+            step_callback=self._step_callback,
+            llm=self._for_agent(self.OpenAIGPT35, "reviewer"),  # Using the smaller model for reviewer agent
         )
@@ -0,0 +1,155 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+
+class OperationCancelled(BaseException):
+    """Raised inside a stage once its cancellation token has fired
+
+    A BaseException, like asyncio.CancelledError, so the `except Exception`
+    retry and error-reporting loops in CrewAI, LangChain and the tools let it
+    through instead of feeding it back to the agent.
+    """
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cooperative cancellation for one stage run, shared with its LLM calls and tools
+
+    Thread-safe: cancel() is called from the event loop while the stage runs
+    on a worker. Work checks the token between steps; callbacks registered
+    with on_cancel() abort what is blocking right now, such as an LLM request.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[str], None]] = []
+        self.reason: Optional[str] = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Fire the token; False if it had already fired"""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(reason)
+            except Exception as e:
+                print(f"Cancellation callback failed: {str(e)}")
+        return True
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise OperationCancelled(self.reason)
+
+    def sleep(self, seconds: float) -> None:
+        """time.sleep that wakes up and raises as soon as the token fires"""
+        if self._event.wait(seconds):
+            raise OperationCancelled(self.reason)
+
+    def on_cancel(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call `callback(reason)` when the token fires (now, if it has); returns an unregister function"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback(self.reason)
+        return lambda: None
+
+    def _remove(self, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+# Token of the stage running on this thread, for code that is not handed one (tools)
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current_token.get()
+
+
+def check_cancelled() -> None:
+    """Raise OperationCancelled if the current stage has been cancelled"""
+    token = _current_token.get()
+    if token is not None:
+        token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds: float) -> None:
+    """Sleep that is cut short when the current stage is cancelled"""
+    token = _current_token.get()
+    if token is None:
+        time.sleep(seconds)
+    else:
+        token.sleep(seconds)
+
+
+@contextmanager
+def cancel_scope(token: Optional[CancellationToken]) -> Iterator[Optional[CancellationToken]]:
+    """Make `token` the current token for the body of the `with` block"""
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+
+
+def run_cancellable(token: CancellationToken, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Call `fn` with `token` as the current token; meant to be the job handed to a worker"""
+    with cancel_scope(token):
+        token.raise_if_cancelled()
+        return fn(*args, **kwargs)
+
+
+class CancellationRegistry:
+    """Tokens of the runs in progress, so a run can be cancelled from elsewhere by key"""
+
+    def __init__(self):
+        self._tokens: Dict[Hashable, CancellationToken] = {}
+        self._lock = threading.Lock()
+        self.cancelled = 0
+
+    def open(self, key: Hashable, token: Optional[CancellationToken] = None) -> CancellationToken:
+        """Token for a new run under `key` (or register `token`); a run still registered there is cancelled first"""
+        if token is None:
+            token = CancellationToken()
+        with self._lock:
+            previous = self._tokens.get(key)
+            self._tokens[key] = token
+        if previous is not None and previous.cancel("superseded"):
+            self.cancelled += 1
+        return token
+
+    def close(self, key: Hashable, token: CancellationToken) -> None:
+        """Forget `token` once its run has stopped"""
+        with self._lock:
+            if self._tokens.get(key) is token:
+                del self._tokens[key]
+
+    def cancel(self, match: Callable[[Hashable], bool], reason: str = "cancelled") -> int:
+        """Cancel every registered run whose key matches; returns how many were cancelled"""
+        with self._lock:
+            tokens = [token for key, token in self._tokens.items() if match(key)]
+        count = sum(1 for token in tokens if token.cancel(reason))
+        self.cancelled += count
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            running = len(self._tokens)
+        return {"running": running, "cancelled": self.cancelled}
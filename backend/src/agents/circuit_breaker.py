@@ -0,0 +1,116 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from decouple import config
+from agents.llm_errors import LLMCircuitOpenError
+
+# Circuit breaker settings for the LLM proxy
+LLM_BREAKER_FAILURE_THRESHOLD = config("LLM_BREAKER_FAILURE_THRESHOLD", default=5, cast=int)
+LLM_BREAKER_RECOVERY_TIMEOUT = config("LLM_BREAKER_RECOVERY_TIMEOUT", default=30.0, cast=float)
+LLM_BREAKER_HALF_OPEN_CALLS = config("LLM_BREAKER_HALF_OPEN_CALLS", default=1, cast=int)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed -> open after consecutive failures, half-open probes after a cool-down
+
+    Calls go through guard(), which hands a half-open probe slot back however
+    the call ends, including cancellation; a half-open period whose probes
+    never report back is re-armed after `recovery_timeout`.
+    """
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_FAILURE_THRESHOLD,
+                 recovery_timeout: float = LLM_BREAKER_RECOVERY_TIMEOUT,
+                 half_open_calls: int = LLM_BREAKER_HALF_OPEN_CALLS):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._half_opened_at = 0.0
+        self._probes = 0
+        # Bumped on every half-open period so a late probe cannot free a newer period's slot
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def _half_open(self) -> None:
+        # Caller holds the lock
+        self.state = HALF_OPEN
+        self._half_opened_at = time.monotonic()
+        self._probes = 0
+        self._epoch += 1
+
+    def before_call(self) -> Optional[int]:
+        """Raise LLMCircuitOpenError unless a call may go through right now
+
+        Returns a probe handle for release() when the call is a half-open probe, else None.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.recovery_timeout - time.monotonic()
+                if remaining > 0:
+                    self.rejected += 1
+                    raise LLMCircuitOpenError(remaining)
+                self._half_open()
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    remaining = self._half_opened_at + self.recovery_timeout - time.monotonic()
+                    if remaining > 0:
+                        self.rejected += 1
+                        raise LLMCircuitOpenError(remaining)
+                    # The probes never reported back; let new ones through
+                    self._half_open()
+                self._probes += 1
+                return self._epoch
+            return None
+
+    def release(self, probe: Optional[int]) -> None:
+        """Give back a probe slot taken by before_call()"""
+        if probe is None:
+            return
+        with self._lock:
+            if self.state == HALF_OPEN and probe == self._epoch and self._probes > 0:
+                self._probes -= 1
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        """before_call() for the body of a `with` block, releasing any probe slot on every exit path"""
+        probe = self.before_call()
+        try:
+            yield
+        finally:
+            self.release(probe)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                print("LLM circuit breaker closed, backend healthy again")
+            self.state = CLOSED
+            self.failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    print(f"LLM circuit breaker opened after {self.failures} failures")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+
+# Shared by every BedrockCustomLLM instance in the process
+circuit_breaker = CircuitBreaker()
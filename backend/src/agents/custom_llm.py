@@ -1,9 +1,26 @@
 import os
-from typing import Any, List, Mapping, Optional, Dict
-import requests
+import json
+import time
+import asyncio
+from concurrent.futures import CancelledError as FutureCancelledError
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional
+import httpx
 from langchain_core.language_models.llms import LLM
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
+from langchain_core.outputs import GenerationChunk
 from decouple import config
+from agents.http_client import get_http_client, get_async_http_client, request_timeout, run_on_io_loop
+from agents.cancellation import CancellationToken, OperationCancelled, current_token
+from agents.step_journal import current_run
+from agents.circuit_breaker import circuit_breaker
+from agents.llm_errors import LLMError, LLMResponseError, status_error, transport_error
+from agents.llm_cache import response_cache, make_cache_key, is_cacheable
+from agents.semantic_cache import semantic_cache
+from agents.hedging import hedged_call, ahedged_call, stream_hedge_policy, LLM_HEDGE_ENABLED
+from agents.rate_limiter import rate_limiter, is_retryable_status, parse_retry_after, LLM_MAX_RETRIES, BACKGROUND
+from agents.llm_metrics import LLMCallRecord, llm_metrics, estimate_tokens
+from agents.llm_cassette import llm_cassette, split_chunks, LLM_REPLAY_TTFB_SHARE
 
 class BedrockCustomLLM(LLM):
     """Custom LLM implementation for Amazon Bedrock proxy"""
@@ -13,30 +30,28 @@ class BedrockCustomLLM(LLM):
     temperature: float = 0.7
     max_tokens: int = 500
     request_timeout: int = 60
+    # Stream completions over SSE; always on when an on_token sink is attached
+    streaming: bool = config("LLM_STREAMING", default=False, cast=bool)
+    on_token: Optional[Callable[[str], None]] = None
+    # Rate limiter priority: INTERACTIVE for user-driven revisions, BACKGROUND otherwise
+    priority: str = BACKGROUND
+    # Race a duplicate request (or stream open) when a call runs into the latency tail
+    hedge: bool = LLM_HEDGE_ENABLED
+    # Serve near-duplicate prompts from the semantic cache. Only for top-level problem
+    # prompts: agent loop steps share so much scaffold that unrelated steps look alike
+    semantic_cacheable: bool = False
+    # Attribution for per-call metrics and per-task usage totals
+    task_id: Optional[str] = None
+    agent_name: Optional[str] = None
+    # Stage cancellation; falls back to the token of the stage running on the calling thread
+    cancel_token: Optional[CancellationToken] = None
     
     @property
     def _llm_type(self) -> str:
         return "bedrock-custom"
     
-    def _call(
-        self,
-        prompt: str,
-        stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
-        **kwargs: Any,
-    ) -> str:
-        """Call the Bedrock API with error handling and retries"""
-        
-        # Important: Based on test_auth.py results, we should use ANTHROPIC_API_KEY
-        # which works with the proxy, instead of OPENAI_API_KEY which fails
-        api_key = config("ANTHROPIC_API_KEY")
-        endpoint = f"{self.base_url}/chat/completions"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}"
-        }
-        
+    def _build_request(self, prompt: str, stop: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Build the OpenAI-compatible chat completion payload"""
         messages = [
             {"role": "system", "content": "You are a helpful assistant."},
             {"role": "user", "content": prompt}
@@ -51,37 +66,580 @@ class BedrockCustomLLM(LLM):
         
         if stop is not None:
             data["stop"] = stop
-            
+        return data
+    
+    @staticmethod
+    def _parse_stream_line(line: str) -> Optional[str]:
+        """Return the text delta carried by one SSE line, if any"""
+        line = line.strip()
+        if not line.startswith("data:"):
+            return None
+        payload = line[len("data:"):].strip()
+        if not payload or payload == "[DONE]":
+            return None
+        chunk = json.loads(payload)
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content")
+    
+    def _parse_response(self, result: Dict[str, Any]) -> str:
+        """Extract the completion text from a chat completion response"""
+        if "choices" in result and len(result["choices"]) > 0:
+            content = result["choices"][0]["message"]["content"]
+            print(f"API response success: received {len(content)} chars")
+            return content
+        else:
+            raise LLMResponseError(f"Unexpected response structure: {result}")
+    
+    def _cache_key(self, prompt: str, stop: Optional[List[str]]) -> Optional[str]:
+        """Cache key for this request, or None when the response must not be cached"""
+        if response_cache is None or not response_cache.is_cacheable(self.temperature):
+            return None
+        return make_cache_key(self.model_name, self.temperature, self.max_tokens, stop, prompt)
+    
+    def _cache_namespace(self, stop: Optional[List[str]]):
+        """Semantic cache partition: answers are only shared between identical settings"""
+        return (self.model_name, self.temperature, self.max_tokens, tuple(stop or ()))
+    
+    def _semantic_cacheable(self) -> bool:
+        return semantic_cache is not None and self.semantic_cacheable and is_cacheable(self.temperature)
+    
+    def _cache_get(self, cache_key: Optional[str], prompt: str, stop: Optional[List[str]]) -> Optional[str]:
+        cached = response_cache.get(cache_key) if cache_key is not None else None
+        if cached is None and self._semantic_cacheable():
+            cached = semantic_cache.get(self._cache_namespace(stop), prompt)
+            if cached is not None:
+                print("LLM semantic cache hit for a near-duplicate prompt")
+        if cached is not None:
+            print(f"LLM cache hit: returning {len(cached)} cached chars")
+            self._emit(cached)
+            self._flush_tokens()
+        return cached
+    
+    def _cache_put(self, cache_key: Optional[str], prompt: str, stop: Optional[List[str]], content: str) -> None:
+        if cache_key is not None:
+            response_cache.put(cache_key, content)
+        if self._semantic_cacheable():
+            semantic_cache.put(self._cache_namespace(stop), prompt, content)
+    
+    def _call(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Call the Bedrock API, or replay the call from the stage journal when resuming a stage"""
+        journal = current_run()
+        if journal is None:
+            return self._complete(prompt, stop, run_manager, **kwargs)
+        key = self._cassette_key(prompt, stop)
+        content = journal.replay("llm", key)
+        if content is not None:
+            self._replayed(content)
+            return content
+        content = self._complete(prompt, stop, run_manager, **kwargs)
+        journal.record("llm", key, content)
+        return content
+    
+    def _emit(self, token: str) -> None:
+        if self.on_token is not None:
+            self.on_token(token)
+    
+    def _flush_tokens(self) -> None:
+        """Push out what a batching on_token sink still holds once a call has finished"""
+        flush = getattr(self.on_token, "flush", None)
+        if flush is not None:
+            flush()
+    
+    def _replayed(self, content: str) -> None:
+        """Account for a completion served from the stage journal like a cache hit"""
+        record = LLMCallRecord(self.task_id, self.agent_name, self.model_name)
+        record.cached = True
+        record.finish()
+        llm_metrics.record(record)
+        self._emit(content)
+        self._flush_tokens()
+    
+    def _complete(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Call the Bedrock API with caching, retries and fail-fast typed errors"""
+        token = self.cancel_token or current_token()
+        if token is not None:
+            return self._call_cancellable(token, prompt, stop, **kwargs)
+        record = LLMCallRecord(self.task_id, self.agent_name, self.model_name)
         try:
-            print(f"Making API request to {endpoint} with {self.model_name}")
+            cache_key = self._cache_key(prompt, stop)
+            cached = self._cache_get(cache_key, prompt, stop)
+            if cached is not None:
+                record.cached = True
+                # Keep the cassette complete even when a cache answered the call
+                self._record_cassette(prompt, stop, cached)
+                return cached
             
-            response = requests.post(
-                endpoint, 
-                headers=headers, 
-                json=data,
-                timeout=self.request_timeout
-            )
+            try:
+                content = self._request(prompt, stop, run_manager, record=record, **kwargs)
+            except LLMError as e:
+                # Raise instead of returning error text that agents would treat as content
+                print(f"Bedrock API error: {str(e)}")
+                record.error = type(e).__name__
+                raise
+            except (ValueError, KeyError) as e:
+                print(f"Bedrock API error: {str(e)}")
+                record.error = "LLMResponseError"
+                raise LLMResponseError(f"Malformed response from Bedrock API: {str(e)}") from e
             
-            # Print status code to help with debugging
-            print(f"API response status code: {response.status_code}")
+            self._fill_token_counts(record, prompt, content)
+            self._cache_put(cache_key, prompt, stop, content)
+            return content
+        finally:
+            record.finish()
+            llm_metrics.record(record)
+    
+    def _call_cancellable(self, token: CancellationToken, prompt: str, stop: Optional[List[str]], **kwargs: Any) -> str:
+        """Run _acall on the shared I/O loop so cancelling the token aborts the request mid-flight
+
+        The calling thread only waits for the result; on cancellation it is
+        released at once and the request is torn down on the loop, whether it
+        is queued in the rate limiter, waiting for headers or streaming.
+        """
+        token.raise_if_cancelled()
+        future = run_on_io_loop(self._acall(prompt, stop, None, **kwargs))
+        unregister = token.on_cancel(lambda reason: future.cancel())
+        try:
+            return future.result()
+        except FutureCancelledError:
+            raise OperationCancelled(token.reason or "aborted") from None
+        finally:
+            unregister()
+    
+    async def _acall(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Non-blocking variant of _call used by ainvoke/agenerate"""
+        record = LLMCallRecord(self.task_id, self.agent_name, self.model_name)
+        try:
+            cache_key = self._cache_key(prompt, stop)
+            cached = self._cache_get(cache_key, prompt, stop)
+            if cached is not None:
+                record.cached = True
+                # Keep the cassette complete even when a cache answered the call
+                self._record_cassette(prompt, stop, cached)
+                return cached
             
-            response.raise_for_status()
+            try:
+                content = await self._arequest(prompt, stop, run_manager, record=record, **kwargs)
+            except asyncio.CancelledError:
+                record.error = "Cancelled"
+                raise
+            except LLMError as e:
+                print(f"Bedrock API error: {str(e)}")
+                record.error = type(e).__name__
+                raise
+            except (ValueError, KeyError) as e:
+                print(f"Bedrock API error: {str(e)}")
+                record.error = "LLMResponseError"
+                raise LLMResponseError(f"Malformed response from Bedrock API: {str(e)}") from e
             
-            result = response.json()
-            if "choices" in result and len(result["choices"]) > 0:
-                content = result["choices"][0]["message"]["content"]
-                print(f"API response success: received {len(content)} chars")
-                return content
-            else:
-                error_msg = f"Error: Unexpected response structure: {result}"
-                print(error_msg)
-                return error_msg
-                
-        except Exception as e:
-            # Log the error for debugging
-            print(f"Bedrock API error: {str(e)}")
-            # Return a graceful error message
-            return f"Error: Failed to get response from Bedrock API: {str(e)}"
+            self._fill_token_counts(record, prompt, content)
+            self._cache_put(cache_key, prompt, stop, content)
+            return content
+        finally:
+            record.finish()
+            llm_metrics.record(record)
+    
+    @staticmethod
+    def _record_usage(record: Optional[LLMCallRecord], result: Dict[str, Any]) -> None:
+        """Copy the proxy's reported token usage onto the call record"""
+        usage = result.get("usage") or {}
+        if record is not None and usage:
+            record.prompt_tokens = usage.get("prompt_tokens")
+            record.completion_tokens = usage.get("completion_tokens")
+    
+    @staticmethod
+    def _fill_token_counts(record: LLMCallRecord, prompt: str, content: str) -> None:
+        """Estimate token counts the proxy did not report (e.g. for streamed calls)"""
+        if record.prompt_tokens is None:
+            record.prompt_tokens = estimate_tokens(prompt)
+            record.tokens_estimated = True
+        if record.completion_tokens is None:
+            record.completion_tokens = estimate_tokens(content)
+            record.tokens_estimated = True
+    
+    def _after_response(self, response: httpx.Response, attempt: int, record: Optional[LLMCallRecord] = None) -> bool:
+        """Record one attempt's outcome; True to retry, raises a typed error on failure"""
+        # Print status code to help with debugging
+        print(f"API response status code: {response.status_code}")
+        if record is not None:
+            record.request_bytes += len(response.request.content)
+        rate_limiter.record(response.status_code, parse_retry_after(response.headers.get("Retry-After")))
+        if response.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        
+        if is_retryable_status(response.status_code) and attempt < LLM_MAX_RETRIES:
+            print(f"Proxy returned {response.status_code}, retrying ({attempt + 1}/{LLM_MAX_RETRIES})")
+            return True
+        if response.is_error:
+            raise status_error(response)
+        return False
+    
+    def _post(self, data: Dict[str, Any], record: Optional[LLMCallRecord] = None) -> httpx.Response:
+        """POST a completion through the circuit breaker and rate limiter, retrying 429/5xx"""
+        # The shared client already carries the ANTHROPIC_API_KEY auth header, which
+        # (per test_auth.py) works with the proxy where OPENAI_API_KEY fails
+        endpoint = f"{self.base_url}/chat/completions"
+        
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            # The breaker is consulted once a slot is held, so a wait that is given up takes no probe
+            waited = rate_limiter.acquire(self.priority)
+            try:
+                with circuit_breaker.guard():
+                    if record is not None:
+                        record.queue_wait += waited
+                        record.start_attempt()
+                    try:
+                        print(f"Making API request to {endpoint} with {self.model_name}")
+                        # Reuse pooled keep-alive connections instead of a fresh handshake per turn
+                        response = get_http_client().post(
+                            endpoint,
+                            json=data,
+                            timeout=request_timeout(self.request_timeout),
+                            extensions={"trace": record.trace} if record is not None else None
+                        )
+                    except httpx.HTTPError as e:
+                        circuit_breaker.record_failure()
+                        raise transport_error(e) from e
+                    
+                    if record is not None:
+                        record.response_bytes += response.num_bytes_downloaded
+                    if not self._after_response(response, attempt, record):
+                        return response
+            finally:
+                rate_limiter.release()
+    
+    async def _apost(self, data: Dict[str, Any], record: Optional[LLMCallRecord] = None) -> httpx.Response:
+        """Async variant of _post"""
+        endpoint = f"{self.base_url}/chat/completions"
+        
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = await rate_limiter.aacquire(self.priority)
+            try:
+                with circuit_breaker.guard():
+                    if record is not None:
+                        record.queue_wait += waited
+                        record.start_attempt()
+                    try:
+                        print(f"Making async API request to {endpoint} with {self.model_name}")
+                        response = await get_async_http_client().post(
+                            endpoint,
+                            json=data,
+                            timeout=request_timeout(self.request_timeout),
+                            extensions={"trace": record.atrace} if record is not None else None
+                        )
+                    except httpx.HTTPError as e:
+                        circuit_breaker.record_failure()
+                        raise transport_error(e) from e
+                    
+                    if record is not None:
+                        record.response_bytes += response.num_bytes_downloaded
+                    if not self._after_response(response, attempt, record):
+                        return response
+            finally:
+                rate_limiter.release()
+    
+    @contextmanager
+    def _open_stream(self, data: Dict[str, Any], record: Optional[LLMCallRecord] = None) -> Iterator[httpx.Response]:
+        """Open a streaming completion, holding a rate limiter slot while it is read"""
+        endpoint = f"{self.base_url}/chat/completions"
+        
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = rate_limiter.acquire(self.priority)
+            try:
+                with circuit_breaker.guard():
+                    if record is not None:
+                        record.queue_wait += waited
+                        record.start_attempt()
+                    try:
+                        print(f"Making streaming API request to {endpoint} with {self.model_name}")
+                        with get_http_client().stream(
+                            "POST", endpoint, json=data, timeout=request_timeout(self.request_timeout),
+                            extensions={"trace": record.trace} if record is not None else None
+                        ) as response:
+                            try:
+                                if self._after_response(response, attempt, record):
+                                    continue
+                                yield response
+                                return
+                            finally:
+                                if record is not None:
+                                    record.response_bytes += response.num_bytes_downloaded
+                    except httpx.HTTPError as e:
+                        circuit_breaker.record_failure()
+                        raise transport_error(e) from e
+            finally:
+                rate_limiter.release()
+    
+    @asynccontextmanager
+    async def _aopen_stream(self, data: Dict[str, Any], record: Optional[LLMCallRecord] = None) -> AsyncIterator[httpx.Response]:
+        """Async variant of _open_stream"""
+        endpoint = f"{self.base_url}/chat/completions"
+        
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            waited = await rate_limiter.aacquire(self.priority)
+            try:
+                with circuit_breaker.guard():
+                    if record is not None:
+                        record.queue_wait += waited
+                        record.start_attempt()
+                    try:
+                        print(f"Making async streaming API request to {endpoint} with {self.model_name}")
+                        async with get_async_http_client().stream(
+                            "POST", endpoint, json=data, timeout=request_timeout(self.request_timeout),
+                            extensions={"trace": record.atrace} if record is not None else None
+                        ) as response:
+                            try:
+                                if self._after_response(response, attempt, record):
+                                    continue
+                                yield response
+                                return
+                            finally:
+                                if record is not None:
+                                    record.response_bytes += response.num_bytes_downloaded
+                    except httpx.HTTPError as e:
+                        circuit_breaker.record_failure()
+                        raise transport_error(e) from e
+            finally:
+                rate_limiter.release()
+    
+    @contextmanager
+    def _open_hedged_stream(self, data: Dict[str, Any], record: Optional[LLMCallRecord] = None) -> Iterator[httpx.Response]:
+        """_open_stream, hedged on time to first byte when hedging is on
+
+        Attempts race to their response headers and the slower one is closed. Each
+        attempt has its own record; the winner's is merged into `record` once read.
+        """
+        if not self.hedge:
+            with self._open_stream(data, record) as response:
+                yield response
+            return
+        
+        def attempt():
+            attempt_record = record.fork() if record is not None else None
+            stack = ExitStack()
+            return stack.enter_context(self._open_stream(data, attempt_record)), stack, attempt_record
+        
+        response, stack, attempt_record = hedged_call(
+            attempt, stream_hedge_policy, discard=lambda opened: opened[1].close()
+        )
+        try:
+            with stack:
+                yield response
+        finally:
+            if record is not None:
+                record.merge(attempt_record)
+    
+    @asynccontextmanager
+    async def _aopen_hedged_stream(self, data: Dict[str, Any], record: Optional[LLMCallRecord] = None) -> AsyncIterator[httpx.Response]:
+        """Async variant of _open_hedged_stream"""
+        if not self.hedge:
+            async with self._aopen_stream(data, record) as response:
+                yield response
+            return
+        
+        async def attempt():
+            attempt_record = record.fork() if record is not None else None
+            stack = AsyncExitStack()
+            return await stack.enter_async_context(self._aopen_stream(data, attempt_record)), stack, attempt_record
+        
+        response, stack, attempt_record = await ahedged_call(
+            attempt, stream_hedge_policy, discard=lambda opened: opened[1].aclose()
+        )
+        try:
+            async with stack:
+                yield response
+        finally:
+            if record is not None:
+                record.merge(attempt_record)
+    
+    def _cassette_key(self, prompt: str, stop: Optional[List[str]]) -> str:
+        return make_cache_key(self.model_name, self.temperature, self.max_tokens, stop, prompt)
+    
+    def _record_cassette(self, prompt: str, stop: Optional[List[str]], content: str) -> None:
+        """In record mode, append a completed call to the cassette"""
+        if llm_cassette is not None and not llm_cassette.replaying:
+            llm_cassette.record(self._cassette_key(prompt, stop), self.model_name, prompt, content)
+    
+    def _request(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        record: Optional[LLMCallRecord] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Send one completion request to the proxy (or the cassette); raises on failure"""
+        if self.streaming or self.on_token is not None:
+            return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, record=record, **kwargs))
+        
+        if llm_cassette is not None and llm_cassette.replaying:
+            content = llm_cassette.play(self._cassette_key(prompt, stop))
+            time.sleep(llm_cassette.latency.sample())
+            return content
+        
+        data = self._build_request(prompt, stop)
+        if self.hedge:
+            # Each attempt times itself; only the one that answers counts for the call
+            def attempt():
+                attempt_record = record.fork() if record is not None else None
+                return self._post(data, attempt_record), attempt_record
+            response, attempt_record = hedged_call(attempt)
+            if record is not None:
+                record.merge(attempt_record)
+        else:
+            response = self._post(data, record)
+        result = response.json()
+        self._record_usage(record, result)
+        content = self._parse_response(result)
+        self._record_cassette(prompt, stop, content)
+        return content
+    
+    async def _arequest(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        record: Optional[LLMCallRecord] = None,
+        **kwargs: Any,
+    ) -> str:
+        """Async variant of _request"""
+        if self.streaming or self.on_token is not None:
+            chunks = [chunk.text async for chunk in self._astream(prompt, stop, run_manager, record=record, **kwargs)]
+            return "".join(chunks)
+        
+        if llm_cassette is not None and llm_cassette.replaying:
+            content = llm_cassette.play(self._cassette_key(prompt, stop))
+            await asyncio.sleep(llm_cassette.latency.sample())
+            return content
+        
+        data = self._build_request(prompt, stop)
+        if self.hedge:
+            async def attempt():
+                attempt_record = record.fork() if record is not None else None
+                return await self._apost(data, attempt_record), attempt_record
+            response, attempt_record = await ahedged_call(attempt)
+            if record is not None:
+                record.merge(attempt_record)
+        else:
+            response = await self._apost(data, record)
+        result = response.json()
+        self._record_usage(record, result)
+        content = self._parse_response(result)
+        self._record_cassette(prompt, stop, content)
+        return content
+    
+    def _sse_tokens(self, prompt: str, stop: Optional[List[str]], record: Optional[LLMCallRecord]) -> Iterator[str]:
+        """Text deltas from the proxy's SSE endpoint"""
+        data = self._build_request(prompt, stop)
+        data["stream"] = True
+        
+        with self._open_hedged_stream(data, record) as response:
+            for line in response.iter_lines():
+                token = self._parse_stream_line(line)
+                if token:
+                    yield token
+    
+    async def _asse_tokens(self, prompt: str, stop: Optional[List[str]], record: Optional[LLMCallRecord]) -> AsyncIterator[str]:
+        """Async variant of _sse_tokens"""
+        data = self._build_request(prompt, stop)
+        data["stream"] = True
+        
+        async with self._aopen_hedged_stream(data, record) as response:
+            async for line in response.aiter_lines():
+                token = self._parse_stream_line(line)
+                if token:
+                    yield token
+    
+    def _replay_tokens(self, prompt: str, stop: Optional[List[str]]) -> Iterator[str]:
+        """Recorded completion split into chunks, paced by the synthetic latency model"""
+        chunks = split_chunks(llm_cassette.play(self._cassette_key(prompt, stop)))
+        latency = llm_cassette.latency.sample()
+        time.sleep(latency * LLM_REPLAY_TTFB_SHARE)
+        gap = latency * (1 - LLM_REPLAY_TTFB_SHARE) / len(chunks)
+        for chunk in chunks:
+            yield chunk
+            time.sleep(gap)
+    
+    async def _areplay_tokens(self, prompt: str, stop: Optional[List[str]]) -> AsyncIterator[str]:
+        """Async variant of _replay_tokens"""
+        chunks = split_chunks(llm_cassette.play(self._cassette_key(prompt, stop)))
+        latency = llm_cassette.latency.sample()
+        await asyncio.sleep(latency * LLM_REPLAY_TTFB_SHARE)
+        gap = latency * (1 - LLM_REPLAY_TTFB_SHARE) / len(chunks)
+        for chunk in chunks:
+            yield chunk
+            await asyncio.sleep(gap)
+    
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        record: Optional[LLMCallRecord] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """Stream the completion token by token from the proxy's SSE endpoint (or the cassette)"""
+        if llm_cassette is not None and llm_cassette.replaying:
+            tokens = self._replay_tokens(prompt, stop)
+        else:
+            tokens = self._sse_tokens(prompt, stop, record)
+        
+        received = []
+        for token in tokens:
+            received.append(token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            self._emit(token)
+            yield chunk
+        self._flush_tokens()
+        self._record_cassette(prompt, stop, "".join(received))
+    
+    async def _astream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        record: Optional[LLMCallRecord] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[GenerationChunk]:
+        """Async variant of _stream"""
+        if llm_cassette is not None and llm_cassette.replaying:
+            tokens = self._areplay_tokens(prompt, stop)
+        else:
+            tokens = self._asse_tokens(prompt, stop, record)
+        
+        received = []
+        async for token in tokens:
+            received.append(token)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            self._emit(token)
+            yield chunk
+        self._flush_tokens()
+        self._record_cassette(prompt, stop, "".join(received))
 
 # Example usage
 if __name__ == "__main__":
@@ -4,6 +4,8 @@ import warnings
 from typing import List, Dict, Any
 from decouple import config
 from agents.custom_llm import BedrockCustomLLM  # Make sure this returns a *string* from .invoke()
+from agents.semantic_cache import semantic_cache
+from agents.llm_cache import is_cacheable
 
 warnings.filterwarnings("ignore")
 
@@ -28,6 +30,7 @@ class DSPyLLM(dspy.LM):
             request_timeout=60,
             api_key=api_key,
             base_url=base_url,
+            agent_name="project_manager",  # DSPy only drives the project manager stage
         )
 
     # --------------------------------------------------------------
@@ -153,5 +156,17 @@ def process_with_dspy(user_input: str) -> str:
     if not user_input:
         raise ValueError("User input cannot be empty")
 
+    # Paraphrased problems can reuse an earlier specification, if sampled answers may be reused at all
+    cacheable = semantic_cache is not None and is_cacheable(dspy.settings.lm.llm.temperature)
+    if cacheable:
+        cached = semantic_cache.get("dspy_project_spec", user_input)
+        if cached is not None:
+            print("[process_with_dspy] Semantic cache hit, reusing project specification")
+            return cached
+
     spec = ProjectManagerModule()(user_input)
-    return format_dspy_output_as_markdown(spec)
+    markdown = format_dspy_output_as_markdown(spec)
+
+    if cacheable:
+        semantic_cache.put("dspy_project_spec", user_input, markdown)
+    return markdown
@@ -0,0 +1,178 @@
+import asyncio
+import inspect
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Optional
+from decouple import config
+
+# Hedged requests: fire one duplicate when a call is slower than recent latency suggests
+LLM_HEDGE_ENABLED = config("LLM_HEDGE_ENABLED", default=False, cast=bool)
+LLM_HEDGE_PERCENTILE = config("LLM_HEDGE_PERCENTILE", default=95.0, cast=float)
+LLM_HEDGE_BUDGET = config("LLM_HEDGE_BUDGET", default=0.05, cast=float)  # max share of requests hedged
+LLM_HEDGE_MIN_SAMPLES = config("LLM_HEDGE_MIN_SAMPLES", default=20, cast=int)
+LLM_HEDGE_WINDOW = config("LLM_HEDGE_WINDOW", default=200, cast=int)
+LLM_HEDGE_WORKERS = config("LLM_HEDGE_WORKERS", default=16, cast=int)
+
+
+class HedgePolicy:
+    """Tracks recent latencies and decides when and how often to hedge"""
+
+    def __init__(self, percentile: float = LLM_HEDGE_PERCENTILE, budget: float = LLM_HEDGE_BUDGET,
+                 min_samples: int = LLM_HEDGE_MIN_SAMPLES, window: int = LLM_HEDGE_WINDOW):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self.hedge_wins += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Latency percentile after which to hedge, or None without enough history"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return ordered[index]
+
+    def try_hedge(self) -> bool:
+        """Reserve a hedge if that keeps hedges within the budget share of requests"""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        with self._lock:
+            return {
+                "enabled": LLM_HEDGE_ENABLED,
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+                "hedge_delay": delay,
+            }
+
+
+# Whole-response latencies of plain requests, and time to first byte of streamed ones
+hedge_policy = HedgePolicy()
+stream_hedge_policy = HedgePolicy()
+_hedge_executor = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
+
+def hedge_stats() -> Dict[str, Any]:
+    return {**hedge_policy.stats(), "stream_open": stream_hedge_policy.stats()}
+
+
+def _settle_loser(discard: Optional[Callable[[Any], Any]], future: Any) -> None:
+    # Done callback of a losing attempt: hand a result that arrived anyway to `discard`
+    if future.cancelled() or future.exception() is not None or discard is None:
+        return
+    try:
+        outcome = discard(future.result())
+        if inspect.isawaitable(outcome):
+            asyncio.ensure_future(outcome)
+    except Exception as e:
+        print(f"Failed to discard a hedged result: {str(e)}")
+
+
+def _first_success(done: Any, pending: Any) -> Any:
+    winner = next((attempt for attempt in done if attempt.exception() is None), None)
+    if winner is None:
+        # The first to finish failed; fall back to the other one
+        winner = pending.pop() if pending else done.pop()
+    return winner
+
+
+def hedged_call(fn: Callable[[], Any], policy: HedgePolicy = hedge_policy,
+                discard: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Run fn(); if it outlasts the hedge delay, race one duplicate and return the first success
+
+    The losing call is cancelled if it has not started. A blocking request that is
+    already on the wire runs to completion in its worker; its result is dropped, or
+    passed to `discard` to release what it holds (e.g. an open stream).
+    """
+    policy.record_request()
+    delay = policy.hedge_delay()
+    start = time.monotonic()
+    if delay is None:
+        result = fn()
+        policy.record_latency(time.monotonic() - start)
+        return result
+
+    primary = _hedge_executor.submit(fn)
+    try:
+        result = primary.result(timeout=delay)
+        policy.record_latency(time.monotonic() - start)
+        return result
+    except FutureTimeoutError:
+        pass
+
+    if not policy.try_hedge():
+        result = primary.result()
+        policy.record_latency(time.monotonic() - start)
+        return result
+
+    print(f"LLM call exceeded {delay:.2f}s hedge delay, sending a hedged request")
+    hedge = _hedge_executor.submit(fn)
+    done, pending = wait([primary, hedge], return_when=FIRST_COMPLETED)
+    winner = _first_success(done, pending)
+    for future in (primary, hedge):
+        if future is not winner:
+            future.cancel()
+            future.add_done_callback(partial(_settle_loser, discard))
+    winner.result()
+    if winner is hedge:
+        policy.record_hedge_win()
+    policy.record_latency(time.monotonic() - start)
+    return winner.result()
+
+
+async def ahedged_call(fn: Callable[[], Awaitable[Any]], policy: HedgePolicy = hedge_policy,
+                       discard: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Async variant of hedged_call; the losing request is cancelled outright"""
+    policy.record_request()
+    delay = policy.hedge_delay()
+    start = time.monotonic()
+    primary = asyncio.ensure_future(fn())
+    if delay is not None:
+        done, _ = await asyncio.wait([primary], timeout=delay)
+        if not done and policy.try_hedge():
+            print(f"LLM call exceeded {delay:.2f}s hedge delay, sending a hedged request")
+            hedge = asyncio.ensure_future(fn())
+            winner = None
+            try:
+                done, pending = await asyncio.wait([primary, hedge], return_when=asyncio.FIRST_COMPLETED)
+                winner = _first_success(done, pending)
+                await asyncio.wait([winner])
+            finally:
+                for task in (primary, hedge):
+                    if task is not winner:
+                        task.cancel()
+                        task.add_done_callback(partial(_settle_loser, discard))
+            if winner is hedge:
+                policy.record_hedge_win()
+            policy.record_latency(time.monotonic() - start)
+            return winner.result()
+    result = await primary
+    policy.record_latency(time.monotonic() - start)
+    return result
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Coroutine, Dict, Optional
+import httpx
+from decouple import config
+
+# Connection pool settings for the Bedrock proxy, shared by every LLM instance
+LLM_POOL_SIZE = config("LLM_POOL_SIZE", default=20, cast=int)
+LLM_KEEPALIVE_CONNECTIONS = config("LLM_KEEPALIVE_CONNECTIONS", default=10, cast=int)
+LLM_KEEPALIVE_EXPIRY = config("LLM_KEEPALIVE_EXPIRY", default=60.0, cast=float)
+LLM_HTTP2 = config("LLM_HTTP2", default=True, cast=bool)
+# Fail fast when the proxy is unreachable instead of waiting out the full request timeout
+LLM_CONNECT_TIMEOUT = config("LLM_CONNECT_TIMEOUT", default=5.0, cast=float)
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (installed with httpx[http2])"""
+    if not LLM_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        print("LLM_HTTP2 is enabled but the h2 package is missing, falling back to HTTP/1.1")
+        return False
+
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_POOL_SIZE,
+        max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _auth_headers() -> Dict[str, str]:
+    # Read when a client is built, not per completion; a missing key raises UndefinedValueError
+    return {"Authorization": f"Bearer {config('ANTHROPIC_API_KEY')}"}
+
+
+def request_timeout(total: float) -> httpx.Timeout:
+    """Overall timeout for a request, with a short connect phase"""
+    return httpx.Timeout(total, connect=min(LLM_CONNECT_TIMEOUT, total))
+
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide pooled client used for all proxy requests"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    http2=_http2_available(),
+                    limits=_pool_limits(),
+                    headers=_auth_headers(),
+                )
+    return _client
+
+
+def close_http_client() -> None:
+    """Close the shared client and its pooled connections"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+# Async clients are bound to the event loop that created their connections
+_async_clients: Dict[int, httpx.AsyncClient] = {}
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Return the pooled async client for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(id(loop))
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            http2=_http2_available(),
+            limits=_pool_limits(),
+            headers=_auth_headers(),
+        )
+        _async_clients[id(loop)] = client
+    return client
+
+
+async def aclose_http_clients() -> None:
+    """Close the shared sync client, the async client of the running loop and the I/O loop"""
+    close_http_client()
+    client = _async_clients.pop(id(asyncio.get_running_loop()), None)
+    if client is not None:
+        await client.aclose()
+    await asyncio.wrap_future(_stop_io_loop())
+
+
+# Background loop that runs async requests for blocking callers that may need to abort them:
+# cancelling a task on it closes the request's stream, which a blocked sync read cannot do
+_io_loop: Optional[asyncio.AbstractEventLoop] = None
+_io_loop_lock = threading.Lock()
+
+
+def get_io_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide I/O loop, starting its thread on first use"""
+    global _io_loop
+    if _io_loop is None:
+        with _io_loop_lock:
+            if _io_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-io", daemon=True).start()
+                _io_loop = loop
+    return _io_loop
+
+
+def run_on_io_loop(coro: Coroutine) -> Future:
+    """Schedule `coro` on the I/O loop; cancelling the returned future cancels the coroutine"""
+    return asyncio.run_coroutine_threadsafe(coro, get_io_loop())
+
+
+async def _close_io_client() -> None:
+    client = _async_clients.pop(id(asyncio.get_running_loop()), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _stop_io_loop() -> Future:
+    """Close the I/O loop's client and stop the loop; the future resolves once the client is closed"""
+    global _io_loop
+    with _io_loop_lock:
+        loop, _io_loop = _io_loop, None
+    if loop is None:
+        done = Future()
+        done.set_result(None)
+        return done
+    future = asyncio.run_coroutine_threadsafe(_close_io_client(), loop)
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(loop.stop))
+    return future
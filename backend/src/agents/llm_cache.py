@@ -0,0 +1,140 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+from decouple import config
+
+# Response cache settings (opt-in)
+LLM_CACHE_ENABLED = config("LLM_CACHE_ENABLED", default=False, cast=bool)
+LLM_CACHE_PATH = config("LLM_CACHE_PATH", default="llm_cache.db")
+LLM_CACHE_MAX_BYTES = config("LLM_CACHE_MAX_BYTES", default=256 * 1024 * 1024, cast=int)
+LLM_CACHE_TTL = config("LLM_CACHE_TTL", default=7 * 24 * 3600, cast=float)
+# Completions with temperature > 0 are sampled, so caching them is a policy choice
+LLM_CACHE_NONDETERMINISTIC = config("LLM_CACHE_NONDETERMINISTIC", default=False, cast=bool)
+
+
+def is_cacheable(temperature: float, cache_nondeterministic: bool = LLM_CACHE_NONDETERMINISTIC) -> bool:
+    """Whether a completion at this temperature may be served again from a cache"""
+    return temperature <= 0 or cache_nondeterministic
+
+
+def make_cache_key(model: str, temperature: float, max_tokens: int, stop: Optional[List[str]], prompt: str) -> str:
+    """Content address of a completion request"""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    material = json.dumps([model, temperature, max_tokens, stop or [], prompt_hash], separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed completion cache with zlib-compressed values, LRU size bound and TTL"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES,
+                 ttl: float = LLM_CACHE_TTL, cache_nondeterministic: bool = LLM_CACHE_NONDETERMINISTIC):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.cache_nondeterministic = cache_nondeterministic
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def is_cacheable(self, temperature: float) -> bool:
+        return is_cacheable(temperature, self.cache_nondeterministic)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, size, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, size, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= size
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return zlib.decompress(value).decode("utf-8")
+
+    def put(self, key: str, response: str) -> None:
+        value = zlib.compress(response.encode("utf-8"))
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now),
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under the size bound"""
+        expired = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses WHERE created_at < ?", (now - self.ttl,)
+        ).fetchone()
+        if expired[0]:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            self._total_bytes -= expired[1]
+            self.evictions += expired[0]
+
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Process-wide cache instance, None unless LLM_CACHE_ENABLED is set
+response_cache = LLMResponseCache() if LLM_CACHE_ENABLED else None
+
+
+def cache_stats() -> Dict[str, Any]:
+    if response_cache is None:
+        return {"enabled": False}
+    return response_cache.stats()
@@ -0,0 +1,151 @@
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from decouple import config
+from agents.llm_errors import LLMCassetteMissError
+
+# LLM backend: "http" talks to the proxy, "record" also writes every completion to the
+# cassette, "replay" serves completions from the cassette without touching the network
+LLM_BACKEND = config("LLM_BACKEND", default="http")
+LLM_CASSETTE_PATH = config("LLM_CASSETTE_PATH", default="llm_cassette.jsonl")
+# Synthetic latency for replayed calls, see LatencyModel
+LLM_REPLAY_LATENCY = config("LLM_REPLAY_LATENCY", default="none")
+LLM_REPLAY_SEED = config("LLM_REPLAY_SEED", default=None, cast=lambda v: None if v in (None, "") else int(v))
+# Share of a replayed call's latency spent before the first streamed chunk
+LLM_REPLAY_TTFB_SHARE = config("LLM_REPLAY_TTFB_SHARE", default=0.3, cast=float)
+
+BACKENDS = ("http", "record", "replay")
+
+_CHUNK_RE = re.compile(r"\S+\s*|\s+")
+
+
+class LatencyModel:
+    """Samples synthetic call latencies in seconds from a spec string
+
+    Specs: "none", "fixed:S", "uniform:LO,HI", "normal:MEAN,STD" (clipped at 0)
+    and "lognormal:MU,SIGMA" (parameters of the underlying normal).
+    """
+
+    def __init__(self, spec: str = "none", seed: Optional[int] = None):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(arg) for arg in args.split(",") if arg.strip()]
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Invalid LLM_REPLAY_LATENCY spec: {spec!r}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._rng.uniform(*self.params)
+            if self.kind == "normal":
+                return max(0.0, self._rng.gauss(*self.params))
+            if self.kind == "lognormal":
+                return self._rng.lognormvariate(*self.params)
+            return 0.0
+
+
+def split_chunks(content: str) -> List[str]:
+    """Split a completion into word-sized chunks for replayed streaming"""
+    return _CHUNK_RE.findall(content) or [content]
+
+
+class Cassette:
+    """Append-only JSONL file of completions, keyed like the response cache
+
+    A prompt recorded several times is replayed in recording order, wrapping
+    around once every recorded answer has been served.
+    """
+
+    def __init__(self, path: str = LLM_CASSETTE_PATH, mode: str = LLM_BACKEND,
+                 latency: Optional[LatencyModel] = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid cassette mode: {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency or LatencyModel()
+        self.recorded = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, List[str]] = {}
+        self._played: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay":
+            self._load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry["response"])
+        except FileNotFoundError:
+            print(f"LLM cassette {self.path} not found, every replayed call will miss")
+            return
+        print(f"Loaded {sum(len(v) for v in self._entries.values())} recorded LLM responses from {self.path}")
+
+    def record(self, key: str, model: str, prompt: str, response: str) -> None:
+        line = json.dumps({
+            "key": key,
+            "model": model,
+            "prompt": prompt,
+            "response": response,
+            "recorded_at": time.time(),
+        })
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.recorded += 1
+
+    def play(self, key: str) -> str:
+        with self._lock:
+            responses = self._entries.get(key)
+            if not responses:
+                self.misses += 1
+                raise LLMCassetteMissError(f"No recorded LLM response in {self.path} for request {key[:12]}")
+            index = self._played.get(key, 0)
+            self._played[key] = index + 1
+            self.hits += 1
+            return responses[index % len(responses)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "path": self.path,
+                "entries": sum(len(v) for v in self._entries.values()),
+                "recorded": self.recorded,
+                "hits": self.hits,
+                "misses": self.misses,
+                "latency": self.latency.spec,
+            }
+
+
+if LLM_BACKEND not in BACKENDS:
+    raise ValueError(f"Invalid LLM_BACKEND {LLM_BACKEND!r}, expected one of {', '.join(BACKENDS)}")
+
+# Process-wide cassette, None for the plain "http" backend
+llm_cassette = (
+    Cassette(LLM_CASSETTE_PATH, LLM_BACKEND, LatencyModel(LLM_REPLAY_LATENCY, LLM_REPLAY_SEED))
+    if LLM_BACKEND != "http" else None
+)
+
+
+def cassette_stats() -> Dict[str, Any]:
+    if llm_cassette is None:
+        return {"mode": "http"}
+    return llm_cassette.stats()
@@ -0,0 +1,66 @@
+from typing import Optional
+import httpx
+
+
+class LLMError(Exception):
+    """Base class for failures talking to the LLM proxy"""
+
+
+class LLMCircuitOpenError(LLMError):
+    """The proxy is considered unhealthy and calls are being rejected"""
+
+    def __init__(self, retry_in: float):
+        super().__init__(f"LLM backend unavailable, circuit open for another {retry_in:.0f}s")
+        self.retry_in = retry_in
+
+
+class LLMTimeoutError(LLMError):
+    """The proxy did not answer within the configured timeouts"""
+
+
+class LLMConnectionError(LLMError):
+    """The proxy could not be reached"""
+
+
+class LLMStatusError(LLMError):
+    """The proxy answered with an HTTP error status"""
+
+    def __init__(self, status_code: int, message: Optional[str] = None):
+        super().__init__(message or f"LLM proxy returned HTTP {status_code}")
+        self.status_code = status_code
+
+
+class LLMRateLimitError(LLMStatusError):
+    """Still rate limited (429) after all retries"""
+
+
+class LLMServerError(LLMStatusError):
+    """The proxy failed with a 5xx status after all retries"""
+
+
+class LLMClientError(LLMStatusError):
+    """The request was rejected (4xx); retrying will not help"""
+
+
+class LLMResponseError(LLMError):
+    """The proxy answered with a body that is not a usable completion"""
+
+
+def status_error(response: httpx.Response) -> LLMStatusError:
+    """Typed exception for an error response"""
+    if response.status_code == 429:
+        return LLMRateLimitError(response.status_code)
+    if response.status_code >= 500:
+        return LLMServerError(response.status_code)
+    return LLMClientError(response.status_code)
+
+
+def transport_error(exc: httpx.HTTPError) -> LLMError:
+    """Typed exception for a failure below the HTTP status level"""
+    if isinstance(exc, httpx.TimeoutException):
+        return LLMTimeoutError(f"LLM proxy timed out: {exc}")
+    return LLMConnectionError(f"LLM proxy connection failed: {exc}")
+
+
+class LLMCassetteMissError(LLMError):
+    """Replay mode found no recorded response for the request"""
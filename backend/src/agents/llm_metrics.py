@@ -0,0 +1,180 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds per kind of measurement
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (10, 50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Measurement name -> bucket bounds
+MEASUREMENTS = {
+    "queue_wait": SECONDS_BUCKETS,
+    "connect_time": SECONDS_BUCKETS,
+    "ttfb": SECONDS_BUCKETS,
+    "latency": SECONDS_BUCKETS,
+    "prompt_tokens": TOKEN_BUCKETS,
+    "completion_tokens": TOKEN_BUCKETS,
+    "request_bytes": BYTE_BUCKETS,
+    "response_bytes": BYTE_BUCKETS,
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): count for bound, count in zip(self.bounds + ("inf",), self.counts)},
+        }
+
+
+class LLMCallRecord:
+    """Timings and sizes of one LLM call, filled in as the call progresses"""
+
+    def __init__(self, task_id: Optional[str], agent: Optional[str], model: str):
+        self.task_id = task_id
+        self.agent = agent
+        self.model = model
+        self.started = time.monotonic()
+        self.queue_wait = 0.0
+        self.connect_time: Optional[float] = None
+        self.ttfb: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.tokens_estimated = False
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.cached = False
+        self.error: Optional[str] = None
+        self._attempt_started = self.started
+        self._connect_started: Optional[float] = None
+
+    def start_attempt(self) -> None:
+        self._attempt_started = time.monotonic()
+
+    def fork(self) -> "LLMCallRecord":
+        """Blank record for one of several concurrent attempts at this call (hedging)"""
+        return LLMCallRecord(self.task_id, self.agent, self.model)
+
+    def merge(self, attempt: Optional["LLMCallRecord"]) -> None:
+        """Take over the timings and sizes of the attempt that answered the call"""
+        if attempt is None:
+            return
+        self.queue_wait += attempt.queue_wait
+        self.request_bytes += attempt.request_bytes
+        self.response_bytes += attempt.response_bytes
+        for name in ("connect_time", "ttfb", "prompt_tokens", "completion_tokens"):
+            value = getattr(attempt, name)
+            if value is not None:
+                setattr(self, name, value)
+
+    def trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace hook: picks out connection setup and response header timing"""
+        now = time.monotonic()
+        if event_name == "connection.connect_tcp.started":
+            self._connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            if self._connect_started is not None:
+                self.connect_time = now - self._connect_started
+        elif event_name.endswith("receive_response_headers.complete") and self.ttfb is None:
+            self.ttfb = now - self._attempt_started
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self.trace(event_name, info)
+
+    def finish(self) -> None:
+        self.latency = time.monotonic() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: value for name, value in vars(self).items() if not name.startswith("_")}
+
+
+class LLMMetrics:
+    """In-memory histograms of LLM calls, aggregated by (agent, model)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Dict[str, Histogram]] = {}
+        self._calls: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._listeners: List[Callable[[LLMCallRecord], None]] = []
+
+    def add_listener(self, listener: Callable[[LLMCallRecord], None]) -> None:
+        """Call `listener` with every finished LLMCallRecord"""
+        self._listeners.append(listener)
+
+    def record(self, record: LLMCallRecord) -> None:
+        key = (record.agent or "unknown", record.model)
+        with self._lock:
+            histograms = self._histograms.get(key)
+            if histograms is None:
+                histograms = self._histograms[key] = {name: Histogram(bounds) for name, bounds in MEASUREMENTS.items()}
+                self._calls[key] = {"calls": 0, "cached": 0, "errors": 0}
+            counters = self._calls[key]
+            counters["calls"] += 1
+            counters["cached"] += record.cached
+            counters["errors"] += record.error is not None
+            for name in MEASUREMENTS:
+                value = getattr(record, name)
+                if value is not None and not (record.cached and name != "latency"):
+                    histograms[name].observe(value)
+        for listener in self._listeners:
+            try:
+                listener(record)
+            except Exception as e:
+                print(f"LLM metrics listener failed: {str(e)}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                f"{agent}/{model}": {
+                    **self._calls[(agent, model)],
+                    **{name: histogram.snapshot() for name, histogram in histograms.items()},
+                }
+                for (agent, model), histograms in self._histograms.items()
+            }
+
+
+# Process-wide registry shared by every BedrockCustomLLM instance
+llm_metrics = LLMMetrics()
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for when the proxy does not report usage"""
+    return max(1, len(text) // 4) if text else 0
@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from decouple import config
+
+# Process-wide limits for requests to the LLM proxy
+LLM_MAX_CONCURRENCY = config("LLM_MAX_CONCURRENCY", default=8, cast=int)
+LLM_RATE_LIMIT = config("LLM_RATE_LIMIT", default=5.0, cast=float)  # requests per second
+LLM_RATE_BURST = config("LLM_RATE_BURST", default=10, cast=int)
+LLM_RATE_MIN = config("LLM_RATE_MIN", default=0.2, cast=float)
+LLM_RATE_INCREASE = config("LLM_RATE_INCREASE", default=0.1, cast=float)  # additive, per success
+LLM_RATE_DECREASE = config("LLM_RATE_DECREASE", default=0.5, cast=float)  # multiplicative, per 429/5xx
+LLM_MAX_RETRIES = config("LLM_MAX_RETRIES", default=3, cast=int)
+
+# Request priorities: user-facing revisions go ahead of background pipeline work
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# How often waiters re-check when they cannot be woken directly
+_POLL_INTERVAL = 0.05
+
+
+def is_retryable_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """Token bucket plus concurrency cap, with AIMD rate adaptation and two priorities"""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, rate: float = LLM_RATE_LIMIT,
+                 burst: int = LLM_RATE_BURST, min_rate: float = LLM_RATE_MIN,
+                 increase: float = LLM_RATE_INCREASE, decrease: float = LLM_RATE_DECREASE):
+        self.max_concurrency = max_concurrency
+        self.max_rate = rate
+        self.min_rate = min_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.rate = rate
+        self.tokens = float(burst)
+        self.in_flight = 0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _try_acquire(self, priority: str) -> float:
+        """Take a slot and a token, or return how long to wait before retrying"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if priority != INTERACTIVE and self._waiting[INTERACTIVE]:
+            return _POLL_INTERVAL
+        if self.in_flight >= self.max_concurrency:
+            return _POLL_INTERVAL
+        self._refill(now)
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        self.in_flight += 1
+        return 0.0
+
+    def acquire(self, priority: str = BACKGROUND) -> float:
+        """Block until a request may be sent; returns the time spent waiting"""
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    wait = self._try_acquire(priority)
+                    if wait <= 0:
+                        return time.monotonic() - start
+                    self._cond.wait(wait)
+            finally:
+                self._waiting[priority] -= 1
+
+    async def aacquire(self, priority: str = BACKGROUND) -> float:
+        """Async variant of acquire that suspends instead of blocking the loop"""
+        start = time.monotonic()
+        with self._cond:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(priority)
+                if wait <= 0:
+                    return time.monotonic() - start
+                await asyncio.sleep(min(wait, _POLL_INTERVAL))
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def record(self, status_code: int, retry_after: Optional[float] = None) -> None:
+        """Adapt the rate to the proxy's answer: back off on 429/5xx, creep up on success"""
+        with self._cond:
+            if is_retryable_status(status_code):
+                self.throttled += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.tokens = min(self.tokens, 0.0)
+                if retry_after is not None:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            elif status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "rate": self.rate,
+                "max_rate": self.max_rate,
+                "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency,
+                "waiting_interactive": self._waiting[INTERACTIVE],
+                "waiting_background": self._waiting[BACKGROUND],
+                "throttled": self.throttled,
+                "blocked_for": max(0.0, self._blocked_until - time.monotonic()),
+            }
+
+
+# Shared by every BedrockCustomLLM instance in the process
+rate_limiter = AdaptiveRateLimiter()
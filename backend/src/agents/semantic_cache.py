@@ -0,0 +1,176 @@
+import re
+import threading
+import zlib
+from typing import Any, Dict, Hashable, List, Optional, Set
+import numpy as np
+from decouple import config
+
+# Near-duplicate prompt cache settings (opt-in)
+LLM_SEMANTIC_CACHE_ENABLED = config("LLM_SEMANTIC_CACHE_ENABLED", default=False, cast=bool)
+LLM_SEMANTIC_CACHE_THRESHOLD = config("LLM_SEMANTIC_CACHE_THRESHOLD", default=0.92, cast=float)
+LLM_SEMANTIC_CACHE_MAX_ENTRIES = config("LLM_SEMANTIC_CACHE_MAX_ENTRIES", default=100000, cast=int)
+LLM_SEMANTIC_CACHE_DIM = config("LLM_SEMANTIC_CACHE_DIM", default=256, cast=int)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def _features(text: str) -> List[str]:
+    """Word unigrams, word bigrams and character trigrams of the normalised text"""
+    words = _WORD_RE.findall(text.lower())
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return features
+
+
+def embed(text: str, dim: int = LLM_SEMANTIC_CACHE_DIM) -> np.ndarray:
+    """Signed hashed n-gram vector, L2-normalised, computed on the CPU"""
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in _features(text)), dtype=np.uint32)
+    vector = np.zeros(dim, dtype=np.float32)
+    if hashes.size == 0:
+        return vector
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+    vector += np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class _VectorIndex:
+    """Unit vectors in a dense matrix, with random-hyperplane LSH buckets for large sizes
+
+    Small indexes are scanned with one matrix-vector product. Past
+    BRUTE_FORCE_LIMIT entries, only the rows sharing an LSH bucket with the query
+    in at least one table are scored, which keeps lookups at roughly a
+    millisecond or less with 100k+ entries instead of a full scan.
+    """
+
+    BRUTE_FORCE_LIMIT = 4096
+    LSH_TABLES = 16
+    LSH_BITS = 12
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.matrix = np.zeros((min(1024, max_entries), dim), dtype=np.float32)
+        self.values: List[Optional[str]] = [None] * len(self.matrix)
+        self.codes = np.zeros((len(self.matrix), self.LSH_TABLES), dtype=np.int64)
+        self.size = 0
+        self.next_slot = 0
+        rng = np.random.default_rng(0)
+        self.planes = rng.standard_normal((self.LSH_TABLES * self.LSH_BITS, dim)).astype(np.float32)
+        self.bit_weights = 1 << np.arange(self.LSH_BITS, dtype=np.int64)
+        self.buckets: List[Dict[int, Set[int]]] = [{} for _ in range(self.LSH_TABLES)]
+
+    def _lsh_codes(self, vector: np.ndarray) -> np.ndarray:
+        bits = (self.planes @ vector > 0).reshape(self.LSH_TABLES, self.LSH_BITS)
+        return bits.astype(np.int64) @ self.bit_weights
+
+    def _candidates(self, vector: np.ndarray) -> Optional[np.ndarray]:
+        if self.size <= self.BRUTE_FORCE_LIMIT:
+            return None
+        slots = [self.buckets[table].get(int(code), ()) for table, code in enumerate(self._lsh_codes(vector))]
+        # Sorted rows gather faster out of the matrix
+        return np.sort(np.fromiter(set().union(*slots), dtype=np.int64))
+
+    def search(self, vector: np.ndarray):
+        if self.size == 0:
+            return 0.0, None
+        candidates = self._candidates(vector)
+        if candidates is None:
+            scores = self.matrix[:self.size] @ vector
+            best = int(np.argmax(scores))
+            return float(scores[best]), self.values[best]
+        if candidates.size == 0:
+            return 0.0, None
+        scores = self.matrix[candidates] @ vector
+        best = int(np.argmax(scores))
+        return float(scores[best]), self.values[int(candidates[best])]
+
+    def _grow(self) -> None:
+        capacity = min(len(self.matrix) * 2, self.max_entries)
+        grown = np.zeros((capacity, self.matrix.shape[1]), dtype=np.float32)
+        grown[:self.size] = self.matrix[:self.size]
+        self.matrix = grown
+        codes = np.zeros((capacity, self.LSH_TABLES), dtype=np.int64)
+        codes[:self.size] = self.codes[:self.size]
+        self.codes = codes
+        self.values += [None] * (capacity - len(self.values))
+
+    def add(self, vector: np.ndarray, value: str) -> None:
+        if self.size < self.max_entries:
+            if self.size == len(self.matrix):
+                self._grow()
+            slot = self.size
+            self.size += 1
+        else:
+            # Full: overwrite the oldest entry and drop it from its buckets
+            slot = self.next_slot
+            self.next_slot = (self.next_slot + 1) % self.max_entries
+            for table, code in enumerate(self.codes[slot]):
+                self.buckets[table].get(int(code), set()).discard(slot)
+        codes = self._lsh_codes(vector)
+        for table, code in enumerate(codes):
+            self.buckets[table].setdefault(int(code), set()).add(slot)
+        self.matrix[slot] = vector
+        self.codes[slot] = codes
+        self.values[slot] = value
+
+
+class SemanticCache:
+    """Serve cached answers for prompts whose embedding is close to a previous one"""
+
+    def __init__(self, threshold: float = LLM_SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = LLM_SEMANTIC_CACHE_MAX_ENTRIES, dim: int = LLM_SEMANTIC_CACHE_DIM):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # One index per namespace so answers never cross models or generation settings
+        self._indexes: Dict[Hashable, _VectorIndex] = {}
+
+    def get(self, namespace: Hashable, prompt: str) -> Optional[str]:
+        vector = embed(prompt, self.dim)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            score, value = index.search(vector) if index is not None else (0.0, None)
+            if value is not None and score >= self.threshold:
+                self.hits += 1
+                return value
+            self.misses += 1
+        return None
+
+    def put(self, namespace: Hashable, prompt: str, response: str) -> None:
+        vector = embed(prompt, self.dim)
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None:
+                index = self._indexes[namespace] = _VectorIndex(self.dim, self.max_entries)
+            index.add(vector, response)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = sum(index.size for index in self._indexes.values())
+        lookups = self.hits + self.misses
+        return {
+            "enabled": True,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "threshold": self.threshold,
+        }
+
+
+# Process-wide cache instance, None unless LLM_SEMANTIC_CACHE_ENABLED is set
+semantic_cache = SemanticCache() if LLM_SEMANTIC_CACHE_ENABLED else None
+
+
+def semantic_cache_stats() -> Dict[str, Any]:
+    if semantic_cache is None:
+        return {"enabled": False}
+    return semantic_cache.stats()
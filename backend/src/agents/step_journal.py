@@ -0,0 +1,236 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from decouple import config
+
+# Durable log of each stage's completed LLM and tool calls, replayed when a stage is re-run
+STAGE_JOURNAL = config("STAGE_JOURNAL", default=True, cast=bool)
+# Defaults to a file only when tasks themselves survive restarts; otherwise the journal
+# covers pause/resume within the process
+STAGE_JOURNAL_PATH = config(
+    "STAGE_JOURNAL_PATH",
+    default="stage_journal.db" if config("TASK_STORE_BACKEND", default="memory") == "sqlite" else ":memory:",
+)
+
+
+def step_key(*parts: Any) -> str:
+    """Stable identity of a step's request (or of a stage run's inputs)"""
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JournalRun:
+    """Replay-or-record cursor over one stage run's steps
+
+    Steps are matched by position and request key. While the stage repeats
+    the recorded steps, their results are served from the journal; at the
+    first step that differs, the rest of the old run is dropped and every
+    later step is recorded instead.
+    """
+
+    def __init__(self, journal: "StageJournal", task_id: str, stage: str, recorded: List[Tuple[str, str, str]]):
+        self.journal = journal
+        self.task_id = task_id
+        self.stage = stage
+        self.replayed = 0
+        self.recorded = 0
+        self._steps = recorded
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def replay(self, kind: str, key: str) -> Optional[str]:
+        """Recorded result of the next step if it is this request, else None"""
+        with self._lock:
+            if self._seq < len(self._steps):
+                step_kind, step_request, result = self._steps[self._seq]
+                if step_kind == kind and step_request == key:
+                    self._seq += 1
+                    self.replayed += 1
+                    return result
+                # The run diverged from the recording; what follows is stale
+                self.journal._truncate(self, self._seq)
+                del self._steps[self._seq:]
+            return None
+
+    def record(self, kind: str, key: str, result: str) -> None:
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+            self.recorded += 1
+        self.journal._append(self, seq, kind, key, result)
+
+    def run(self, kind: str, key: str, fn: Callable[[], str]) -> str:
+        """Replay the step, or run `fn` and record its result"""
+        result = self.replay(kind, key)
+        if result is None:
+            result = fn()
+            self.record(kind, key, result)
+        return result
+
+
+class StageJournal:
+    """SQLite journal of stage steps, one run per (task_id, stage)
+
+    Opening a run with inputs other than the journaled ones starts the stage
+    over. Writes are committed per step so a crash loses at most the call in
+    flight.
+    """
+
+    def __init__(self, path: str = STAGE_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._runs: Dict[Tuple[str, str], JournalRun] = {}
+        self.opened = 0
+        self.resumed = 0
+        self.replayed = 0
+        self.recorded = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stage_runs ("
+            "task_id TEXT NOT NULL, stage TEXT NOT NULL, run_key TEXT NOT NULL, started_at REAL NOT NULL, "
+            "PRIMARY KEY (task_id, stage))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stage_steps ("
+            "task_id TEXT NOT NULL, stage TEXT NOT NULL, seq INTEGER NOT NULL, kind TEXT NOT NULL, "
+            "request_key TEXT NOT NULL, result TEXT NOT NULL, recorded_at REAL NOT NULL, "
+            "PRIMARY KEY (task_id, stage, seq))"
+        )
+        self._conn.commit()
+
+    def open(self, task_id: str, stage: str, run_key: str) -> JournalRun:
+        """Cursor for a stage run on inputs `run_key`, primed with any steps an earlier attempt completed"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT run_key FROM stage_runs WHERE task_id = ? AND stage = ?", (task_id, stage)
+            ).fetchone()
+            if row is not None and row[0] == run_key:
+                steps = [
+                    (kind, request_key, result) for kind, request_key, result in self._conn.execute(
+                        "SELECT kind, request_key, result FROM stage_steps "
+                        "WHERE task_id = ? AND stage = ? ORDER BY seq", (task_id, stage)
+                    )
+                ]
+            else:
+                steps = []
+                self._conn.execute("DELETE FROM stage_steps WHERE task_id = ? AND stage = ?", (task_id, stage))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO stage_runs (task_id, stage, run_key, started_at) VALUES (?, ?, ?, ?)",
+                    (task_id, stage, run_key, time.time())
+                )
+                self._conn.commit()
+            run = JournalRun(self, task_id, stage, steps)
+            # A newer run of the stage takes over; an older one still winding down stops writing
+            self._runs[(task_id, stage)] = run
+            self.opened += 1
+            if steps:
+                self.resumed += 1
+        if steps:
+            print(f"Task {task_id}: resuming {stage} from {len(steps)} journaled step(s)")
+        return run
+
+    def close(self, run: JournalRun, completed: bool) -> None:
+        """Stop journaling `run`; a completed run's steps are no longer needed"""
+        with self._lock:
+            if self._runs.get((run.task_id, run.stage)) is not run:
+                return
+            del self._runs[(run.task_id, run.stage)]
+            self.replayed += run.replayed
+            self.recorded += run.recorded
+            if completed:
+                self._delete(run.task_id, run.stage)
+
+    def forget(self, task_id: str) -> None:
+        """Drop every journaled step of a task"""
+        with self._lock:
+            self._delete(task_id)
+
+    def _delete(self, task_id: str, stage: Optional[str] = None) -> None:
+        # Caller holds the lock
+        where, args = ("task_id = ?", (task_id,)) if stage is None else ("task_id = ? AND stage = ?", (task_id, stage))
+        self._conn.execute(f"DELETE FROM stage_steps WHERE {where}", args)
+        self._conn.execute(f"DELETE FROM stage_runs WHERE {where}", args)
+        self._conn.commit()
+
+    def _append(self, run: JournalRun, seq: int, kind: str, key: str, result: str) -> None:
+        with self._lock:
+            if self._runs.get((run.task_id, run.stage)) is not run:
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_steps (task_id, stage, seq, kind, request_key, result, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (run.task_id, run.stage, seq, kind, key, result, time.time())
+            )
+            self._conn.commit()
+
+    def _truncate(self, run: JournalRun, seq: int) -> None:
+        with self._lock:
+            if self._runs.get((run.task_id, run.stage)) is not run:
+                return
+            self._conn.execute(
+                "DELETE FROM stage_steps WHERE task_id = ? AND stage = ? AND seq >= ?", (run.task_id, run.stage, seq)
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            steps = self._conn.execute("SELECT COUNT(*) FROM stage_steps").fetchone()[0]
+            return {
+                "enabled": True,
+                "path": self.path,
+                "steps": steps,
+                "open_runs": len(self._runs),
+                "opened": self.opened,
+                "resumed": self.resumed,
+                "replayed": self.replayed,
+                "recorded": self.recorded,
+            }
+
+
+# Journal run of the stage executing on this thread, for LLM and tool calls
+_current_run: ContextVar[Optional[JournalRun]] = ContextVar("journal_run", default=None)
+
+
+def current_run() -> Optional[JournalRun]:
+    return _current_run.get()
+
+
+@contextmanager
+def journal_scope(run: Optional[JournalRun]) -> Iterator[Optional[JournalRun]]:
+    """Make `run` the current journal run for the body of the `with` block"""
+    reset = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(reset)
+
+
+def run_journaled(run: Optional[JournalRun], fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Call `fn` with `run` as the current journal run; meant to be the job handed to a worker"""
+    with journal_scope(run):
+        return fn(*args, **kwargs)
+
+
+def journaled_step(kind: str, request: Tuple[Any, ...], fn: Callable[[], str]) -> str:
+    """Run a step through the current stage's journal, if it has one"""
+    run = _current_run.get()
+    if run is None:
+        return fn()
+    return run.run(kind, step_key(kind, *request), fn)
+
+
+# Process-wide journal, None when STAGE_JOURNAL is off
+stage_journal = StageJournal(STAGE_JOURNAL_PATH) if STAGE_JOURNAL else None
+
+
+def journal_stats() -> Dict[str, Any]:
+    if stage_journal is None:
+        return {"enabled": False}
+    return stage_journal.stats()
@@ -0,0 +1,126 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from decouple import config
+
+# Identical problems submitted while one is running follow its pipeline instead of starting another
+PROBLEM_COALESCING = config("PROBLEM_COALESCING", default=True, cast=bool)
+# Seconds after submission during which a run still accepts followers
+PROBLEM_COALESCE_WINDOW = config("PROBLEM_COALESCE_WINDOW", default=60.0, cast=float)
+
+
+def problem_key(problem: str) -> str:
+    """Hash of a problem statement with Unicode form, case and whitespace normalized"""
+    text = " ".join(unicodedata.normalize("NFKC", problem).casefold().split())
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ProblemCoalescer:
+    """Single-flight registry for /run: one pipeline per normalized problem, shared by duplicates
+
+    The first submission of a problem leads; identical ones submitted within
+    `window` seconds, while the leader is still joinable, become followers
+    that mirror the leader's task. A task that diverges with feedback leaves
+    the group: a follower goes its own way, and a leader closes its run to
+    new followers and releases the ones it has. Lives on the event loop.
+    """
+
+    def __init__(self, enabled: bool = PROBLEM_COALESCING, window: float = PROBLEM_COALESCE_WINDOW):
+        self.enabled = enabled
+        self.window = window
+        # problem key -> (leader task id, submitted at), oldest first
+        self._open: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._keys: Dict[str, str] = {}
+        # Replaced rather than mutated, so worker threads mirroring a leader can read them safely
+        self._followers: Dict[str, Tuple[str, ...]] = {}
+        self._leaders: Dict[str, str] = {}
+        self.led = 0
+        self.coalesced = 0
+        self.detached = 0
+
+    def _expire(self, now: float) -> None:
+        while self._open:
+            key, (leader_id, submitted) = next(iter(self._open.items()))
+            if now - submitted <= self.window:
+                break
+            del self._open[key]
+            self._keys.pop(leader_id, None)
+
+    def find(self, problem: str, joinable: Callable[[str], bool]) -> Optional[str]:
+        """Task id of the run an identical problem can follow, if `joinable(leader_id)` agrees"""
+        if not self.enabled:
+            return None
+        self._expire(time.time())
+        entry = self._open.get(problem_key(problem))
+        if entry is None or not joinable(entry[0]):
+            return None
+        return entry[0]
+
+    def lead(self, task_id: str, problem: str) -> None:
+        """Open a new task's run to followers with the same problem"""
+        if not self.enabled:
+            return
+        key = problem_key(problem)
+        previous = self._open.pop(key, None)
+        if previous is not None:
+            self._keys.pop(previous[0], None)
+        self._open[key] = (task_id, time.time())
+        self._keys[task_id] = key
+        self.led += 1
+
+    def follow(self, task_id: str, leader_id: str) -> None:
+        self._followers[leader_id] = (*self._followers.get(leader_id, ()), task_id)
+        self._leaders[task_id] = leader_id
+        self.coalesced += 1
+
+    def leader_of(self, task_id: str) -> Optional[str]:
+        return self._leaders.get(task_id)
+
+    def followers(self, task_id: str) -> List[str]:
+        return list(self._followers.get(task_id, ()))
+
+    def _close(self, leader_id: str) -> None:
+        key = self._keys.pop(leader_id, None)
+        if key is not None:
+            del self._open[key]
+
+    def detach(self, task_id: str) -> List[str]:
+        """Take a diverging task out of its group; returns the followers that are now on their own"""
+        leader_id = self._leaders.pop(task_id, None)
+        if leader_id is not None:
+            followers = tuple(follower_id for follower_id in self._followers[leader_id] if follower_id != task_id)
+            if followers:
+                self._followers[leader_id] = followers
+            else:
+                del self._followers[leader_id]
+            self.detached += 1
+            return [task_id]
+        # A leader taking its own path: nobody new may join it, and its followers part ways
+        released = self.disband(task_id)
+        self.detached += len(released)
+        return released
+
+    def disband(self, leader_id: str) -> List[str]:
+        """Close a run to new followers and release the ones it has, e.g. once it has finished"""
+        self._close(leader_id)
+        followers = self._followers.pop(leader_id, ())
+        for follower_id in followers:
+            del self._leaders[follower_id]
+        return list(followers)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "open_runs": len(self._open),
+            "followers": len(self._leaders),
+            "led": self.led,
+            "coalesced": self.coalesced,
+            "detached": self.detached,
+        }
+
+
+# Shared by /run and the routes that let a task diverge
+problem_coalescer = ProblemCoalescer()
@@ -0,0 +1,173 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+from decouple import config
+from agents.cancellation import OperationCancelled
+
+# Where agent stages run: "thread" or "process" (portable stages only, see StageExecutor.run)
+STAGE_EXECUTOR = config("STAGE_EXECUTOR", default="thread")
+STAGE_WORKERS = config("STAGE_WORKERS", default=4, cast=int)
+
+
+class _PoolStats:
+    """Queue depth and busy time of one worker pool"""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.queued = 0
+        self.running = 0
+        self.busy_seconds = 0.0
+        self.queue_wait_seconds = 0.0
+
+    def snapshot(self, uptime: float) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "queue_depth": self.queued,
+                "running": self.running,
+                "utilization": self.running / self.workers,
+                "busy_ratio": self.busy_seconds / (self.workers * uptime) if uptime else 0.0,
+                "avg_queue_wait": self.queue_wait_seconds / self.completed if self.completed else 0.0,
+            }
+
+
+class StageExecutor:
+    """Bounded worker pool for blocking agent stages (crew kickoffs, DSPy runs)
+
+    Stages are submitted from coroutines and awaited without blocking the event
+    loop; at most `workers` run at once and the rest wait in the pool's queue.
+    In process mode only stages marked portable leave the API process: crew
+    stages stream tokens and report metrics through in-process callbacks, so
+    they always run on the thread pool.
+    """
+
+    def __init__(self, kind: str = STAGE_EXECUTOR, workers: int = STAGE_WORKERS):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Invalid STAGE_EXECUTOR {kind!r}, expected thread or process")
+        self.kind = kind
+        self.workers = workers
+        self.started = time.monotonic()
+        self._threads = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stage")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._stats = {"thread": _PoolStats(workers)}
+        if kind == "process":
+            # Spawned, not forked: the API process runs threads that must not be duplicated
+            self._processes = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            self._stats["process"] = _PoolStats(workers)
+
+    def _timed(self, stats: _PoolStats, submitted_at: float, fn: Callable, args, kwargs) -> Any:
+        # Runs on a pool thread
+        started = time.monotonic()
+        with stats.lock:
+            stats.queued -= 1
+            stats.running += 1
+            stats.queue_wait_seconds += started - submitted_at
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with stats.lock:
+                stats.running -= 1
+                stats.busy_seconds += time.monotonic() - started
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """Queue `fn(*args, **kwargs)` on the thread pool and return its concurrent future
+
+        For callers that need the stage to outlive the coroutine that started
+        it, or to cancel it before a worker picks it up; others use run().
+        """
+        stats = self._stats["thread"]
+        with stats.lock:
+            stats.submitted += 1
+            stats.queued += 1
+        future = self._threads.submit(self._timed, stats, time.monotonic(), fn, args, kwargs)
+        future.add_done_callback(partial(self._finished, stats))
+        return future
+
+    @staticmethod
+    def _finished(stats: _PoolStats, future: Future) -> None:
+        with stats.lock:
+            if future.cancelled():
+                # Dropped before a worker picked it up
+                stats.queued -= 1
+                stats.cancelled += 1
+            elif isinstance(future.exception(), OperationCancelled):
+                # Stopped by its cancellation token while running
+                stats.cancelled += 1
+            elif future.exception() is not None:
+                stats.failed += 1
+            else:
+                stats.completed += 1
+
+    async def run(self, fn: Callable, *args: Any, portable: bool = False, **kwargs: Any) -> Any:
+        """Run `fn(*args, **kwargs)` on a worker and await its result
+
+        `portable` stages are module-level functions with picklable arguments
+        whose return value is their only effect; they go to the process pool
+        when one is configured.
+        """
+        if portable and self._processes is not None:
+            return await self._run_process(fn, args, kwargs)
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    async def _run_process(self, fn: Callable, args, kwargs) -> Any:
+        stats = self._stats["process"]
+        with stats.lock:
+            stats.submitted += 1
+            # A process worker's start is not observable here; count it as running when a slot is free
+            if stats.running < stats.workers:
+                stats.running += 1
+                started = True
+            else:
+                stats.queued += 1
+                started = False
+        started_at = time.monotonic()
+        try:
+            return await self._settle(stats, self._processes.submit(fn, *args, **kwargs))
+        finally:
+            with stats.lock:
+                if started:
+                    stats.running -= 1
+                    stats.busy_seconds += time.monotonic() - started_at
+                else:
+                    stats.queued -= 1
+
+    @staticmethod
+    async def _settle(stats: _PoolStats, future) -> Any:
+        try:
+            result = await asyncio.wrap_future(future)
+        except BaseException:
+            with stats.lock:
+                stats.failed += 1
+            raise
+        with stats.lock:
+            stats.completed += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        uptime = time.monotonic() - self.started
+        return {"kind": self.kind, **{name: pool.snapshot(uptime) for name, pool in self._stats.items()}}
+
+    def shutdown(self) -> None:
+        """Stop accepting stages and drop queued ones; running stages finish in the background"""
+        pools: List[Executor] = [self._threads]
+        if self._processes is not None:
+            pools.append(self._processes)
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by every route that runs an agent stage
+stage_executor = StageExecutor()
@@ -1,49 +1,63 @@
 from tools.crew_tools import architect_tools, programmer_tools, tester_tools, reviewer_tools, security_tools, search_web, read_file, write_file, create_directory
 from agents.agents import CustomAgents
+from agents.rate_limiter import INTERACTIVE
+from agents.llm_errors import LLMError
+from agents.llm_metrics import llm_metrics
+from agents.cancellation import CancellationRegistry
 from tasks.tasks import CustomTasks
 from tools.search_utils import CachedSearch
+from functions.pubsub import Broadcaster, ConditionRegistry
+from functions.task_store import create_task_store
+from functions.retention import task_output_dir
+from functions.task_fields import AGENT_NAMES, OPTIONAL_AGENTS, UNSET, AgentFields, MessageLog, agent_index
+from functions.scheduler import stage_scheduler
+from functions.coalescing import problem_coalescer
 import time
+import threading
 from crewai import Crew, Task
+from decouple import config
 import os
 
 
-# Task tracking storage
-tasks_store = {}
-
 # Task status structure
 class TaskStatus:
-    def __init__(self):
+    # Fixed attributes keep tens of thousands of tasks cheap to hold in memory
+    __slots__ = (
+        "started", "current_agent", "completed_agents", "problem",
+        "_agent_values",
+        "awaiting_user_approval", "user_approved", "user_feedback",
+        "paused", "pause_reason", "pause_timestamp", "awaiting_feedback",
+        "progress", "step_messages", "created_at", "updated_at",
+        "final_result", "complete", "error", "llm_usage", "queue_position", "version",
+        "_field_versions", "_on_change", "_snapshot",
+    )
+    # Per-agent fields and their defaults, stored back to back in one flat list indexed by
+    # Agent; the order matches the offsets used by the properties below
+    AGENT_FIELDS = {"agent_outputs": None, "agent_status": "pending", "agent_feedback": None, "revision_counts": 0}
+    # Fields served by /status, each stamped with the task version that last changed it
+    STATUS_FIELDS = (
+        "current_agent", "agent_status", "completed_agents", "progress", "step_messages",
+        "created_at", "updated_at", "complete", "error", "agent_feedback", "revision_counts",
+        "awaiting_feedback", "awaiting_user_approval", "paused", "pause_reason", "pause_timestamp",
+        "llm_usage", "queue_position",
+    )
+    # Containers a coalesced follower shares with its leader, and fields it keeps its own value of
+    _SHARED = ("_agent_values", "completed_agents", "step_messages", "llm_usage")
+    _UNMIRRORED = ("problem", "created_at", "version")
+
+    def __init__(self, problem=""):
+        object.__setattr__(self, "_on_change", None)
+        object.__setattr__(self, "version", 0)
+        object.__setattr__(self, "_field_versions", [0] * len(self.STATUS_FIELDS))
+        object.__setattr__(self, "_snapshot", None)
         self.started = True
         self.current_agent = "project_manager"  # Start with project manager now
         self.completed_agents = []
-        self.agent_outputs = {
-            "project_manager": None,
-            "architect": None,
-            "security": None, 
-            "tester": None,
-            "reviewer": None
-        }
-        self.agent_status = {
-            "project_manager": "pending",
-            "architect": "pending",
-            "security": "pending",
-            "tester": "pending",
-            "reviewer": "pending"
-        }
-        self.agent_feedback = {
-            "project_manager": None,
-            "architect": None,
-            "security": None,
-            "tester": None,
-            "reviewer": None
-        }
-        self.revision_counts = {
-            "project_manager": 0,
-            "architect": 0,
-            "security": 0,
-            "tester": 0,
-            "reviewer": 0
-        }
+        self.problem = problem  # Original problem statement
+        object.__setattr__(self, "_agent_values", [
+            UNSET if name in OPTIONAL_AGENTS else default
+            for default in self.AGENT_FIELDS.values() for name in AGENT_NAMES
+        ])
         
         # User approval fields
         self.awaiting_user_approval = False
@@ -59,37 +73,380 @@ class TaskStatus:
         self.awaiting_feedback = False
         
         self.progress = 0  # Progress percentage 0-100
-        self.step_messages = []  # List of progress messages
+        self.step_messages = MessageLog()  # Bounded log of progress messages
         self.created_at = time.time()  # Timestamp when task was created
         self.updated_at = time.time()  # Timestamp of last update
         self.final_result = ""  # Initialize as empty string instead of None
         self.complete = False
         self.error = None
+        self.llm_usage = {}  # Per-agent LLM call, token and latency totals
+        self.queue_position = None  # 1-based place in the stage queue while waiting for a slot
+    
+    @property
+    def agent_outputs(self):
+        return AgentFields(self, "agent_outputs", 0)
+    
+    @property
+    def agent_status(self):
+        return AgentFields(self, "agent_status", len(AGENT_NAMES))
+    
+    @property
+    def agent_feedback(self):
+        return AgentFields(self, "agent_feedback", 2 * len(AGENT_NAMES))
+    
+    @property
+    def revision_counts(self):
+        return AgentFields(self, "revision_counts", 3 * len(AGENT_NAMES))
+    
+    def _changed(self, name=None):
+        # Lets the task store persist the change and notify its listeners
+        if self._on_change is not None:
+            self._on_change(name)
+    
+    def _field_changed(self, name):
+        index = _STATUS_FIELD_INDEX.get(name)
+        if index is not None:
+            version = self.version + 1
+            object.__setattr__(self, "version", version)
+            self._field_versions[index] = version
+        self._changed(name)
+    
+    def touch(self, *names):
+        """Record in-place changes, e.g. after completed_agents.append()"""
+        for name in names:
+            self._field_changed(name)
+    
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        self._field_changed(name)
+    
+    def follow(self, leader):
+        """Take on a coalesced leader's state, sharing the containers it changes in place"""
+        for name in self.__slots__:
+            if name in self._SHARED or not (name.startswith("_") or name in self._UNMIRRORED):
+                object.__setattr__(self, name, getattr(leader, name))
+        self.touch(*self.STATUS_FIELDS)
+    
+    def mirror(self, leader, name):
+        """Pick up a change the leader made to field `name`"""
+        if name in self.AGENT_FIELDS:
+            self.touch(name)
+        elif name in self._SHARED:
+            # Same container unless the leader replaced it
+            object.__setattr__(self, name, getattr(leader, name))
+            self.touch(name)
+        elif name in self.__slots__ and not (name.startswith("_") or name in self._UNMIRRORED):
+            setattr(self, name, getattr(leader, name))
+    
+    def unshare(self):
+        """Give a former follower its own copies of the leader's containers"""
+        object.__setattr__(self, "_agent_values", list(self._agent_values))
+        object.__setattr__(self, "completed_agents", list(self.completed_agents))
+        object.__setattr__(self, "step_messages", self.step_messages.copy())
+        object.__setattr__(self, "llm_usage", {agent: dict(usage) for agent, usage in self.llm_usage.items()})
+    
+    def changed_since(self, version):
+        """Status fields changed after `version`"""
+        return [
+            name for name, field_version in zip(self.STATUS_FIELDS, self._field_versions)
+            if field_version > version
+        ]
+    
+    def snapshot(self, build):
+        """Serialized status for the current version; `build(version)` only runs after a change"""
+        version = self.version
+        cached = self._snapshot
+        if cached is not None and cached[0] == version:
+            snapshot_stats["hits"] += 1
+            return version, cached[1]
+        snapshot_stats["misses"] += 1
+        body = build(version)
+        object.__setattr__(self, "_snapshot", (version, body))
+        return version, body
+    
+    def to_dict(self):
+        """Plain JSON-serialisable copy of the task's fields"""
+        data = {}
+        for name in (*self.__slots__, *self.AGENT_FIELDS):
+            if name.startswith("_"):
+                continue
+            value = getattr(self, name)
+            if isinstance(value, MessageLog):
+                data["step_messages_dropped"] = value.dropped
+                value = value.to_list()
+            elif isinstance(value, (dict, list, AgentFields)):
+                value = value.copy()
+            data[name] = value
+        return data
+    
+    @classmethod
+    def from_dict(cls, data):
+        task = cls()
+        for name, value in data.items():
+            if name in cls.AGENT_FIELDS:
+                fields = getattr(task, name)
+                for agent, agent_value in value.items():
+                    if agent_index(agent) is not None:
+                        fields[agent] = agent_value
+            elif name == "step_messages":
+                task.step_messages.extend_from(value)
+            elif name == "step_messages_dropped":
+                task.step_messages.dropped += value
+            elif name in cls.__slots__ and name not in ("version", "queue_position"):
+                setattr(task, name, value)
+        # Everything counts as changed at the restored version
+        version = max(data.get("version", 0), task.version)
+        object.__setattr__(task, "version", version)
+        object.__setattr__(task, "_field_versions", [version] * len(cls.STATUS_FIELDS))
+        return task
+
+_STATUS_FIELD_INDEX = {name: index for index, name in enumerate(TaskStatus.STATUS_FIELDS)}
+
+# Serialized /status snapshots served from cache vs rebuilt after a change
+snapshot_stats = {"hits": 0, "misses": 0}
+
+# Task tracking storage, backed by TASK_STORE_BACKEND (in-memory by default)
+tasks_store = create_task_store(TaskStatus.from_dict)
+
+def status_field(task, name):
+    """JSON-ready copy of one StatusResponse field"""
+    value = getattr(task, name)
+    if isinstance(value, (dict, list, AgentFields)):
+        return value.copy()
+    return value
+
+# Live task update events, keyed by task_id
+task_events = Broadcaster(maxsize=1000)
+# Not pushed as field events: messages get their own event and updated_at changes with everything
+_UNPUBLISHED_FIELDS = {"step_messages", "updated_at"}
+
+def _publish_task_change(task_id, field):
+    if field not in _STATUS_FIELD_INDEX or field in _UNPUBLISHED_FIELDS:
+        return
+    # Skip building the event when nobody is listening
+    if not task_events.subscriber_count(task_id):
+        return
+    task = tasks_store.get(task_id)
+    if task is not None:
+        task_events.publish(task_id, {
+            "type": "field", "field": field, "value": status_field(task, field), "version": task.version
+        })
+
+tasks_store.add_listener(_publish_task_change)
+
+# Long-poll waiters (/status/{task_id}/wait), woken on every status field change
+task_waiters = ConditionRegistry()
+
+def _wake_task_waiters(task_id, field):
+    if field in _STATUS_FIELD_INDEX and field != "step_messages":
+        task_waiters.notify(task_id)
+
+tasks_store.add_listener(_wake_task_waiters)
+
+def _publish_step(task_id, task):
+    """Push the task's latest step message to its live subscribers"""
+    if task_events.subscriber_count(task_id):
+        task_events.publish(task_id, {
+            "type": "step",
+            "seq": task.step_messages.total - 1,
+            "message": task.step_messages[-1],
+            "version": task.version
+        })
 
 # Helper function to update task status - moved outside of run_problem
-def update_task_status(task_id, message, progress_increment=0, agent=None, agent_status=None):
-    if task_id in tasks_store:
-        tasks_store[task_id].updated_at = time.time()
-        tasks_store[task_id].step_messages.append(message)
-        tasks_store[task_id].progress += progress_increment
-        # Cap progress at 100%
-        tasks_store[task_id].progress = min(tasks_store[task_id].progress, 100)
-        
-        # Update agent status if provided
-        if agent and agent_status:
-            tasks_store[task_id].agent_status[agent] = agent_status
-            
-        print(f"Task {task_id} update: {message} (progress: {tasks_store[task_id].progress}%)")
+def update_task_status(task_id, message, progress_increment=0, agent=None, agent_status=None, args=None):
+    """Log a step message and update progress; `message` is a str.format template when `args` is given"""
+    task = tasks_store.get(task_id)
+    if task is None:
+        return
+    task.step_messages.add(message, args)
+    task.touch("step_messages")
+    task.updated_at = time.time()
+    # Cap progress at 100%
+    task.progress = min(task.progress + progress_increment, 100)
+    
+    # Update agent status if provided; pseudo-agents such as "complete" have no slot
+    if agent and agent_status and agent_index(agent) is not None:
+        task.agent_status[agent] = agent_status
+    
+    _publish_step(task_id, task)
+    
+    print(f"Task {task_id} update: {message.format(*args) if args else message} (progress: {task.progress}%)")
+
+def _record_llm_usage(record):
+    """Accumulate a finished LLM call into its task's per-agent usage totals"""
+    task = tasks_store.get(record.task_id) if record.task_id else None
+    if task is None:
+        return
+    usage = task.llm_usage.setdefault(record.agent or "unknown", {
+        "calls": 0, "cached": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+        "latency": 0.0, "queue_wait": 0.0, "request_bytes": 0, "response_bytes": 0,
+    })
+    usage["calls"] += 1
+    usage["cached"] += record.cached
+    usage["errors"] += record.error is not None
+    usage["latency"] += record.latency or 0.0
+    if not record.cached:
+        usage["prompt_tokens"] += record.prompt_tokens or 0
+        usage["completion_tokens"] += record.completion_tokens or 0
+        usage["queue_wait"] += record.queue_wait
+        usage["request_bytes"] += record.request_bytes
+        usage["response_bytes"] += record.response_bytes
+    task.touch("llm_usage")
+
+llm_metrics.add_listener(_record_llm_usage)
+
+def _record_queue_position(task_id, position):
+    task = tasks_store.get(task_id)
+    if task is not None and task.queue_position != position:
+        task.queue_position = position
+
+stage_scheduler.add_listener(_record_queue_position)
+
+def _mirror_to_followers(task_id, field):
+    """Carry a coalesced leader's change over to the tasks following it"""
+    followers = problem_coalescer.followers(task_id)
+    if not followers:
+        return
+    leader = tasks_store.get(task_id)
+    if leader is None:
+        return
+    for follower_id in followers:
+        follower = tasks_store.get(follower_id)
+        if follower is not None:
+            follower.mirror(leader, field)
+            if field == "step_messages":
+                _publish_step(follower_id, follower)
+    # A finished run takes no new followers; the ones it has keep its result as their own
+    if field in ("complete", "error") and getattr(leader, field):
+        for follower_id in problem_coalescer.disband(task_id):
+            follower = tasks_store.get(follower_id)
+            if follower is not None:
+                follower.unshare()
+
+tasks_store.add_listener(_mirror_to_followers)
+
+def follow_task(task_id, leader_id):
+    """Make a new task mirror the coalesced run of `leader_id`"""
+    tasks_store[task_id].follow(tasks_store[leader_id])
+    problem_coalescer.follow(task_id, leader_id)
+
+def detach_task(task_id):
+    """Take a task out of its coalesced group; returns the follower tasks now running on their own"""
+    detached = problem_coalescer.detach(task_id)
+    for follower_id in detached:
+        follower = tasks_store.get(follower_id)
+        if follower is not None:
+            follower.unshare()
+    return [follower_id for follower_id in detached if follower_id in tasks_store]
+
+# Cancellation tokens of running agent stages, keyed by (task_id, agent)
+stage_tokens = CancellationRegistry()
+
+def cancel_task_stages(task_id, reason="cancelled", agents=None):
+    """Stop a task's running stages, or only those of `agents`, at their next checkpoint"""
+    return stage_tokens.cancel(lambda key: key[0] == task_id and (agents is None or key[1] in agents), reason)
+
+# Live agent output streams, keyed by (task_id, agent)
+agent_streams = Broadcaster(maxsize=10000)
+active_agent_streams = set()
+# Streamed tokens reach the store and the live stream in batches, at most this old or this long
+AGENT_STREAM_FLUSH_MS = config("AGENT_STREAM_FLUSH_MS", default=50, cast=int)
+AGENT_STREAM_FLUSH_CHARS = config("AGENT_STREAM_FLUSH_CHARS", default=512, cast=int)
+
+class AgentStreamSink:
+    """on_token sink that appends an agent's streamed tokens to its output in batches
+
+    Each write to agent_outputs notifies store listeners, mirrors to followers and
+    marks the task dirty, so tokens are buffered and written (and published) as one
+    chunk per AGENT_STREAM_FLUSH_MS or AGENT_STREAM_FLUSH_CHARS. The LLM flushes the
+    rest at the end of every call.
+    """
+    
+    def __init__(self, task_id, agent):
+        self.task_id = task_id
+        self.agent = agent
+        self._pending = []
+        self._pending_chars = 0
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def __call__(self, token):
+        with self._lock:
+            self._pending.append(token)
+            self._pending_chars += len(token)
+            if (self._pending_chars >= AGENT_STREAM_FLUSH_CHARS
+                    or (time.monotonic() - self._flushed_at) * 1000 >= AGENT_STREAM_FLUSH_MS):
+                self._flush()
+    
+    def flush(self):
+        with self._lock:
+            self._flush()
+    
+    def discard(self):
+        with self._lock:
+            self._pending.clear()
+            self._pending_chars = 0
+    
+    def _flush(self):
+        self._flushed_at = time.monotonic()
+        if not self._pending:
+            return
+        chunk = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        task = tasks_store.get(self.task_id)
+        if task is None:
+            return
+        current = task.agent_outputs.get(self.agent) or ""
+        task.agent_outputs[self.agent] = current + chunk
+        agent_streams.publish((self.task_id, self.agent), {"type": "token", "offset": len(current), "token": chunk})
+
+_agent_stream_sinks = {}
+
+def begin_agent_stream(task_id, agent):
+    """Reset an agent's output and return a sink that appends streamed tokens to it"""
+    if task_id not in tasks_store:
+        return None
+    tasks_store[task_id].agent_outputs[agent] = ""
+    active_agent_streams.add((task_id, agent))
+    agent_streams.publish((task_id, agent), {"type": "reset"})
+    sink = _agent_stream_sinks[(task_id, agent)] = AgentStreamSink(task_id, agent)
+    return sink
+
+def end_agent_stream(task_id, agent):
+    """Close the live stream for an agent once its stage has finished"""
+    # Tokens still buffered belong to a call that never finished; the stage has
+    # stored its final output by now, so they must not be appended to it
+    sink = _agent_stream_sinks.pop((task_id, agent), None)
+    if sink is not None:
+        sink.discard()
+    active_agent_streams.discard((task_id, agent))
+    agent_streams.close((task_id, agent))
+
+def is_agent_streaming(task_id, agent):
+    return (task_id, agent) in active_agent_streams
 
 class CustomCrew:
-    def __init__(self, user_input, task_id=None, feedback=None, restart_agent=None):
+    def __init__(self, user_input, task_id=None, feedback=None, restart_agent=None, cancel_token=None):
         self.user_input = user_input
         self.task_id = task_id
         self.feedback = feedback
         self.restart_agent = restart_agent
+        self.cancel_token = cancel_token
+        self.on_token = None
         
     def run_with_feedback(self, agent, feedback):
         """Restart a specific agent with feedback"""
+        if self.task_id:
+            self.on_token = begin_agent_stream(self.task_id, agent)
+        try:
+            return self._dispatch_with_feedback(agent, feedback)
+        finally:
+            if self.task_id:
+                end_agent_stream(self.task_id, agent)
+    
+    def _dispatch_with_feedback(self, agent, feedback):
         if agent == "project_manager":
             return self.run_project_manager_with_feedback(feedback)
         elif agent == "architect":
@@ -110,14 +467,15 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id, 
-                    f"Restarting project manager agent with feedback: {feedback}", 
+                    "Restarting project manager agent with feedback: {}", 
                     5, 
                     "project_manager", 
-                    "in_progress"
+                    "in_progress",
+                    args=(feedback,)
                 )
             
             # Get the original problem description
-            problem = tasks_store[self.task_id].step_messages[0].replace("Task created: ", "")
+            problem = tasks_store[self.task_id].problem
             
             try:
                 # First try with DSPy
@@ -145,15 +503,19 @@ class CustomCrew:
                     "in_progress"
                 )
                 
+            except LLMError:
+                # The backend itself is failing; a CrewAI fallback would hit it again
+                raise
             except Exception as dspy_error:
                 # Log the DSPy error
                 print(f"Error using DSPy with feedback: {str(dspy_error)}. Falling back to CrewAI.")
                 update_task_status(
                     self.task_id,
-                    f"DSPy processing failed: {str(dspy_error)}. Falling back to CrewAI.",
+                    "DSPy processing failed: {}. Falling back to CrewAI.",
                     0,
                     "project_manager",
-                    "in_progress"
+                    "in_progress",
+                    args=(str(dspy_error),)
                 )
                 
                 # Fall back to CrewAI
@@ -161,7 +523,7 @@ class CustomCrew:
                 from tasks.tasks import CustomTasks
                 from tools.crew_tools import project_manager_tools
                 
-                agents = CustomAgents()
+                agents = CustomAgents(on_token=self.on_token, priority=INTERACTIVE, task_id=self.task_id, cancel_token=self.cancel_token)
                 tasks_obj = CustomTasks()
                 
                 # Create PM agent
@@ -200,10 +562,11 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id,
-                    f"Error during revision: {str(e)}",
+                    "Error during revision: {}",
                     0,
                     "project_manager",
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[self.task_id].error = str(e)
             return error_msg
@@ -211,17 +574,18 @@ class CustomCrew:
     def run_architect_with_feedback(self, feedback):
         """Run architect agent with feedback"""
         try:
-            agents = CustomAgents()
+            agents = CustomAgents(on_token=self.on_token, priority=INTERACTIVE, task_id=self.task_id, cancel_token=self.cancel_token)
             tasks = CustomTasks()
             
             # Update task status
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id, 
-                    f"Restarting architect agent with feedback: {feedback}", 
+                    "Restarting architect agent with feedback: {}", 
                     5, 
                     "architect", 
-                    "in_progress"
+                    "in_progress",
+                    args=(feedback,)
                 )
             
             # Create architect agent with feedback
@@ -260,10 +624,11 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id,
-                    f"Error during revision: {str(e)}",
+                    "Error during revision: {}",
                     0,
                     "architect",
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[self.task_id].error = str(e)
             return error_msg
@@ -271,17 +636,18 @@ class CustomCrew:
     def run_programmer_with_feedback(self, feedback):
         """Run programmer agent with feedback"""
         try:
-            agents = CustomAgents()
+            agents = CustomAgents(on_token=self.on_token, priority=INTERACTIVE, task_id=self.task_id, cancel_token=self.cancel_token)
             tasks = CustomTasks()
             
             # Update task status
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id, 
-                    f"Restarting programmer agent with feedback: {feedback}", 
+                    "Restarting programmer agent with feedback: {}", 
                     5, 
                     "programmer", 
-                    "in_progress"
+                    "in_progress",
+                    args=(feedback,)
                 )
             
             # Get architect output
@@ -329,10 +695,11 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id,
-                    f"Error during revision: {str(e)}",
+                    "Error during revision: {}",
                     0,
                     "programmer",
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[self.task_id].error = str(e)
             return error_msg
@@ -340,28 +707,29 @@ class CustomCrew:
     def run_tester_with_feedback(self, feedback):
         """Run tester agent with feedback"""
         try:
-            agents = CustomAgents()
+            agents = CustomAgents(on_token=self.on_token, priority=INTERACTIVE, task_id=self.task_id, cancel_token=self.cancel_token)
             tasks = CustomTasks()
             
             # Update task status
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id, 
-                    f"Restarting tester agent with feedback: {feedback}", 
+                    "Restarting tester agent with feedback: {}", 
                     5, 
                     "tester", 
-                    "in_progress"
+                    "in_progress",
+                    args=(feedback,)
                 )
             
-            # Get programmer output
-            programmer_output = tasks_store[self.task_id].agent_outputs.get("programmer", "No implementation provided")
+            # Get architect output, the tester's pipeline input
+            architect_output = tasks_store[self.task_id].agent_outputs.get("architect", "No architecture provided")
             
             # Create tester agent with feedback
             tester_agent = agents.tester_agent(tester_tools)
             
-            # Create a context task to provide the implementation and feedback
+            # Create a context task to provide the architecture and feedback
             context_task = Task(
-                description=f"Implementation: {programmer_output}\n\nPrevious testing feedback: {feedback}",
+                description=f"Architecture: {architect_output}\n\nPrevious testing feedback: {feedback}",
                 agent=tester_agent,
                 expected_output="Context information for testing with feedback."
             )
@@ -398,10 +766,11 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id,
-                    f"Error during revision: {str(e)}",
+                    "Error during revision: {}",
                     0,
                     "tester",
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[self.task_id].error = str(e)
             return error_msg
@@ -409,22 +778,23 @@ class CustomCrew:
     def run_reviewer_with_feedback(self, feedback):
         """Run reviewer agent with feedback"""
         try:
-            agents = CustomAgents()
+            agents = CustomAgents(on_token=self.on_token, priority=INTERACTIVE, task_id=self.task_id, cancel_token=self.cancel_token)
             tasks = CustomTasks()
             
             # Update task status
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id, 
-                    f"Restarting reviewer agent with feedback: {feedback}", 
+                    "Restarting reviewer agent with feedback: {}", 
                     5, 
                     "reviewer", 
-                    "in_progress"
+                    "in_progress",
+                    args=(feedback,)
                 )
             
             # Get previous outputs
             architect_output = tasks_store[self.task_id].agent_outputs.get("architect", "No architecture provided")
-            programmer_output = tasks_store[self.task_id].agent_outputs.get("programmer", "No implementation provided")
+            security_output = tasks_store[self.task_id].agent_outputs.get("security", "No security review provided")
             tester_output = tasks_store[self.task_id].agent_outputs.get("tester", "No tests provided")
             
             # Create reviewer agent with feedback
@@ -437,10 +807,10 @@ class CustomCrew:
                 expected_output="Context information for architecture review."
             )
             
-            programmer_context = Task(
-                description=f"Implementation: {programmer_output}",
+            security_context = Task(
+                description=f"Security review: {security_output}",
                 agent=reviewer_agent,
-                expected_output="Context information for implementation review."
+                expected_output="Context information for security review."
             )
             
             tester_context = Task(
@@ -459,7 +829,7 @@ class CustomCrew:
             reviewing_task = tasks.reviewing_task(
                 reviewer_agent, 
                 reviewer_tools, 
-                [architect_context, programmer_context, tester_context, feedback_context]
+                [architect_context, security_context, tester_context, feedback_context]
             )
             
             # Create mini crew with just the reviewer task
@@ -491,17 +861,18 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 update_task_status(
                     self.task_id,
-                    f"Error during revision: {str(e)}",
+                    "Error during revision: {}",
                     0,
                     "reviewer",
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[self.task_id].error = str(e)
             return error_msg
     
     def run(self):
         try:
-            agents = CustomAgents()
+            agents = CustomAgents(task_id=self.task_id)
             tasks = CustomTasks()
 
             # Update task status to show we're starting with architect
@@ -548,6 +919,7 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 tasks_store[self.task_id].agent_outputs["architect"] = "Architecture task completed"
                 tasks_store[self.task_id].completed_agents.append("architect")
+                tasks_store[self.task_id].touch("completed_agents")
                 tasks_store[self.task_id].current_agent = "programmer"
             
             # Update status before moving to testing task
@@ -574,6 +946,7 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 tasks_store[self.task_id].agent_outputs["programmer"] = "Programming task completed"
                 tasks_store[self.task_id].completed_agents.append("programmer")
+                tasks_store[self.task_id].touch("completed_agents")
                 tasks_store[self.task_id].current_agent = "tester"
             
             # Update status before moving to reviewing task
@@ -600,6 +973,7 @@ class CustomCrew:
             if self.task_id and self.task_id in tasks_store:
                 tasks_store[self.task_id].agent_outputs["tester"] = "Testing task completed"
                 tasks_store[self.task_id].completed_agents.append("tester")
+                tasks_store[self.task_id].touch("completed_agents")
                 tasks_store[self.task_id].current_agent = "reviewer"
 
             # Create crew with all agents and tasks
@@ -629,6 +1003,7 @@ class CustomCrew:
                 )
                 tasks_store[self.task_id].agent_outputs["reviewer"] = "Review task completed"
                 tasks_store[self.task_id].completed_agents.append("reviewer")
+                tasks_store[self.task_id].touch("completed_agents")
                 # Convert the result to string to ensure it can be properly serialized
                 tasks_store[self.task_id].final_result = str(result) if result is not None else ""
                 tasks_store[self.task_id].complete = True
@@ -645,10 +1020,11 @@ class CustomCrew:
                 # Update the task status with the error
                 update_task_status(
                     self.task_id,
-                    f"Error: {str(e)}",
+                    "Error: {}",
                     0,
                     tasks_store[self.task_id].current_agent,
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[self.task_id].error = str(e)
                 tasks_store[self.task_id].complete = True  # Mark as complete with error
@@ -666,10 +1042,10 @@ def generate_full_plan(task_id: str):
     task = tasks_store[task_id]
     
     # Get the original problem description
-    problem = task.step_messages[0].replace("Task created: ", "")
+    problem = task.problem
     
     # Create directory structure
-    output_dir = f"{task_id}"
+    output_dir = task_output_dir(task_id)
     os.makedirs(output_dir, exist_ok=True)
     
     # Get all agent outputs
@@ -0,0 +1,129 @@
+from typing import Any, Dict, Iterable, List, Tuple
+
+# agent_status values of a stage that has been handed to the scheduler but has not produced output;
+# "paused" is only found on tasks paused before /pause stopped overwriting the stage status
+STARTED_STATUSES = ("queued", "in_progress", "paused")
+# agent_status values of a stage whose output is waiting at, or has passed, its approval gate
+FINISHED_STATUSES = ("awaiting_approval", "approved", "completed")
+
+
+class Stage:
+    """One agent stage and the stages whose approved output it consumes"""
+
+    __slots__ = ("name", "inputs")
+
+    def __init__(self, name: str, inputs: Iterable[str] = ()):
+        self.name = name
+        self.inputs = tuple(inputs)
+
+
+class Pipeline:
+    """Declarative stage graph with an approval gate after every stage
+
+    The graph has two kinds of nodes: stages, which run an agent, and gates,
+    which pass once the user approves that stage's output. A stage depends on
+    the gates of its inputs, so every stage whose inputs are approved can run
+    at the same time; the task is done when every gate has passed.
+    """
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate pipeline stage {stage.name!r}")
+            self.stages[stage.name] = stage
+        for stage in self.stages.values():
+            unknown = [name for name in stage.inputs if name not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage {stage.name!r} has unknown inputs {unknown}")
+        self.order = self._topological_order()
+        self.nodes = self._nodes()
+
+    def _topological_order(self) -> Tuple[str, ...]:
+        order: List[str] = []
+        visiting = set()
+
+        def visit(name: str) -> None:
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline has a cycle through {name!r}")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return tuple(order)
+
+    @staticmethod
+    def gate(name: str) -> str:
+        """Node name of a stage's approval gate"""
+        return f"{name}:approval"
+
+    def _nodes(self) -> Dict[str, Tuple[str, ...]]:
+        # node -> nodes it waits for
+        nodes = {}
+        for name in self.order:
+            nodes[name] = tuple(self.gate(dependency) for dependency in self.stages[name].inputs)
+            nodes[self.gate(name)] = (name,)
+        return nodes
+
+    def successors(self, name: str) -> List[str]:
+        """Stages that consume `name`'s output"""
+        return [stage for stage in self.order if name in self.stages[stage].inputs]
+
+    def approved(self, task: Any, name: str) -> bool:
+        return name in task.completed_agents
+
+    def passed(self, task: Any, node: str) -> bool:
+        """Whether a node is done: a gate once approved, a stage once it has produced output"""
+        name, _, kind = node.partition(":")
+        if kind:
+            return self.approved(task, name)
+        return self.approved(task, name) or task.agent_status[name] in FINISHED_STATUSES
+
+    def ready(self, task: Any) -> List[str]:
+        """Pending stages whose input gates have all passed"""
+        return [
+            name for name in self.order
+            if task.agent_status[name] == "pending"
+            and all(self.passed(task, node) for node in self.nodes[name])
+        ]
+
+    def speculatable(self, task: Any) -> List[str]:
+        """Pending stages whose inputs have all produced output but are not all approved yet"""
+        return [
+            name for name in self.order
+            if task.agent_status[name] == "pending"
+            and all(self.passed(task, dependency) for dependency in self.stages[name].inputs)
+            and not all(self.approved(task, dependency) for dependency in self.stages[name].inputs)
+        ]
+
+    def started(self, task: Any) -> List[str]:
+        """Stages handed to the scheduler that have not produced output yet"""
+        return [name for name in self.order if task.agent_status[name] in STARTED_STATUSES]
+
+    def active(self, task: Any) -> List[str]:
+        """Stages running or waiting at their approval gate"""
+        return [
+            name for name in self.order
+            if not self.approved(task, name) and task.agent_status[name] in STARTED_STATUSES + ("awaiting_approval",)
+        ]
+
+    def finished(self, task: Any) -> bool:
+        """True once every approval gate has passed"""
+        return all(self.approved(task, name) for name in self.order)
+
+
+# The agent pipeline behind /run and /approve: security and tester review the
+# architecture independently and run side by side
+PIPELINE = Pipeline((
+    Stage("project_manager"),
+    Stage("architect", inputs=("project_manager",)),
+    Stage("security", inputs=("architect",)),
+    Stage("tester", inputs=("architect",)),
+    Stage("reviewer", inputs=("architect", "security", "tester")),
+))
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Set
+
+# Sentinel delivered to subscribers when a channel is closed
+CLOSED = None
+
+
+class Subscription:
+    """A subscriber's bounded queue, bound to the event loop that created it"""
+
+    def __init__(self, key: Hashable, maxsize: int):
+        self.key = key
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, item: Any) -> None:
+        # Slow consumers lose the oldest items rather than blocking publishers
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+    async def get(self, timeout: Optional[float] = None) -> Any:
+        """Wait for the next item; raises asyncio.TimeoutError after `timeout`"""
+        if timeout is None:
+            return await self.queue.get()
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class Broadcaster:
+    """Fan out items published from any thread to asyncio subscribers by key"""
+
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscribers: Dict[Hashable, Set[Subscription]] = {}
+
+    def subscribe(self, key: Hashable) -> Subscription:
+        subscription = Subscription(key, self.maxsize)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.key]
+
+    def subscriber_count(self, key: Hashable) -> int:
+        with self._lock:
+            return len(self._subscribers.get(key, ()))
+
+    def publish(self, key: Hashable, item: Any) -> None:
+        """Deliver an item to every subscriber of `key`; safe from worker threads"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, item)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe(subscription)
+
+    def close(self, key: Hashable) -> None:
+        """Tell every subscriber of `key` that no more items will follow"""
+        self.publish(key, CLOSED)
+
+
+class _Waiters:
+    __slots__ = ("loop", "condition", "count")
+
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.condition = asyncio.Condition()
+        self.count = 0
+
+    def wake(self) -> None:
+        # Runs on the waiters' loop; notify_all needs the condition's lock
+        self.loop.create_task(self._notify_all())
+
+    async def _notify_all(self) -> None:
+        async with self.condition:
+            self.condition.notify_all()
+
+
+class ConditionRegistry:
+    """Per-key asyncio conditions that worker threads can fire
+
+    Waiters park on the event loop, so any number of them share one thread;
+    a key's condition only exists while someone is waiting on it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[Hashable, _Waiters] = {}
+
+    def waiter_count(self, key: Hashable) -> int:
+        with self._lock:
+            waiters = self._waiters.get(key)
+            return waiters.count if waiters is not None else 0
+
+    async def wait_for(self, key: Hashable, predicate: Callable[[], bool], timeout: Optional[float]) -> bool:
+        """Wait until `predicate()` is true, re-checking whenever `key` is notified; False on timeout"""
+        with self._lock:
+            waiters = self._waiters.get(key)
+            if waiters is None:
+                waiters = self._waiters[key] = _Waiters()
+            waiters.count += 1
+        try:
+            async with waiters.condition:
+                await asyncio.wait_for(waiters.condition.wait_for(predicate), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                waiters.count -= 1
+                if not waiters.count:
+                    del self._waiters[key]
+
+    def notify(self, key: Hashable) -> None:
+        """Wake everyone waiting on `key`; safe from worker threads"""
+        with self._lock:
+            waiters = self._waiters.get(key)
+        if waiters is None:
+            return
+        try:
+            waiters.loop.call_soon_threadsafe(waiters.wake)
+        except RuntimeError:
+            # The waiters' loop has shut down
+            pass
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import re
+import shutil
+from typing import Any, Dict, List
+from decouple import config
+from functions.task_store import TaskStore
+from agents.step_journal import stage_journal
+
+# Retention of finished (complete or errored) tasks, in seconds since their last update
+TASK_ARCHIVE_AFTER = config("TASK_ARCHIVE_AFTER", default=3600, cast=float)
+TASK_DROP_AFTER = config("TASK_DROP_AFTER", default=7 * 24 * 3600, cast=float)
+TASK_RETENTION_INTERVAL = config("TASK_RETENTION_INTERVAL", default=60, cast=float)
+# Per-task output directories written on approval and by generate_full_plan
+TASK_OUTPUT_ROOT = config("TASK_OUTPUT_ROOT", default=".")
+TASK_OUTPUT_QUOTA_BYTES = config("TASK_OUTPUT_QUOTA_BYTES", default=1024 * 1024 * 1024, cast=int)  # 0 disables
+
+# Task ids are uuid4 strings; only directories named like one are ever collected
+_TASK_DIR_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+retention_stats: Dict[str, Any] = {
+    "runs": 0,
+    "archived": 0,
+    "dropped": 0,
+    "output_dirs_removed": 0,
+    "output_bytes": 0,
+}
+
+
+def task_output_dir(task_id: str) -> str:
+    """Directory holding a task's approved outputs and full plan"""
+    return os.path.join(TASK_OUTPUT_ROOT, task_id)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def remove_output_dir(task_id: str) -> bool:
+    path = task_output_dir(task_id)
+    if not os.path.isdir(path):
+        return False
+    shutil.rmtree(path, ignore_errors=True)
+    return True
+
+
+def enforce_output_quota(store: TaskStore, quota: int = TASK_OUTPUT_QUOTA_BYTES) -> List[str]:
+    """Delete the oldest output directories of finished or forgotten tasks until under quota"""
+    try:
+        names = [name for name in os.listdir(TASK_OUTPUT_ROOT) if _TASK_DIR_RE.match(name)]
+    except FileNotFoundError:
+        return []
+    dirs = []
+    for name in names:
+        path = task_output_dir(name)
+        if os.path.isdir(path):
+            dirs.append((os.path.getmtime(path), name, _dir_size(path)))
+    total = sum(size for _, _, size in dirs)
+    retention_stats["output_bytes"] = total
+    if not quota or total <= quota:
+        return []
+
+    removed = []
+    for _, task_id, size in sorted(dirs):
+        if total <= quota:
+            break
+        # Never collect the outputs of a task that is still in progress
+        if store.is_active(task_id):
+            continue
+        if remove_output_dir(task_id):
+            total -= size
+            removed.append(task_id)
+    retention_stats["output_bytes"] = total
+    return removed
+
+
+def run_retention(store: TaskStore) -> Dict[str, Any]:
+    """One retention pass: archive idle tasks, drop expired ones with their outputs and journals, apply the disk quota"""
+    archived, dropped = store.sweep(TASK_ARCHIVE_AFTER, TASK_DROP_AFTER)
+    removed = [task_id for task_id in dropped if remove_output_dir(task_id)]
+    if stage_journal is not None:
+        for task_id in dropped:
+            stage_journal.forget(task_id)
+    removed += enforce_output_quota(store)
+    retention_stats["runs"] += 1
+    retention_stats["archived"] += len(archived)
+    retention_stats["dropped"] += len(dropped)
+    retention_stats["output_dirs_removed"] += len(removed)
+    if archived or dropped or removed:
+        print(f"Task retention: archived {len(archived)}, dropped {len(dropped)}, removed {len(removed)} output dir(s)")
+    return retention_stats
+
+
+async def retention_loop(store: TaskStore) -> None:
+    """Run retention passes every TASK_RETENTION_INTERVAL seconds until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(run_retention, store)
+        except Exception as e:
+            print(f"Task retention pass failed: {str(e)}")
+        await asyncio.sleep(TASK_RETENTION_INTERVAL)
@@ -0,0 +1,198 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from decouple import config
+from functions.executor import STAGE_WORKERS
+
+# Agent stages allowed to run at once; later ones wait in the priority queue
+STAGE_MAX_IN_FLIGHT = config("STAGE_MAX_IN_FLIGHT", default=STAGE_WORKERS, cast=int)
+# Queued stages at which /run starts turning new tasks away with 429
+STAGE_QUEUE_HIGH_WATER = config("STAGE_QUEUE_HIGH_WATER", default=50, cast=int)
+
+# Stage priorities, most urgent first: work a user is waiting on outranks new submissions
+REVISION = 0  # Re-running an agent with user feedback
+CONTINUATION = 1  # Next stage after an approval, or a resumed task
+NEW_TASK = 2  # First stage of a freshly submitted task
+
+# Assumed stage duration until one has been measured
+_DEFAULT_STAGE_SECONDS = 30.0
+
+
+class StageWithdrawn(Exception):
+    """Raised to a queued stage that was taken out of the queue before it started"""
+
+
+class _Entry:
+    __slots__ = ("priority", "seq", "task_id", "future", "withdrawable")
+
+    def __init__(self, priority: int, seq: int, task_id: str, future: asyncio.Future, withdrawable: bool = False):
+        self.priority = priority
+        self.seq = seq
+        self.task_id = task_id
+        self.future = future
+        self.withdrawable = withdrawable
+
+    def __lt__(self, other: "_Entry") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class StageScheduler:
+    """Admission control for agent stages: a max-in-flight limit in front of a priority queue
+
+    Lives on the event loop; stages hold a slot for their whole run, including
+    the time spent on the stage executor. Listeners are told each queued task's
+    1-based position whenever it changes, and None once the task starts.
+    """
+
+    def __init__(self, max_in_flight: int = STAGE_MAX_IN_FLIGHT, high_water: int = STAGE_QUEUE_HIGH_WATER):
+        self.max_in_flight = max_in_flight
+        self.high_water = high_water
+        self.in_flight = 0
+        self._queue: List[_Entry] = []
+        self._seq = itertools.count()
+        self._positions: Dict[str, int] = {}
+        self._listeners: List[Callable[[str, Optional[int]], None]] = []
+        self._stage_seconds = _DEFAULT_STAGE_SECONDS
+        self.admitted = 0
+        self.rejected = 0
+        self.withdrawn = 0
+
+    def add_listener(self, listener: Callable[[str, Optional[int]], None]) -> None:
+        """Call `listener(task_id, position)` when a task's queue position changes"""
+        self._listeners.append(listener)
+
+    def _notify(self, task_id: str, position: Optional[int]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(task_id, position)
+            except Exception as e:
+                print(f"Scheduler listener failed: {str(e)}")
+
+    def _update_positions(self) -> None:
+        positions = {}
+        for rank, entry in enumerate(sorted(self._queue), start=1):
+            positions.setdefault(entry.task_id, rank)
+        for task_id in self._positions.keys() - positions.keys():
+            self._notify(task_id, None)
+        for task_id, position in positions.items():
+            if self._positions.get(task_id) != position:
+                self._notify(task_id, position)
+        self._positions = positions
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def position(self, task_id: str) -> Optional[int]:
+        return self._positions.get(task_id)
+
+    def saturated(self) -> bool:
+        """True when new submissions should be turned away"""
+        return len(self._queue) >= self.high_water
+
+    def retry_after(self) -> int:
+        """Seconds a rejected client should wait: roughly how long the queue takes to drain"""
+        rounds = (len(self._queue) + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(rounds * self._stage_seconds))
+
+    def reject(self) -> None:
+        self.rejected += 1
+
+    def try_acquire(self, reserve: int = 0) -> bool:
+        """Take a slot only if one is free right now with `reserve` more left over; never queues
+
+        For optional work that must not delay queued stages; pair with release().
+        """
+        if self._queue or self.in_flight + reserve >= self.max_in_flight:
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self) -> None:
+        self._release()
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        while self._queue and self.in_flight < self.max_in_flight:
+            entry = heapq.heappop(self._queue)
+            if entry.future.done():
+                continue  # The waiter was cancelled
+            self.in_flight += 1
+            entry.future.set_result(None)
+        self._update_positions()
+
+    def withdraw(self, task_id: str) -> int:
+        """Take a task's queued stage runs (see run()) out of the queue; returns how many"""
+        withdrawn = [
+            entry for entry in self._queue
+            if entry.task_id == task_id and entry.withdrawable and not entry.future.done()
+        ]
+        if not withdrawn:
+            return 0
+        for entry in withdrawn:
+            entry.future.set_exception(StageWithdrawn(task_id))
+        self._queue = [entry for entry in self._queue if entry not in withdrawn]
+        heapq.heapify(self._queue)
+        self.withdrawn += len(withdrawn)
+        self._update_positions()
+        return len(withdrawn)
+
+    @asynccontextmanager
+    async def slot(self, task_id: str, priority: int = NEW_TASK, withdrawable: bool = False) -> AsyncIterator[None]:
+        """Hold one of the in-flight slots for the body of the `async with` block
+
+        A withdrawable waiter raises StageWithdrawn instead of entering the
+        block if withdraw() drops it while it is queued.
+        """
+        if self.in_flight < self.max_in_flight and not self._queue:
+            self.in_flight += 1
+        else:
+            entry = _Entry(priority, next(self._seq), task_id, asyncio.get_running_loop().create_future(), withdrawable)
+            heapq.heappush(self._queue, entry)
+            self._update_positions()
+            try:
+                await entry.future
+            except asyncio.CancelledError:
+                if entry.future.done() and not entry.future.cancelled():
+                    # Granted a slot just as the waiter was cancelled; hand it on
+                    self._release()
+                elif entry in self._queue:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._update_positions()
+                raise
+        self.admitted += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            # Smoothed stage duration, used for Retry-After
+            self._stage_seconds += 0.2 * (time.monotonic() - started - self._stage_seconds)
+            self._release()
+
+    async def run(self, task_id: str, priority: int, stage: Callable[..., Any], *args: Any) -> Any:
+        """Await `stage(*args)` once a slot is free; None without running it if withdrawn meanwhile"""
+        try:
+            async with self.slot(task_id, priority, withdrawable=True):
+                return await stage(*args)
+        except StageWithdrawn:
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._queue),
+            "high_water": self.high_water,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "withdrawn": self.withdrawn,
+            "avg_stage_seconds": self._stage_seconds,
+        }
+
+
+# Shared by every route that starts an agent stage
+stage_scheduler = StageScheduler()
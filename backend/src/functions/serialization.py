@@ -0,0 +1,14 @@
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is several times slower
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON encoding of `value` as UTF-8 bytes"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
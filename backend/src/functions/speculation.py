@@ -0,0 +1,128 @@
+import asyncio
+from concurrent.futures import Future
+from functools import partial
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+from decouple import config
+from agents.cancellation import CancellationToken
+from functions.executor import stage_executor
+from functions.scheduler import stage_scheduler
+
+# Opt-in: run the next stage on output that is still awaiting approval
+PIPELINE_SPECULATION = config("PIPELINE_SPECULATION", default=False, cast=bool)
+# Speculative stages running at once across all tasks
+SPECULATION_MAX_IN_FLIGHT = config("SPECULATION_MAX_IN_FLIGHT", default=1, cast=int)
+# Stage slots speculation always leaves free for approved work
+SPECULATION_RESERVED_SLOTS = config("SPECULATION_RESERVED_SLOTS", default=1, cast=int)
+
+
+class Speculation:
+    __slots__ = ("fingerprint", "future", "token")
+
+    def __init__(self, fingerprint: Hashable, future: Future, token: Optional[CancellationToken]):
+        self.fingerprint = fingerprint
+        self.future = future
+        self.token = token
+
+
+class Speculator:
+    """Runs pipeline stages ahead of approval and hands their results over once approved
+
+    A speculative stage only starts when the stage scheduler has nothing queued
+    and more than `reserved_slots` slots free, and holds its slot until the
+    work finishes, so it never delays approved stages. Each run is tagged with
+    a fingerprint of the inputs it read; a result is only promoted if the
+    inputs are unchanged at approval time.
+    """
+
+    def __init__(self, enabled: bool = PIPELINE_SPECULATION, max_in_flight: int = SPECULATION_MAX_IN_FLIGHT,
+                 reserved_slots: int = SPECULATION_RESERVED_SLOTS):
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.reserved_slots = reserved_slots
+        self.running = 0
+        self._speculations: Dict[Tuple[str, str], Speculation] = {}
+        self.started = 0
+        self.promoted = 0
+        self.discarded = 0
+        self.skipped = 0
+
+    def start(self, task_id: str, stage: str, fingerprint: Hashable, job: Callable[[], Any],
+              token: Optional[CancellationToken] = None) -> bool:
+        """Run `job` on the stage executor if there is spare capacity; False if it was not started
+
+        `token` is the job's cancellation token, fired when the run is discarded.
+        """
+        key = (task_id, stage)
+        if not self.enabled or key in self._speculations:
+            return False
+        if self.running >= self.max_in_flight or not stage_scheduler.try_acquire(self.reserved_slots):
+            self.skipped += 1
+            return False
+        self.running += 1
+        self.started += 1
+        loop = asyncio.get_running_loop()
+        future = stage_executor.submit(job)
+        # Keep the slot until the work really stops, even if the result was discarded earlier
+        future.add_done_callback(partial(self._on_done, loop))
+        self._speculations[key] = Speculation(fingerprint, future, token)
+        return True
+
+    def _on_done(self, loop: asyncio.AbstractEventLoop, future: Future) -> None:
+        # Runs on the worker thread that finished the stage
+        try:
+            loop.call_soon_threadsafe(self._finished)
+        except RuntimeError:
+            # The loop has shut down
+            pass
+
+    def _finished(self) -> None:
+        self.running -= 1
+        stage_scheduler.release()
+
+    def take(self, task_id: str, stage: str, fingerprint: Hashable) -> Optional[Speculation]:
+        """The speculative run of a stage that is now approved to start, if it used the same inputs
+
+        The caller owns the run from here on, including cancelling it through its token.
+        """
+        speculation = self._speculations.pop((task_id, stage), None)
+        if speculation is None:
+            return None
+        if speculation.fingerprint != fingerprint or speculation.future.cancelled():
+            self._discard(speculation)
+            return None
+        self.promoted += 1
+        return speculation
+
+    def _discard(self, speculation: Speculation) -> None:
+        # Drops the job if no worker has picked it up yet, otherwise stops it at its next checkpoint
+        speculation.future.cancel()
+        if speculation.token is not None:
+            speculation.token.cancel("discarded")
+        self.discarded += 1
+
+    def discard(self, task_id: str, stages: Optional[Iterable[str]] = None) -> int:
+        """Drop a task's speculative runs, or only those of `stages`"""
+        keys = [
+            key for key in self._speculations
+            if key[0] == task_id and (stages is None or key[1] in stages)
+        ]
+        for key in keys:
+            self._discard(self._speculations.pop(key))
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_in_flight": self.max_in_flight,
+            "reserved_slots": self.reserved_slots,
+            "running": self.running,
+            "pending_results": len(self._speculations),
+            "started": self.started,
+            "promoted": self.promoted,
+            "discarded": self.discarded,
+            "skipped": self.skipped,
+        }
+
+
+# Shared by every route that starts or approves an agent stage
+speculator = Speculator()
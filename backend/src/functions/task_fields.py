@@ -0,0 +1,168 @@
+from collections.abc import MutableMapping
+from enum import IntEnum
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from decouple import config
+
+# Step messages kept per task; older ones are dropped first
+TASK_MESSAGE_LOG_SIZE = config("TASK_MESSAGE_LOG_SIZE", default=200, cast=int)
+
+
+class Agent(IntEnum):
+    """Pipeline agents, in the order their per-agent fields are stored"""
+    PROJECT_MANAGER = 0
+    ARCHITECT = 1
+    PROGRAMMER = 2
+    SECURITY = 3
+    TESTER = 4
+    REVIEWER = 5
+
+
+AGENT_NAMES = tuple(agent.name.lower() for agent in Agent)
+_AGENT_INDEX = {name: index for index, name in enumerate(AGENT_NAMES)}
+# Agents outside the pipeline only get per-agent entries once something is stored for them
+OPTIONAL_AGENTS = frozenset({"programmer"})
+
+
+class _Unset:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "UNSET"
+
+
+# Marks a per-agent slot with no entry; AgentFields treats it as a missing key
+UNSET = _Unset()
+
+
+def agent_index(name: str) -> Optional[int]:
+    """Slot of an agent name, or None for pseudo-agents such as 'complete'"""
+    return _AGENT_INDEX.get(name)
+
+
+class AgentFields(MutableMapping):
+    """Dict-like view, keyed by agent name, over one per-agent field of a task
+
+    The owner keeps all per-agent fields in a single flat list (`_agent_values`)
+    with one block of len(Agent) slots per field; views are created on access.
+    Slots holding UNSET behave like absent keys, as in the dicts this replaced.
+    """
+
+    __slots__ = ("_owner", "_field", "_offset")
+
+    def __init__(self, owner: Any, field: str, offset: int):
+        self._owner = owner
+        self._field = field
+        self._offset = offset
+
+    def __getitem__(self, name: str) -> Any:
+        index = _AGENT_INDEX.get(name)
+        if index is None:
+            raise KeyError(name)
+        value = self._owner._agent_values[self._offset + index]
+        if value is UNSET:
+            raise KeyError(name)
+        return value
+
+    def __setitem__(self, name: str, value: Any) -> None:
+        index = _AGENT_INDEX.get(name)
+        if index is None:
+            raise KeyError(name)
+        self._owner._agent_values[self._offset + index] = value
+        self._owner._field_changed(self._field)
+
+    def __delitem__(self, name: str) -> None:
+        raise TypeError("Per-agent fields cannot be deleted")
+
+    def _items(self) -> Iterator[Tuple[str, Any]]:
+        values = self._owner._agent_values[self._offset:self._offset + len(AGENT_NAMES)]
+        return ((name, value) for name, value in zip(AGENT_NAMES, values) if value is not UNSET)
+
+    def __iter__(self) -> Iterator[str]:
+        return (name for name, _ in self._items())
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._items())
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+    def copy(self) -> dict:
+        return dict(self._items())
+
+
+class MessageLog:
+    """Bounded ring buffer of step messages stored as template plus args
+
+    Templates are str.format patterns shared between tasks; messages are only
+    formatted when read. A message without args is stored as the bare template
+    string, one with args as a single (template, *args) tuple.
+    """
+
+    __slots__ = ("_entries", "_start", "maxlen", "dropped")
+
+    def __init__(self, maxlen: int = TASK_MESSAGE_LOG_SIZE):
+        self._entries: List[Any] = []
+        self._start = 0
+        self.maxlen = maxlen
+        self.dropped = 0
+
+    def add(self, template: str, args: Optional[Tuple[Any, ...]] = None) -> None:
+        entry = (template, *args) if args else template
+        if len(self._entries) < self.maxlen:
+            self._entries.append(entry)
+            return
+        # Full: overwrite the oldest message
+        self._entries[self._start] = entry
+        self._start = (self._start + 1) % self.maxlen
+        self.dropped += 1
+
+    def append(self, message: str) -> None:
+        self.add(message)
+
+    def _ordered(self) -> List[Any]:
+        return self._entries[self._start:] + self._entries[:self._start]
+
+    @staticmethod
+    def _format(entry: Any) -> str:
+        if isinstance(entry, str):
+            return entry
+        return entry[0].format(*entry[1:])
+
+    def __getitem__(self, index: int) -> str:
+        return self._format(self._ordered()[index])
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._format(entry) for entry in self._ordered())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def total(self) -> int:
+        """Number of messages ever added; the sequence number of the next one"""
+        return self.dropped + len(self._entries)
+
+    def since(self, seq: int) -> Tuple[List[str], bool, int]:
+        """Messages with sequence number >= seq, whether some were already evicted, and the next seq"""
+        dropped, entries = self.dropped, self._ordered()
+        skip = seq - dropped
+        new = entries[max(skip, 0):]
+        return [self._format(entry) for entry in new], skip < 0, dropped + len(entries)
+
+    def to_list(self) -> List[Any]:
+        """JSON-friendly entries: bare strings, or [template, *args] lists"""
+        return [entry if isinstance(entry, str) else list(entry) for entry in self._ordered()]
+
+    def extend_from(self, entries: Iterable[Any]) -> None:
+        """Load entries saved by to_list"""
+        for entry in entries:
+            if isinstance(entry, str):
+                self.add(entry)
+            else:
+                self.add(entry[0], entry[1:])
+
+    def copy(self) -> "MessageLog":
+        copied = MessageLog(self.maxlen)
+        copied._entries = self._ordered()
+        copied.dropped = self.dropped
+        return copied
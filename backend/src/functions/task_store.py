@@ -0,0 +1,600 @@
+import bisect
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from decouple import config
+
+# Task persistence: "memory" keeps tasks in the process only, "sqlite" survives restarts
+TASK_STORE_BACKEND = config("TASK_STORE_BACKEND", default="memory")
+TASK_STORE_PATH = config("TASK_STORE_PATH", default="tasks.db")
+TASK_STORE_FLUSH_INTERVAL = config("TASK_STORE_FLUSH_INTERVAL", default=0.5, cast=float)
+
+
+def task_state(task: Any) -> str:
+    """Coarse lifecycle state used for indexing and filtering"""
+    if task.error:
+        return "error"
+    if task.complete:
+        return "complete"
+    if task.paused:
+        return "paused"
+    if task.awaiting_user_approval:
+        return "awaiting_approval"
+    return "running"
+
+
+# Every value task_state() can return
+TASK_STATES = ("running", "paused", "awaiting_approval", "complete", "error")
+# States after which a task no longer changes on its own
+FINISHED_STATES = ("complete", "error")
+
+
+def encode_task(task: Any) -> bytes:
+    """zlib-compressed JSON snapshot of a task"""
+    return zlib.compress(json.dumps(task.to_dict()).encode("utf-8"))
+
+
+def decode_task(blob: bytes, decode: Callable[[Dict[str, Any]], Any]) -> Any:
+    return decode(json.loads(zlib.decompress(blob).decode("utf-8")))
+
+
+class TaskStore:
+    """Dict-like registry of live TaskStatus objects
+
+    Reads always come from the in-process dict. Subclasses add persistence and
+    archival by overriding the _load/_exists/_ids/_archive/_expired/mark_dirty
+    hooks; every stored task gets an `_on_change` callback that TaskStatus
+    invokes on attribute assignment.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[str, Optional[str]], None]] = []
+
+    # Persistence hooks -------------------------------------------------
+
+    def _load(self, task_id: str) -> Optional[Any]:
+        return None
+
+    def _exists(self, task_id: str) -> bool:
+        return False
+
+    def _ids(self) -> List[str]:
+        return []
+
+    def _forget(self, task_id: str) -> None:
+        pass
+
+    def _stored_state(self, task_id: str) -> Optional[str]:
+        """Lifecycle state of a task that is not loaded, without loading it"""
+        return None
+
+    def _archive(self, task_id: str, task: Any) -> bool:
+        """Move a finished task out of memory; False if this store cannot"""
+        return False
+
+    def _expired(self, cutoff: float) -> List[str]:
+        """Finished tasks last updated before `cutoff`"""
+        with self._lock:
+            return [
+                task_id for task_id, task in self._tasks.items()
+                if task_state(task) in FINISHED_STATES and task.updated_at < cutoff
+            ]
+
+    def mark_dirty(self, task_id: str) -> None:
+        """Note that a task changed and needs to be written back"""
+
+    def flush(self) -> None:
+        """Write pending changes to the backend"""
+
+    def close(self) -> None:
+        self.flush()
+
+    # Mapping interface -------------------------------------------------
+
+    def add_listener(self, listener: Callable[[str, Optional[str]], None]) -> None:
+        """Call `listener(task_id, field)` whenever a stored task changes"""
+        self._listeners.append(listener)
+
+    def _task_changed(self, task_id: str, field: Optional[str] = None) -> None:
+        self.mark_dirty(task_id)
+        for listener in self._listeners:
+            try:
+                listener(task_id, field)
+            except Exception as e:
+                print(f"Task change listener failed: {str(e)}")
+
+    def _bind(self, task_id: str, task: Any) -> None:
+        object.__setattr__(task, "_on_change", partial(self._task_changed, task_id))
+
+    def get(self, task_id: str, default: Any = None) -> Any:
+        task = self._tasks.get(task_id)
+        if task is not None:
+            return task
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None:
+                task = self._load(task_id)
+                if task is None:
+                    return default
+                self._bind(task_id, task)
+                self._tasks[task_id] = task
+            return task
+
+    def __getitem__(self, task_id: str) -> Any:
+        task = self.get(task_id)
+        if task is None:
+            raise KeyError(task_id)
+        return task
+
+    def __setitem__(self, task_id: str, task: Any) -> None:
+        with self._lock:
+            self._bind(task_id, task)
+            self._tasks[task_id] = task
+            self.mark_dirty(task_id)
+
+    def __delitem__(self, task_id: str) -> None:
+        with self._lock:
+            if task_id not in self:
+                raise KeyError(task_id)
+            self._tasks.pop(task_id, None)
+            self._forget(task_id)
+
+    def __contains__(self, task_id: object) -> bool:
+        return task_id in self._tasks or (isinstance(task_id, str) and self._exists(task_id))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            ids = self._ids()
+            known = set(ids)
+            return ids + [task_id for task_id in self._tasks if task_id not in known]
+
+    def values(self) -> List[Any]:
+        return [task for _, task in self.items()]
+
+    def items(self) -> List[Any]:
+        pairs = []
+        for task_id in self.keys():
+            task = self.get(task_id)
+            if task is not None:
+                pairs.append((task_id, task))
+        return pairs
+
+    def query(self, status: Optional[str] = None, current_agent: Optional[str] = None,
+              created_after: Optional[float] = None, created_before: Optional[float] = None,
+              updated_after: Optional[float] = None, awaiting_approval: Optional[bool] = None,
+              after: Optional[Tuple[float, str]] = None, limit: Optional[int] = None) -> List[Tuple[float, str]]:
+        """(created_at, task_id) of matching tasks, oldest first
+
+        `after` is the last key of the previous page; listing resumes right after it.
+        """
+        with self._lock:
+            tasks = list(self._tasks.items())
+        matches = [
+            (task.created_at, task_id) for task_id, task in tasks
+            if (status is None or task_state(task) == status)
+            and (current_agent is None or task.current_agent == current_agent)
+            and (created_after is None or task.created_at > created_after)
+            and (created_before is None or task.created_at < created_before)
+            and (updated_after is None or task.updated_at > updated_after)
+            and (awaiting_approval is None or bool(task.awaiting_user_approval) == awaiting_approval)
+            and (after is None or (task.created_at, task_id) > after)
+        ]
+        matches.sort()
+        return matches[:limit]
+
+    def is_active(self, task_id: str) -> bool:
+        """True while a task is unfinished; never loads an archived task"""
+        task = self._tasks.get(task_id)
+        state = task_state(task) if task is not None else self._stored_state(task_id)
+        return state is not None and state not in FINISHED_STATES
+
+    def sweep(self, archive_after: float, drop_after: float, now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """Archive finished tasks idle for `archive_after` seconds and drop those idle for `drop_after`
+
+        Returns the archived and dropped task ids. Archived tasks are reloaded
+        transparently the next time they are accessed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            idle = [
+                (task_id, task) for task_id, task in self._tasks.items()
+                if task_state(task) in FINISHED_STATES and now - task.updated_at > archive_after
+            ]
+        archived = []
+        for task_id, task in idle:
+            with self._lock:
+                if self._tasks.get(task_id) is task and self._archive(task_id, task):
+                    del self._tasks[task_id]
+                    archived.append(task_id)
+        dropped = []
+        for task_id in self._expired(now - drop_after):
+            try:
+                del self[task_id]
+            except KeyError:
+                continue
+            dropped.append(task_id)
+        return archived, dropped
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "live": len(self._tasks)}
+
+
+# Task fields whose changes move a task between index entries
+INDEXED_FIELDS = frozenset((
+    "created_at", "updated_at", "current_agent", "complete", "error", "paused", "awaiting_user_approval",
+))
+
+
+class TaskIndex:
+    """Secondary indexes over task metadata for filtered, paginated listing
+
+    Tasks are kept sorted by (created_at, task_id), with id sets per lifecycle
+    state, per current agent and for tasks awaiting approval. A query starts
+    from the smallest matching set, or walks the sorted keys when it only
+    filters by time, so it never visits every task.
+    """
+
+    def __init__(self):
+        # task_id -> (created_at, updated_at, state, current_agent, awaiting_approval)
+        self._entries: Dict[str, Tuple[float, float, str, Optional[str], bool]] = {}
+        self._order: List[Tuple[float, str]] = []
+        self._by_state: Dict[str, Set[str]] = {}
+        self._by_agent: Dict[Optional[str], Set[str]] = {}
+        self._awaiting: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, task_id: str, task: Any) -> None:
+        entry = (task.created_at, task.updated_at, task_state(task), task.current_agent,
+                 bool(task.awaiting_user_approval))
+        old = self._entries.get(task_id)
+        if old == entry:
+            return
+        if old is not None:
+            self._unlink(task_id, old, entry)
+        self._entries[task_id] = entry
+        if old is None or old[0] != entry[0]:
+            bisect.insort(self._order, (entry[0], task_id))
+        if old is None or old[2] != entry[2]:
+            self._by_state.setdefault(entry[2], set()).add(task_id)
+        if old is None or old[3] != entry[3]:
+            self._by_agent.setdefault(entry[3], set()).add(task_id)
+        if entry[4]:
+            self._awaiting.add(task_id)
+
+    def remove(self, task_id: str) -> None:
+        old = self._entries.pop(task_id, None)
+        if old is not None:
+            self._unlink(task_id, old)
+
+    def _unlink(self, task_id: str, old: Tuple, new: Optional[Tuple] = None) -> None:
+        # Only touch the indexes whose key actually changes
+        if new is None or old[0] != new[0]:
+            key = (old[0], task_id)
+            position = bisect.bisect_left(self._order, key)
+            if position < len(self._order) and self._order[position] == key:
+                del self._order[position]
+        for field, sets in ((2, self._by_state), (3, self._by_agent)):
+            if new is None or old[field] != new[field]:
+                ids = sets.get(old[field])
+                if ids is not None:
+                    ids.discard(task_id)
+                    if not ids:
+                        del sets[old[field]]
+        if new is None or not new[4]:
+            self._awaiting.discard(task_id)
+
+    def query(self, status: Optional[str] = None, current_agent: Optional[str] = None,
+              created_after: Optional[float] = None, created_before: Optional[float] = None,
+              updated_after: Optional[float] = None, awaiting_approval: Optional[bool] = None,
+              after: Optional[Tuple[float, str]] = None, limit: Optional[int] = None) -> List[Tuple[float, str]]:
+        candidates = []
+        if status is not None:
+            candidates.append(self._by_state.get(status, set()))
+        if current_agent is not None:
+            candidates.append(self._by_agent.get(current_agent, set()))
+        if awaiting_approval:
+            candidates.append(self._awaiting)
+
+        # Exclusive lower bound on (created_at, task_id)
+        start = (created_after, "\U0010ffff") if created_after is not None else None
+        if after is not None and (start is None or after > start):
+            start = after
+
+        if candidates:
+            smallest = min(candidates, key=len)
+            keys = sorted((self._entries[task_id][0], task_id) for task_id in smallest)
+        else:
+            keys = self._order
+        position = bisect.bisect_right(keys, start) if start is not None else 0
+
+        results = []
+        for key in keys[position:]:
+            if limit is not None and len(results) >= limit:
+                break
+            created_at, task_id = key
+            if created_before is not None and created_at >= created_before:
+                break
+            _, updated_at, state, agent, awaiting = self._entries[task_id]
+            if ((status is None or state == status)
+                    and (current_agent is None or agent == current_agent)
+                    and (updated_after is None or updated_at > updated_after)
+                    and (awaiting_approval is None or awaiting == awaiting_approval)):
+                results.append(key)
+        return results
+
+
+class InMemoryTaskStore(TaskStore):
+    """Process-local store; tasks are lost on restart
+
+    Archived tasks are kept as compressed snapshots, typically a tenth of the
+    size of the live objects.
+    """
+
+    def __init__(self, decode: Callable[[Dict[str, Any]], Any]):
+        super().__init__()
+        self.decode = decode
+        # task_id -> (updated_at, compressed snapshot)
+        self._archived: Dict[str, Tuple[float, bytes]] = {}
+        # Covers archived tasks too; their entries stay put while they are archived
+        self._index = TaskIndex()
+
+    def __setitem__(self, task_id: str, task: Any) -> None:
+        with self._lock:
+            super().__setitem__(task_id, task)
+            self._index.update(task_id, task)
+
+    def _task_changed(self, task_id: str, field: Optional[str] = None) -> None:
+        if field in INDEXED_FIELDS:
+            with self._lock:
+                task = self._tasks.get(task_id)
+                if task is not None:
+                    self._index.update(task_id, task)
+        super()._task_changed(task_id, field)
+
+    def _load(self, task_id: str) -> Optional[Any]:
+        entry = self._archived.pop(task_id, None)
+        return decode_task(entry[1], self.decode) if entry is not None else None
+
+    def _exists(self, task_id: str) -> bool:
+        return task_id in self._archived
+
+    def _ids(self) -> List[str]:
+        return list(self._archived)
+
+    def _forget(self, task_id: str) -> None:
+        self._archived.pop(task_id, None)
+        self._index.remove(task_id)
+
+    def _archive(self, task_id: str, task: Any) -> bool:
+        self._archived[task_id] = (task.updated_at, encode_task(task))
+        return True
+
+    def _expired(self, cutoff: float) -> List[str]:
+        with self._lock:
+            archived = [task_id for task_id, (updated_at, _) in self._archived.items() if updated_at < cutoff]
+        return super()._expired(cutoff) + archived
+
+    def query(self, status: Optional[str] = None, current_agent: Optional[str] = None,
+              created_after: Optional[float] = None, created_before: Optional[float] = None,
+              updated_after: Optional[float] = None, awaiting_approval: Optional[bool] = None,
+              after: Optional[Tuple[float, str]] = None, limit: Optional[int] = None) -> List[Tuple[float, str]]:
+        with self._lock:
+            return self._index.query(status, current_agent, created_after, created_before,
+                                     updated_after, awaiting_approval, after, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "live": len(self._tasks),
+                "indexed": len(self._index),
+                "archived": len(self._archived),
+                "archived_bytes": sum(len(blob) for _, blob in self._archived.values()),
+            }
+
+
+class SQLiteTaskStore(TaskStore):
+    """Write-behind store persisting tasks to SQLite in WAL mode
+
+    Changed tasks are collected in a dirty set and written in one transaction
+    every `flush_interval` seconds by a background thread, so status updates
+    never wait on disk. Rows hold zlib-compressed snapshots; tasks are loaded
+    lazily by primary key on first access, and archiving a task only drops it
+    from memory.
+    """
+
+    def __init__(self, decode: Callable[[Dict[str, Any]], Any], path: str = TASK_STORE_PATH,
+                 flush_interval: float = TASK_STORE_FLUSH_INTERVAL):
+        super().__init__()
+        self.decode = decode
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self.rows_written = 0
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "task_id TEXT PRIMARY KEY, status TEXT NOT NULL, current_agent TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, data BLOB NOT NULL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")]
+        if "awaiting_approval" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN awaiting_approval INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_current_agent ON tasks (current_agent, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_created_at ON tasks (created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_updated_at ON tasks (updated_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_awaiting_approval ON tasks (awaiting_approval, created_at)")
+        self._conn.commit()
+        self._recover_interrupted()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="task-store-flush", daemon=True)
+        self._flusher.start()
+
+    def _recover_interrupted(self) -> None:
+        """Tasks that were running when the process died are parked as paused so they can be resumed"""
+        with self._db_lock:
+            ids = [row[0] for row in self._conn.execute("SELECT task_id FROM tasks WHERE status = 'running'")]
+        for task_id in ids:
+            task = self.get(task_id)
+            if task is None:
+                continue
+            task.paused = True
+            task.pause_reason = "Interrupted by server restart"
+            task.pause_timestamp = time.time()
+        if ids:
+            print(f"Marked {len(ids)} interrupted task(s) as paused")
+            self.flush()
+
+    def _row(self, task_id: str, task: Any):
+        return (
+            task_id,
+            task_state(task),
+            task.current_agent,
+            task.created_at,
+            task.updated_at,
+            int(bool(task.awaiting_user_approval)),
+            encode_task(task),
+        )
+
+    def _load(self, task_id: str) -> Optional[Any]:
+        with self._db_lock:
+            row = self._conn.execute("SELECT data FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return decode_task(row[0], self.decode) if row is not None else None
+
+    def _exists(self, task_id: str) -> bool:
+        with self._db_lock:
+            return self._conn.execute("SELECT 1 FROM tasks WHERE task_id = ?", (task_id,)).fetchone() is not None
+
+    def _ids(self) -> List[str]:
+        with self._db_lock:
+            return [row[0] for row in self._conn.execute("SELECT task_id FROM tasks ORDER BY created_at")]
+
+    def _forget(self, task_id: str) -> None:
+        with self._dirty_lock:
+            self._dirty.discard(task_id)
+        with self._db_lock:
+            self._conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+            self._conn.commit()
+
+    def _stored_state(self, task_id: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._conn.execute("SELECT status FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _archive(self, task_id: str, task: Any) -> bool:
+        with self._dirty_lock:
+            self._dirty.discard(task_id)
+        self._write([self._row(task_id, task)])
+        return True
+
+    def _expired(self, cutoff: float) -> List[str]:
+        self.flush()
+        with self._db_lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT task_id FROM tasks WHERE status IN (?, ?) AND updated_at < ?", (*FINISHED_STATES, cutoff)
+            )]
+
+    def mark_dirty(self, task_id: str) -> None:
+        with self._dirty_lock:
+            self._dirty.add(task_id)
+
+    def _write(self, rows) -> None:
+        with self._db_lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tasks "
+                "(task_id, status, current_agent, created_at, updated_at, awaiting_approval, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        self.flushes += 1
+        self.rows_written += len(rows)
+
+    def flush(self) -> None:
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, set()
+        tasks = [(task_id, self._tasks.get(task_id)) for task_id in dirty]
+        rows = [self._row(task_id, task) for task_id, task in tasks if task is not None]
+        if rows:
+            self._write(rows)
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Task store flush failed: {str(e)}")
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+
+    def query(self, status: Optional[str] = None, current_agent: Optional[str] = None,
+              created_after: Optional[float] = None, created_before: Optional[float] = None,
+              updated_after: Optional[float] = None, awaiting_approval: Optional[bool] = None,
+              after: Optional[Tuple[float, str]] = None, limit: Optional[int] = None) -> List[Tuple[float, str]]:
+        self.flush()
+        clauses, params = [], []
+        for column, op, value in (("status", "=", status), ("current_agent", "=", current_agent),
+                                  ("created_at", ">", created_after), ("created_at", "<", created_before),
+                                  ("updated_at", ">", updated_after)):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        if awaiting_approval is not None:
+            clauses.append("awaiting_approval = ?")
+            params.append(int(awaiting_approval))
+        if after is not None:
+            clauses.append("(created_at, task_id) > (?, ?)")
+            params.extend(after)
+        sql = "SELECT created_at, task_id FROM tasks"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at, task_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._db_lock:
+            return [(row[0], row[1]) for row in self._conn.execute(sql, params)]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._db_lock:
+            persisted = self._conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "live": len(self._tasks),
+            "persisted": persisted,
+            "dirty": len(self._dirty),
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+
+def create_task_store(decode: Callable[[Dict[str, Any]], Any]) -> TaskStore:
+    """Build the store selected by TASK_STORE_BACKEND"""
+    if TASK_STORE_BACKEND == "sqlite":
+        return SQLiteTaskStore(decode)
+    if TASK_STORE_BACKEND == "memory":
+        return InMemoryTaskStore(decode)
+    raise ValueError(f"Invalid TASK_STORE_BACKEND {TASK_STORE_BACKEND!r}, expected memory or sqlite")
@@ -2,6 +2,7 @@ import warnings
 warnings.filterwarnings("ignore")
 import os
 import time
+import asyncio
 from decouple import config
 
 # Record start time for uptime tracking
@@ -9,7 +10,10 @@ start_time = time.time()
 
 from crewai_tools import FileReadTool
 from routes.api_routes import router
-from functions.functions import CustomCrew
+from functions.functions import CustomCrew, stage_tokens, tasks_store
+from agents.http_client import aclose_http_clients
+from functions.retention import retention_loop
+from functions.executor import stage_executor
 
 # FastAPI imports
 from fastapi import FastAPI, BackgroundTasks, HTTPException
@@ -44,6 +48,31 @@ app.include_router(router)
 async def get_root():
     return {"message": "Welcome to the Triage AI API", "version": "1.0.0", "status": "running","docs": "/docs", "uptime": time.time() - start_time}
 
+@app.on_event("startup")
+async def start_task_retention():
+    # Archive and expire finished tasks and their output directories in the background
+    app.state.retention_task = asyncio.create_task(retention_loop(tasks_store))
+
+@app.on_event("shutdown")
+async def stop_task_retention():
+    app.state.retention_task.cancel()
+
+@app.on_event("shutdown")
+async def close_llm_connections():
+    # Release the pooled keep-alive connections to the LLM proxy
+    await aclose_http_clients()
+
+@app.on_event("shutdown")
+async def stop_stage_executor():
+    # Stop running agent stages at their next checkpoint and drop queued ones
+    stage_tokens.cancel(lambda key: True, "shutdown")
+    stage_executor.shutdown()
+
+@app.on_event("shutdown")
+async def flush_task_store():
+    # Write any pending task changes before the process exits
+    tasks_store.close()
+
 # Keep CLI functionality or run API server
 if __name__ == "__main__":
     import sys
@@ -45,6 +45,37 @@ class StatusResponse(BaseModel):
     paused: bool = False
     pause_reason: Optional[str] = None
     pause_timestamp: Optional[float] = None
+    llm_usage: Dict[str, Dict[str, float]] = {}
+    queue_position: Optional[int] = None  # Place in the stage queue while waiting for a free slot
+    version: int = 0
+    cursor: str = ""  # Pass back as ?since= to receive only later changes
+
+class StatusDeltaResponse(BaseModel):
+    task_id: str
+    version: int
+    cursor: str
+    changed: Dict[str, Any]  # StatusResponse fields changed since the given cursor
+    step_messages: List[str]  # Messages added since the given cursor
+    messages_truncated: bool = False  # Some messages were evicted before they could be sent
+
+class WaitResponse(BaseModel):
+    task_id: str
+    until: str
+    reached: bool  # False on timeout, or when the task finished without reaching `until`
+    timed_out: bool
+    status: StatusResponse
+
+class BatchStatusRequest(BaseModel):
+    task_ids: List[str]
+    fields: Optional[List[str]] = None  # StatusResponse fields to include; all of them by default
+
+class TaskListResponse(BaseModel):
+    tasks: List[Dict[str, Any]]  # Sparse StatusResponse objects, oldest first
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
+
+class BatchStatusResponse(BaseModel):
+    tasks: List[Dict[str, Any]]  # StatusResponse objects, or only the requested fields
+    missing: List[str] = []  # Requested ids that do not exist
 
 class AgentOutputResponse(BaseModel):
     agent: str
@@ -11,20 +11,58 @@ start_time = time.time()
 from agents.agents import CustomAgents
 from tasks.tasks import CustomTasks
 from agents.dspy_integration import process_with_dspy
+from agents.llm_cache import cache_stats
+from agents.semantic_cache import semantic_cache_stats
+from agents.rate_limiter import rate_limiter
+from agents.hedging import hedge_stats
+from agents.circuit_breaker import circuit_breaker
+from agents.llm_errors import LLMError
+from agents.llm_metrics import llm_metrics
+from agents.llm_cassette import cassette_stats
+from agents.cancellation import CancellationToken, OperationCancelled, run_cancellable
+from agents.step_journal import journal_stats, run_journaled, stage_journal, step_key
 
 
 # FastAPI imports
-from fastapi import APIRouter, BackgroundTasks, HTTPException
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import Optional, Union
+import json
 import uuid
-from models.schema import ProblemRequest, StatusResponse, AgentOutputResponse, ResultResponse, FeedbackRequest, ApprovalRequest, PauseRequest, ResumeRequest, TaskResponse
-from tools.crew_tools import file_read_tool, architect_tools, programmer_tools, tester_tools, reviewer_tools, security_tools, search_web, read_file, write_file, create_directory
-from functions.functions import update_task_status, generate_full_plan,tasks_store,TaskStatus,CustomCrew
+from functools import partial
+from models.schema import ProblemRequest, StatusResponse, StatusDeltaResponse, WaitResponse, BatchStatusRequest, TaskListResponse, BatchStatusResponse, AgentOutputResponse, ResultResponse, FeedbackRequest, ApprovalRequest, PauseRequest, ResumeRequest, TaskResponse
+from tools.crew_tools import file_read_tool, architect_tools, tester_tools, reviewer_tools, security_tools, search_web, read_file, write_file, create_directory
+from functions.functions import update_task_status, generate_full_plan,tasks_store,TaskStatus,CustomCrew,agent_streams,begin_agent_stream,end_agent_stream,is_agent_streaming,status_field,task_events,task_waiters,snapshot_stats,stage_tokens,cancel_task_stages,follow_task,detach_task
+from functions.coalescing import problem_coalescer
+from functions.pubsub import CLOSED
+from functions.serialization import dumps
+from functions.retention import task_output_dir, retention_stats
+from functions.executor import stage_executor
+from functions.scheduler import stage_scheduler, REVISION, CONTINUATION, NEW_TASK
+from functions.pipeline import PIPELINE
+from functions.speculation import speculator
+from functions.task_fields import AGENT_NAMES
+from functions.task_store import TASK_STATES
 from fastapi.middleware.cors import CORSMiddleware
 
 
 # Create router instead of FastAPI app
 router = APIRouter()
 
+# Seconds between keep-alive messages on idle event streams
+EVENT_HEARTBEAT_INTERVAL = 15
+# Upper bound on how long one /status/{task_id}/wait request may block
+STATUS_WAIT_MAX_TIMEOUT = 60
+# Page and batch size limits for /tasks and /status:batch
+TASK_LIST_DEFAULT_LIMIT = 50
+TASK_LIST_MAX_LIMIT = 500
+STATUS_BATCH_MAX_IDS = 500
+# Fields /tasks returns when no `fields` are requested
+TASK_LIST_DEFAULT_FIELDS = (
+    "current_agent", "progress", "created_at", "updated_at", "complete", "error",
+    "awaiting_user_approval", "paused", "queue_position",
+)
+
 # Tool lists for project manager
 project_manager_tools = [
     search_web,
@@ -38,11 +76,35 @@ project_manager_tools = [
 @router.post("/run", response_model=TaskResponse)
 async def run_problem(request: ProblemRequest, background_tasks: BackgroundTasks):
     """Start a new agent processing task with Project Manager first"""
+    # An identical problem is already being worked on: follow that run instead of starting another
+    leader_id = problem_coalescer.find(request.problem, _joinable)
+    if leader_id is not None:
+        task_id = str(uuid.uuid4())
+        tasks_store[task_id] = TaskStatus(request.problem)
+        follow_task(task_id, leader_id)
+        print(f"Task {task_id}: following in-flight task {leader_id} with the same problem")
+        return {
+            "task_id": task_id,
+            "message": f"Task submitted successfully and is following task {leader_id}, which has the same problem; "
+                       "its approvals move both tasks on, feedback on this task continues it on its own",
+            "timestamp": time.time()
+        }
+    
+    # Shed load before creating anything when the stage queue is already long
+    if stage_scheduler.saturated():
+        stage_scheduler.reject()
+        raise HTTPException(
+            status_code=429,
+            detail="Too many queued tasks, retry later",
+            headers={"Retry-After": str(stage_scheduler.retry_after())}
+        )
+    
     task_id = str(uuid.uuid4())
     
     # Initialize task status
-    tasks_store[task_id] = TaskStatus()
-    tasks_store[task_id].step_messages.append(f"Task created: {request.problem}")
+    tasks_store[task_id] = TaskStatus(request.problem)
+    tasks_store[task_id].step_messages.add("Task created: {}", (request.problem,))
+    problem_coalescer.lead(task_id, request.problem)
     
     # Run only the Project Manager agent in the background
     async def run_first_agent():
@@ -52,8 +114,8 @@ async def run_problem(request: ProblemRequest, background_tasks: BackgroundTasks
             
             update_task_status(task_id, "Starting task execution...", 5)
             
-            # Start with the Project Manager agent
-            await start_project_manager(task_id)
+            # Start the pipeline's entry stage (the Project Manager) once a stage slot frees up
+            await advance_pipeline(task_id, NEW_TASK)
             
         except Exception as e:
             error_msg = f"Error in task {task_id}: {str(e)}"
@@ -62,10 +124,11 @@ async def run_problem(request: ProblemRequest, background_tasks: BackgroundTasks
                 # Mark task as failed in status
                 update_task_status(
                     task_id,
-                    f"Error occurred: {str(e)}",
+                    "Error occurred: {}",
                     0,
                     tasks_store[task_id].current_agent, 
-                    "error"
+                    "error",
+                    args=(str(e),)
                 )
                 tasks_store[task_id].error = str(e)
                 tasks_store[task_id].complete = True  # Mark as complete but with error
@@ -80,33 +143,243 @@ async def run_problem(request: ProblemRequest, background_tasks: BackgroundTasks
         "timestamp": time.time()
     }
 
-@router.get("/status/{task_id}", response_model=StatusResponse)
-async def get_status(task_id: str):
-    """Get current status of a task"""
-    if task_id not in tasks_store:
-        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+def _joinable(task_id):
+    """Whether a new task may follow the run of `task_id`"""
+    task = tasks_store.get(task_id)
+    return task is not None and not (task.complete or task.error or task.paused)
+
+def _follower_acknowledgement(task_id, agent):
+    """Reply to a follower approving a gate, or None if the task leads its own run
     
-    task = tasks_store[task_id]
+    Only the leader's approval moves a coalesced run on. A follower's approval is
+    acknowledged without effect, so it cannot pass the gate for the other tasks.
+    """
+    leader_id = problem_coalescer.leader_of(task_id)
+    if leader_id is None:
+        return None
+    return {
+        "message": f"{agent.capitalize()} approval noted. This task follows task {leader_id}, whose approval "
+                   "moves the shared run on; give feedback to continue on its own"
+    }
+
+def _diverge(task_id, background_tasks, restart_own=True):
+    """Take a task out of its coalesced group before it acts on its own
+    
+    Tasks that stop following pick the pipeline up from where the shared run
+    got to, restarting the stages it had in progress. With restart_own=False
+    the diverging task's own stages are left for /resume.
+    """
+    leader_id = problem_coalescer.leader_of(task_id) or task_id
+    for follower_id in detach_task(task_id):
+        update_task_status(follower_id, "No longer following task {}", args=(leader_id,))
+        if follower_id == task_id and not restart_own:
+            continue
+        follower = tasks_store[follower_id]
+        interrupted = PIPELINE.started(follower)
+        for name in interrupted:
+            follower.agent_status[name] = "pending"
+        if interrupted:
+            background_tasks.add_task(advance_pipeline, follower_id)
+
+def _status_payload(task_id, task, version):
+    """Full StatusResponse body for a task, stamped with `version`"""
+    messages, _, next_seq = task.step_messages.since(0)
     return {
         "task_id": task_id,
         "current_agent": task.current_agent,
-        "agent_status": task.agent_status,
-        "completed_agents": task.completed_agents,
+        "agent_status": task.agent_status.copy(),
+        "completed_agents": task.completed_agents.copy(),
         "progress": task.progress,
-        "step_messages": task.step_messages,
+        "step_messages": messages,
         "created_at": task.created_at,
         "updated_at": task.updated_at,
         "complete": task.complete,
         "error": task.error,
-        "agent_feedback": task.agent_feedback,
-        "revision_counts": task.revision_counts,
+        "agent_feedback": task.agent_feedback.copy(),
+        "revision_counts": task.revision_counts.copy(),
         "awaiting_feedback": task.awaiting_feedback,
         "awaiting_user_approval": task.awaiting_user_approval,
         "paused": task.paused,
         "pause_reason": task.pause_reason,
-        "pause_timestamp": task.pause_timestamp
+        "pause_timestamp": task.pause_timestamp,
+        "llm_usage": task.llm_usage,
+        "queue_position": task.queue_position,
+        "version": version,
+        "cursor": f"{version}.{next_seq}"
+    }
+
+def _parse_cursor(cursor):
+    try:
+        version, seq = cursor.split(".")
+        return int(version), int(seq)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+@router.get("/status/{task_id}", response_model=Union[StatusResponse, StatusDeltaResponse])
+async def get_status(task_id: str, request: Request, response: Response, since: Optional[str] = None):
+    """Get current status of a task, or only what changed since a previous cursor"""
+    if task_id not in tasks_store:
+        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+    
+    task = tasks_store[task_id]
+    # Read the version first so a concurrent update is re-sent rather than missed
+    version = task.version
+    etag = f'"{version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    
+    if since is not None:
+        since_version, since_seq = _parse_cursor(since)
+        if since_version <= version:
+            messages, truncated, next_seq = task.step_messages.since(since_seq)
+            return {
+                "task_id": task_id,
+                "version": version,
+                "cursor": f"{version}.{next_seq}",
+                "changed": {
+                    name: status_field(task, name)
+                    for name in task.changed_since(since_version) if name != "step_messages"
+                },
+                "step_messages": messages,
+                "messages_truncated": truncated
+            }
+    
+    # Serialized once per version; unchanged tasks are served straight from the cached bytes
+    version, body = task.snapshot(lambda version: dumps(_status_payload(task_id, task, version)))
+    return Response(content=body, media_type="application/json", headers={"ETag": f'"{version}"'})
+
+def _wait_condition(until):
+    """Predicate on a task for a /wait `until` value, or None if the value is not understood"""
+    if until == "complete":
+        return lambda task: task.complete
+    if until == "error":
+        return lambda task: task.error is not None
+    if until == "awaiting_approval":
+        return lambda task: task.awaiting_user_approval
+    if until == "paused":
+        return lambda task: task.paused
+    agent, _, agent_status = until.partition(":")
+    if agent_status and agent in AGENT_NAMES:
+        return lambda task: task.agent_status.get(agent) == agent_status
+    return None
+
+@router.get("/status/{task_id}/wait", response_model=WaitResponse)
+async def wait_for_status(task_id: str, until: str, timeout: float = 30):
+    """Block until the task reaches a state, then return its status
+    
+    `until` is one of complete, error, awaiting_approval, paused or
+    <agent>:<status> (e.g. architect:completed). The wait also ends when the
+    task completes or fails, since it can no longer reach the state after that.
+    """
+    condition = _wait_condition(until)
+    if condition is None:
+        raise HTTPException(status_code=400, detail=f"Invalid until: {until}")
+    task = tasks_store.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail=f"Task not found: {task_id}")
+    
+    def settled():
+        return condition(task) or task.complete or task.error is not None
+    
+    timeout = min(max(timeout, 0), STATUS_WAIT_MAX_TIMEOUT)
+    finished = settled() or await task_waiters.wait_for(task_id, settled, timeout)
+    return {
+        "task_id": task_id,
+        "until": until,
+        "reached": bool(condition(task)),
+        "timed_out": not finished,
+        "status": _status_payload(task_id, task, task.version)
     }
 
+def _parse_fields(fields):
+    """Validated sparse fieldset from a list or a comma separated string"""
+    if isinstance(fields, str):
+        fields = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in TaskStatus.STATUS_FIELDS and name != "version"]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def _sparse_status(task_id, task, fields):
+    """JSON bytes of a task's StatusResponse restricted to `fields`, or all of it if `fields` is None"""
+    if fields is None:
+        return task.snapshot(lambda version: dumps(_status_payload(task_id, task, version)))[1]
+    entry = {"task_id": task_id, "version": task.version}
+    for name in fields:
+        if name == "step_messages":
+            entry[name] = list(task.step_messages)
+        elif name != "version":
+            entry[name] = status_field(task, name)
+    return dumps(entry)
+
+def _json_array(items):
+    return b"[" + b",".join(items) + b"]"
+
+def _encode_list_cursor(key):
+    created_at, task_id = key
+    return f"{created_at!r}:{task_id}"
+
+def _decode_list_cursor(cursor):
+    created_at, _, task_id = cursor.partition(":")
+    try:
+        return float(created_at), task_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {cursor}")
+
+@router.get("/tasks", response_model=TaskListResponse)
+async def list_tasks(status: Optional[str] = None, current_agent: Optional[str] = None,
+                     created_after: Optional[float] = None, created_before: Optional[float] = None,
+                     updated_after: Optional[float] = None, awaiting_approval: Optional[bool] = None,
+                     cursor: Optional[str] = None, limit: int = TASK_LIST_DEFAULT_LIMIT,
+                     fields: Optional[str] = None):
+    """List tasks oldest first, filtered through the task store indexes
+    
+    Returns a summary of each task unless `fields` names the StatusResponse
+    fields to include; `fields=all` returns full status objects.
+    """
+    if status is not None and status not in TASK_STATES:
+        raise HTTPException(status_code=400, detail=f"Invalid status, expected one of: {', '.join(TASK_STATES)}")
+    if current_agent is not None and current_agent not in AGENT_NAMES and current_agent != "complete":
+        raise HTTPException(status_code=400, detail="Invalid agent name")
+    if fields == "all":
+        selected = None
+    else:
+        selected = _parse_fields(fields) if fields is not None else TASK_LIST_DEFAULT_FIELDS
+    limit = min(max(limit, 1), TASK_LIST_MAX_LIMIT)
+    
+    keys = tasks_store.query(
+        status=status, current_agent=current_agent, created_after=created_after,
+        created_before=created_before, updated_after=updated_after,
+        awaiting_approval=awaiting_approval,
+        after=_decode_list_cursor(cursor) if cursor else None, limit=limit
+    )
+    entries = []
+    for _, task_id in keys:
+        task = tasks_store.get(task_id)
+        if task is not None:
+            entries.append(_sparse_status(task_id, task, selected))
+    next_cursor = _encode_list_cursor(keys[-1]) if len(keys) == limit else None
+    body = b'{"tasks":' + _json_array(entries) + b',"next_cursor":' + dumps(next_cursor) + b"}"
+    return Response(content=body, media_type="application/json")
+
+@router.post("/status:batch", response_model=BatchStatusResponse)
+async def get_status_batch(request: BatchStatusRequest):
+    """Status of many tasks in one request, in the order requested"""
+    if len(request.task_ids) > STATUS_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {STATUS_BATCH_MAX_IDS} task ids per batch")
+    selected = _parse_fields(request.fields) if request.fields is not None else None
+    
+    entries, missing = [], []
+    for task_id in dict.fromkeys(request.task_ids):
+        task = tasks_store.get(task_id)
+        if task is None:
+            missing.append(task_id)
+        else:
+            entries.append(_sparse_status(task_id, task, selected))
+    body = b'{"tasks":' + _json_array(entries) + b',"missing":' + dumps(missing) + b"}"
+    return Response(content=body, media_type="application/json")
+
 @router.get("/agent_output/{task_id}/{agent}", response_model=AgentOutputResponse)
 async def get_agent_output(task_id: str, agent: str):
     """Get output from a specific agent"""
@@ -122,6 +395,123 @@ async def get_agent_output(task_id: str, agent: str):
         "output": output
     }
 
+@router.get("/agent_output/{task_id}/{agent}/stream")
+async def stream_agent_output(task_id: str, agent: str):
+    """Stream an agent's output as server-sent events while it is being generated"""
+    if task_id not in tasks_store:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    if agent not in ["project_manager", "architect", "security", "tester", "reviewer"]:
+        raise HTTPException(status_code=400, detail="Invalid agent name")
+    
+    # A task following a coalesced run watches its leader's stream
+    stream_id = problem_coalescer.leader_of(task_id) or task_id
+    
+    # Subscribe before taking the snapshot so no token falls in between
+    subscription = agent_streams.subscribe((stream_id, agent))
+    snapshot = tasks_store[task_id].agent_outputs.get(agent) or ""
+    active = is_agent_streaming(stream_id, agent)
+    
+    async def event_stream():
+        try:
+            sent = len(snapshot)
+            if snapshot:
+                yield f"data: {json.dumps({'type': 'token', 'offset': 0, 'token': snapshot})}\n\n"
+            
+            while active:
+                event = await subscription.get()
+                if event is CLOSED:
+                    break
+                if event["type"] == "reset":
+                    sent = 0
+                    yield f"data: {json.dumps(event)}\n\n"
+                    continue
+                
+                # Skip tokens already covered by the snapshot
+                token = event["token"][max(sent - event["offset"], 0):]
+                if not token:
+                    continue
+                yield f"data: {json.dumps({'type': 'token', 'offset': sent, 'token': token})}\n\n"
+                sent += len(token)
+            
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            agent_streams.unsubscribe(subscription)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+async def _task_event_feed(task_id, subscription):
+    """Events for one task: a snapshot, then field/step changes, with heartbeats while idle"""
+    task = tasks_store[task_id]
+    snapshot = _status_payload(task_id, task, task.version)
+    snapshot_seq = int(snapshot["cursor"].split(".")[1])
+    yield {"type": "snapshot", "status": snapshot, "version": snapshot["version"]}
+    if snapshot["complete"]:
+        return
+    
+    while True:
+        try:
+            event = await subscription.get(timeout=EVENT_HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            yield {"type": "heartbeat"}
+            continue
+        if event is CLOSED:
+            return
+        # Drop events already reflected in the snapshot
+        if event["type"] == "field" and event["version"] <= snapshot["version"]:
+            continue
+        if event["type"] == "step" and event["seq"] < snapshot_seq:
+            continue
+        yield event
+        if event["type"] == "field" and event["field"] == "complete" and event["value"]:
+            return
+
+@router.get("/events/{task_id}")
+async def stream_task_events(task_id: str):
+    """Push task updates as server-sent events
+    
+    The first event is a full status snapshot. It is followed by "field" events
+    (stage changes, agent_status, awaiting_user_approval, complete, error, ...),
+    "step" events for new step messages and periodic heartbeat comments.
+    """
+    if task_id not in tasks_store:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    # Subscribe before taking the snapshot so no update falls in between
+    subscription = task_events.subscribe(task_id)
+    
+    async def event_stream():
+        try:
+            async for event in _task_event_feed(task_id, subscription):
+                if event["type"] == "heartbeat":
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"id: {event['version']}\ndata: {json.dumps(event)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        finally:
+            task_events.unsubscribe(subscription)
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.websocket("/events/{task_id}/ws")
+async def task_events_websocket(websocket: WebSocket, task_id: str):
+    """WebSocket variant of /events/{task_id}; sends the same events as JSON messages"""
+    if task_id not in tasks_store:
+        await websocket.close(code=4404)
+        return
+    
+    await websocket.accept()
+    subscription = task_events.subscribe(task_id)
+    try:
+        async for event in _task_event_feed(task_id, subscription):
+            await websocket.send_json(event)
+        await websocket.send_json({"type": "done"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        task_events.unsubscribe(subscription)
+
 @router.get("/results/{task_id}", response_model=ResultResponse)
 async def get_results(task_id: str):
     """Get final results of a completed task"""
@@ -139,6 +529,77 @@ async def get_results(task_id: str):
         "error": task.error
     }
 
+@router.get("/metrics")
+async def get_metrics():
+    """Runtime counters for the LLM client and task store"""
+    return {
+        "llm_cache": cache_stats(),
+        "semantic_cache": semantic_cache_stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "hedging": hedge_stats(),
+        "circuit_breaker": circuit_breaker.stats(),
+        "llm": llm_metrics.snapshot(),
+        "cassette": cassette_stats(),
+        "task_store": tasks_store.stats(),
+        "retention": retention_stats,
+        "status_snapshots": snapshot_stats,
+        "executor": stage_executor.stats(),
+        "scheduler": stage_scheduler.stats(),
+        "speculation": speculator.stats(),
+        "stage_cancellation": stage_tokens.stats(),
+        "stage_journal": journal_stats(),
+        "coalescing": problem_coalescer.stats()
+    }
+
+async def _pass_gate(task_id, agent, background_tasks):
+    """Record an approved stage and move the pipeline on: start what is ready, or finish the task"""
+    task = tasks_store[task_id]
+    # Mark agent as approved
+    update_task_status(
+        task_id,
+        "{} output approved by user",
+        5,
+        agent,
+        "approved",
+        args=(agent.capitalize(),)
+    )
+    
+    task.completed_agents.append(agent)
+    task.touch("completed_agents")
+    
+    # Stages whose inputs are now all approved start together
+    ready = PIPELINE.ready(task)
+    if ready:
+        task.current_agent = ready[0]
+        background_tasks.add_task(advance_pipeline, task_id)
+        return {"message": f"{agent.capitalize()} work approved, proceeding to {', '.join(ready)}"}
+    elif not PIPELINE.finished(task):
+        # Other branches of the pipeline are still running or awaiting approval
+        active = PIPELINE.active(task)
+        if active:
+            task.current_agent = active[0]
+        _speculate(task_id)
+        return {"message": f"{agent.capitalize()} work approved, waiting for {', '.join(active)}"}
+    else:
+        # This was the last agent - generate full plan file and mark as complete
+        task.complete = True
+        speculator.discard(task_id)
+        
+        # Generate the consolidated full plan document
+        try:
+            await stage_executor.run(generate_full_plan, task_id)
+        except Exception as e:
+            print(f"Error generating full plan: {str(e)}")
+        
+        update_task_status(
+            task_id,
+            "All agents completed and approved. Task finished! Full plan generated.",
+            5,
+            "complete",
+            "completed"
+        )
+        return {"message": f"{agent.capitalize()} work approved. Task completed! Full plan file has been generated."}
+
 @router.post("/approve/{task_id}/{agent}")
 async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest, background_tasks: BackgroundTasks):
     """Submit approval/rejection for an agent's work"""
@@ -147,26 +608,48 @@ async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest,
         
     task = tasks_store[task_id]
     
-    if task.current_agent != agent:
+    if agent not in PIPELINE.stages:
+        raise HTTPException(status_code=400, detail="Invalid agent name")
+    
+    # Parallel stages can wait for approval at the same time, so any of them may be approved
+    if task.current_agent != agent and task.agent_status[agent] != "awaiting_approval":
         raise HTTPException(status_code=400, detail=f"Current agent is {task.current_agent}, not {agent}")
     
-    if not task.awaiting_user_approval:
+    if task.agent_status[agent] != "awaiting_approval":
         # Allow approval anyway, but notify
         print(f"Warning: Agent {agent} was not awaiting approval")
+    
+    if not request.approved and not request.feedback:
+        raise HTTPException(
+            status_code=400, 
+            detail="Feedback is required when rejecting an agent's output"
+        )
+    
+    if request.approved:
+        # A coalesced run passes its approval gates on its leader's approval only
+        acknowledgement = _follower_acknowledgement(task_id, agent)
+        if acknowledgement is not None:
+            return acknowledgement
+    else:
+        # Rejecting sends this task down its own path
+        _diverge(task_id, background_tasks)
         
     # Record user feedback if provided
     if request.feedback:
         task.user_feedback = request.feedback
         task.agent_feedback[agent] = request.feedback
     
-    task.awaiting_user_approval = False
+    # Still awaiting approval if another stage is waiting at its gate
+    task.awaiting_user_approval = any(
+        task.agent_status[name] == "awaiting_approval" for name in PIPELINE.order if name != agent
+    )
     task.user_approved = request.approved
     
     # Save agent output to file when approved
     if request.approved:
         try:
             # Create directory structure
-            output_dir = f"{task_id}"
+            output_dir = task_output_dir(task_id)
             os.makedirs(output_dir, exist_ok=True)
             
             # Get agent output
@@ -192,70 +675,20 @@ async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest,
             # Log error but don't fail the approval process
             print(f"Error saving {agent} output to file: {str(e)}")
     
-    # Get next agent in sequence
-    def get_next_agent(current_agent):
-        sequence = ["project_manager", "architect", "security", "tester", "reviewer"]
-        try:
-            current_index = sequence.index(current_agent)
-            if current_index < len(sequence) - 1:
-                return sequence[current_index + 1]
-            return None  # No more agents
-        except ValueError:
-            return None
-    
     if request.approved:
-        # Mark agent as approved
-        update_task_status(
-            task_id,
-            f"{agent.capitalize()} output approved by user",
-            5,
-            agent,
-            "approved"
-        )
-        
-        task.completed_agents.append(agent)
-        
-        # Determine next agent
-        next_agent = get_next_agent(agent)
-        if next_agent:
-            task.current_agent = next_agent
-            
-            # Start next agent in background
-            background_tasks.add_task(start_agent, task_id, next_agent)
-            
-            return {"message": f"{agent.capitalize()} work approved, proceeding to {next_agent}"}
-        else:
-            # This was the last agent - generate full plan file and mark as complete
-            task.complete = True
-            
-            # Generate the consolidated full plan document
-            try:
-                generate_full_plan(task_id)
-            except Exception as e:
-                print(f"Error generating full plan: {str(e)}")
-            
-            update_task_status(
-                task_id,
-                f"All agents completed and approved. Task finished! Full plan generated.",
-                5,
-                "complete",
-                "completed"
-            )
-            return {"message": f"{agent.capitalize()} work approved. Task completed! Full plan file has been generated."}
+        return await _pass_gate(task_id, agent, background_tasks)
     else:
         # Rejected, restart agent with feedback
-        if not request.feedback:
-            raise HTTPException(
-                status_code=400, 
-                detail="Feedback is required when rejecting an agent's output"
-            )
+        # Anything speculated on the rejected output is void
+        speculator.discard(task_id, PIPELINE.successors(agent))
             
         update_task_status(
             task_id,
-            f"{agent.capitalize()} output rejected. Restarting with feedback: {request.feedback}",
+            "{} output rejected. Restarting with feedback: {}",
             0,
             agent,
-            "needs_revision"
+            "needs_revision",
+            args=(agent.capitalize(), request.feedback)
         )
         
         # Increment revision count
@@ -263,15 +696,19 @@ async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest,
         
         # Restart agent with feedback in background
         async def restart_with_feedback():
+            # Pausing the task fires this token; it also supersedes a revision still running
+            token = stage_tokens.open((task_id, agent))
             try:
                 # Create crew with the original problem and pass the feedback
                 crew = CustomCrew(
-                    tasks_store[task_id].step_messages[0].replace("Task created: ", ""), 
-                    task_id
+                    tasks_store[task_id].problem, 
+                    task_id,
+                    cancel_token=token
                 )
                 
-                # Run the appropriate agent with feedback
-                result = crew.run_with_feedback(agent, request.feedback)
+                # Run the appropriate agent with feedback; revisions jump the stage queue
+                async with stage_scheduler.slot(task_id, REVISION):
+                    result = await stage_executor.run(run_cancellable, token, crew.run_with_feedback, agent, request.feedback)
                 
                 # Store the result
                 tasks_store[task_id].agent_outputs[agent] = str(result)
@@ -282,11 +719,13 @@ async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest,
                 # Update status
                 update_task_status(
                     task_id,
-                    f"{agent.capitalize()} revision completed. Awaiting user approval.",
+                    "{} revision completed. Awaiting user approval.",
                     5,
                     agent,
-                    "awaiting_approval"
+                    "awaiting_approval",
+                    args=(agent.capitalize(),)
                 )
+                _speculate(task_id)
                 
             except Exception as e:
                 error_msg = f"Error restarting {agent} with feedback: {str(e)}"
@@ -300,6 +739,10 @@ async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest,
                         "error"
                     )
                     tasks_store[task_id].error = str(e)
+            except OperationCancelled as e:
+                print(f"Task {task_id}: {agent} revision stopped ({e.reason})")
+            finally:
+                stage_tokens.close((task_id, agent), token)
         
         # Start the background task
         background_tasks.add_task(restart_with_feedback)
@@ -307,7 +750,7 @@ async def approve_agent_work(task_id: str, agent: str, request: ApprovalRequest,
         return {"message": f"{agent.capitalize()} work requires revision. Restarting with feedback."}
 
 @router.post("/pause/{task_id}")
-async def pause_task(task_id: str, request: PauseRequest):
+async def pause_task(task_id: str, request: PauseRequest, background_tasks: BackgroundTasks):
     """Pause a running task"""
     if task_id not in tasks_store:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -320,17 +763,24 @@ async def pause_task(task_id: str, request: PauseRequest):
     if task.complete:
         raise HTTPException(status_code=400, detail="Cannot pause a completed task")
     
+    # Tasks sharing this one's run keep going without it
+    _diverge(task_id, background_tasks, restart_own=False)
     task.paused = True
     task.pause_reason = request.reason
     task.pause_timestamp = time.time()
+    speculator.discard(task_id)
+    # Running stages stop at their next checkpoint and abort their in-flight LLM requests;
+    # queued ones leave the queue and stay "queued" so /resume starts each of them once
+    cancel_task_stages(task_id, "paused")
+    stage_scheduler.withdraw(task_id)
     
-    # Add message to step messages
+    # Add message to step messages; agent_status keeps the stage states /resume picks up from,
+    # so a stage waiting at its approval gate is not mistaken for an interrupted one
     update_task_status(
         task_id,
-        f"Task paused by user: {request.reason}",
+        "Task paused by user: {}",
         0,
-        task.current_agent,
-        "paused"
+        args=(request.reason,)
     )
     
     return {"message": "Task paused successfully"}
@@ -352,14 +802,15 @@ async def resume_task(task_id: str, request: ResumeRequest, background_tasks: Ba
     # Add message to step messages
     update_task_status(
         task_id,
-        f"Task resumed after being paused for {int(pause_duration)} seconds",
+        "Task resumed after being paused for {} seconds",
         0,
         task.current_agent,
-        task.agent_status.get(task.current_agent, "in_progress")
+        task.agent_status.get(task.current_agent, "in_progress"),
+        args=(int(pause_duration),)
     )
     
     # Resume operation based on current state
-    if task.awaiting_user_approval:
+    if task.awaiting_user_approval and not PIPELINE.started(task):
         # Keep waiting for user approval
         return {"message": "Task resumed and awaiting user approval"}
     else:
@@ -368,31 +819,25 @@ async def resume_task(task_id: str, request: ResumeRequest, background_tasks: Ba
             try:
                 # Create crew with the original problem
                 crew = CustomCrew(
-                    tasks_store[task_id].step_messages[0].replace("Task created: ", ""), 
+                    tasks_store[task_id].problem, 
                     task_id
                 )
                 
-                # For now, just restart the current agent - in future could implement checkpointing
+                # Re-run the stages the pause interrupted, which replay their journaled
+                # steps and continue from there, then anything that became ready meanwhile
                 current_agent = task.current_agent
+                interrupted = PIPELINE.started(task) or [name for name in (current_agent,) if name in PIPELINE.stages]
                 update_task_status(
                     task_id,
-                    f"Resuming execution from agent: {current_agent}",
+                    "Resuming execution from agent: {}",
                     0,
-                    current_agent,
-                    "in_progress"
+                    args=(", ".join(interrupted) or current_agent,)
                 )
                 
-                # Simple restart logic - could be enhanced
-                if current_agent == "project_manager":
-                    await start_project_manager(task_id)
-                elif current_agent == "architect":
-                    await start_architect(task_id)
-                elif current_agent == "programmer":
-                    await start_programmer(task_id)
-                elif current_agent == "tester":
-                    await start_tester(task_id)
-                elif current_agent == "reviewer":
-                    await start_reviewer(task_id)
+                await asyncio.gather(*(
+                    stage_scheduler.run(task_id, CONTINUATION, start_agent, task_id, name) for name in interrupted
+                ))
+                await advance_pipeline(task_id)
                 
             except Exception as e:
                 error_msg = f"Error resuming task: {str(e)}"
@@ -417,8 +862,16 @@ async def submit_feedback(task_id: str, agent: str, request: FeedbackRequest, ba
     if task_id not in tasks_store:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    if agent not in ["project_manager", "architect", "programmer", "tester", "reviewer"]:
+    if agent not in PIPELINE.stages:
         raise HTTPException(status_code=400, detail="Invalid agent name")
+
+    # Only the leader approves for the whole coalesced run; feedback forks this task off it
+    if request.approved:
+        acknowledgement = _follower_acknowledgement(task_id, agent)
+        if acknowledgement is not None:
+            return acknowledgement
+    else:
+        _diverge(task_id, background_tasks)
     
     # Store the feedback
     tasks_store[task_id].agent_feedback[agent] = request.feedback
@@ -428,61 +881,43 @@ async def submit_feedback(task_id: str, agent: str, request: FeedbackRequest, ba
     
     # Handle approval or rejection
     if request.approved:
-        # Proceed to next agent if approved
-        next_agent = None
-        if agent == "architect":
-            next_agent = "programmer"
-        elif agent == "programmer":
-            next_agent = "tester"
-        elif agent == "tester":
-            next_agent = "reviewer"
-        elif agent == "reviewer":
-            # Mark task as complete if reviewer is approved
-            tasks_store[task_id].complete = True
-            update_task_status(
-                task_id,
-                f"{agent.capitalize()} work approved. Task completed!",
-                5,
-                "complete",
-                "completed"
-            )
-            return {"message": f"{agent} work approved. Task completed!"}
-        
-        # Update status for next agent
-        if next_agent:
-            tasks_store[task_id].current_agent = next_agent
-            update_task_status(
-                task_id,
-                f"{agent.capitalize()} work approved, proceeding to {next_agent}",
-                5,
-                next_agent,
-                "in_progress"
-            )
-            return {"message": f"{agent} work approved, proceeding to {next_agent}"}
+        # Same gate as /approve: the pipeline picks the next stages from agent_status
+        task = tasks_store[task_id]
+        task.awaiting_user_approval = any(
+            task.agent_status[name] == "awaiting_approval" for name in PIPELINE.order if name != agent
+        )
+        task.user_approved = True
+        return await _pass_gate(task_id, agent, background_tasks)
     else:
         # Mark for revision
         update_task_status(
             task_id,
-            f"{agent.capitalize()} work needs revision: {request.feedback}",
+            "{} work needs revision: {}",
             0,
             agent,
-            "needs_revision"
+            "needs_revision",
+            args=(agent.capitalize(), request.feedback)
         )
         
         # Mark that we're awaiting new results after feedback
         tasks_store[task_id].awaiting_feedback = True
+        speculator.discard(task_id, PIPELINE.successors(agent))
         
         # Start the agent again with feedback in background
         async def restart_agent_with_feedback():
+            # Pausing the task fires this token; it also supersedes a revision still running
+            token = stage_tokens.open((task_id, agent))
             try:
                 # Create crew with the original problem and pass the feedback
                 crew = CustomCrew(
-                    tasks_store[task_id].step_messages[0].replace("Task created: ", ""), 
-                    task_id
+                    tasks_store[task_id].problem, 
+                    task_id,
+                    cancel_token=token
                 )
                 
-                # Run the appropriate agent with feedback
-                result = crew.run_with_feedback(agent, request.feedback)
+                # Run the appropriate agent with feedback; revisions jump the stage queue
+                async with stage_scheduler.slot(task_id, REVISION):
+                    result = await stage_executor.run(run_cancellable, token, crew.run_with_feedback, agent, request.feedback)
                 
                 # Store the result
                 tasks_store[task_id].agent_outputs[agent] = str(result)
@@ -490,10 +925,11 @@ async def submit_feedback(task_id: str, agent: str, request: FeedbackRequest, ba
                 # Update status
                 update_task_status(
                     task_id,
-                    f"{agent.capitalize()} revision completed. Awaiting feedback.",
+                    "{} revision completed. Awaiting feedback.",
                     5,
                     agent,
-                    "awaiting_feedback"
+                    "awaiting_feedback",
+                    args=(agent.capitalize(),)
                 )
                 
             except Exception as e:
@@ -508,6 +944,10 @@ async def submit_feedback(task_id: str, agent: str, request: FeedbackRequest, ba
                         "error"
                     )
                     tasks_store[task_id].error = str(e)
+            except OperationCancelled as e:
+                print(f"Task {task_id}: {agent} revision stopped ({e.reason})")
+            finally:
+                stage_tokens.close((task_id, agent), token)
         
         # Start the background task
         background_tasks.add_task(restart_agent_with_feedback)
@@ -515,32 +955,139 @@ async def submit_feedback(task_id: str, agent: str, request: FeedbackRequest, ba
         return {"message": f"{agent} work requires revision. Feedback recorded and agent restarted."}
 
 # Helper functions for agent execution
+async def advance_pipeline(task_id, priority=CONTINUATION):
+    """Start every pipeline stage whose inputs have been approved; ready stages run concurrently"""
+    task = tasks_store.get(task_id)
+    if not task or task.paused or task.error:
+        return
+    
+    ready = PIPELINE.ready(task)
+    # Claim the stages first so a concurrent approval cannot start them twice
+    for name in ready:
+        task.agent_status[name] = "queued"
+    runs = []
+    for name in ready:
+        speculative = speculator.take(task_id, name, _stage_fingerprint(task, name))
+        if speculative is not None:
+            runs.append(_promote_speculation(task_id, name, speculative))
+        else:
+            runs.append(stage_scheduler.run(task_id, priority, start_agent, task_id, name))
+    await asyncio.gather(*runs)
+
+def _stage_fingerprint(task, name):
+    """What a stage reads; a speculative run is only valid while this is unchanged"""
+    return (task.problem, *(task.agent_outputs[dependency] for dependency in PIPELINE.stages[name].inputs))
+
+def _speculate(task_id):
+    """Start stages ahead of approval on output that is still awaiting it (PIPELINE_SPECULATION)"""
+    task = tasks_store.get(task_id)
+    if not speculator.enabled or not task:
+        return
+    if task.paused or task.error or task.complete:
+        speculator.discard(task_id)
+        return
+    for name in PIPELINE.speculatable(task):
+        build = _STAGE_CREWS.get(name)
+        if build is None:
+            continue
+        # No token stream: the output only becomes visible once the stage is approved to start
+        token = CancellationToken()
+        crew = build(task, CustomAgents(task_id=task_id, cancel_token=token))
+        if speculator.start(task_id, name, _stage_fingerprint(task, name), partial(run_cancellable, token, crew.kickoff), token):
+            print(f"Task {task_id}: speculatively running {name} ahead of approval")
+
+async def _promote_speculation(task_id, name, speculative):
+    """Finish a stage from its speculative run instead of starting it from scratch"""
+    task = tasks_store.get(task_id)
+    if not task:
+        return
+    task.current_agent = name
+    update_task_status(
+        task_id,
+        "Starting {} agent from its speculative run...",
+        5,
+        name,
+        "in_progress",
+        args=(name,)
+    )
+    # The run is now the stage's regular run, which /pause must be able to stop
+    token = speculative.token
+    if token is not None:
+        stage_tokens.open((task_id, name), token)
+    try:
+        result = await asyncio.wrap_future(speculative.future)
+    except (Exception, asyncio.CancelledError, OperationCancelled) as e:
+        if isinstance(e, asyncio.CancelledError) and not speculative.future.cancelled():
+            raise  # This coroutine itself was cancelled
+        if token is not None:
+            stage_tokens.close((task_id, name), token)
+        if task.paused:
+            # Stopped by the pause; /resume runs the stage again
+            print(f"Task {task_id}: speculative {name} run stopped ({str(e)})")
+            return
+        # The speculative run failed or was dropped: run the stage normally instead
+        print(f"Speculative {name} run unusable, starting it again: {str(e)}")
+        await stage_scheduler.run(task_id, CONTINUATION, start_agent, task_id, name)
+        return
+    finally:
+        if token is not None:
+            stage_tokens.close((task_id, name), token)
+    
+    if task.paused or (token is not None and token.cancelled):
+        # Paused as the run finished: keep the stage started so /resume runs it again
+        print(f"Task {task_id}: dropping {name} result finished after the task was paused")
+        return
+    
+    task.agent_outputs[name] = str(result)
+    task.awaiting_user_approval = True
+    update_task_status(
+        task_id,
+        "{} has completed work. Awaiting user approval.",
+        15,
+        name,
+        "awaiting_approval",
+        args=(name.replace("_", " ").capitalize(),)
+    )
+    _speculate(task_id)
+
+def _open_journal(task_id, name):
+    """Journal run for a stage on its current inputs, or None when STAGE_JOURNAL is off"""
+    if stage_journal is None:
+        return None
+    return stage_journal.open(task_id, name, step_key(*_stage_fingerprint(tasks_store[task_id], name)))
+
+def _close_journal(journal, completed):
+    if journal is not None:
+        stage_journal.close(journal, completed)
+
 async def start_agent(task_id, agent_name):
     """Start execution of an agent"""
     task = tasks_store.get(task_id)
     if not task:
         return
     
+    task.current_agent = agent_name
+    
     # Update task status
     update_task_status(
         task_id,
-        f"Starting {agent_name} agent...",
+        "Starting {} agent...",
         5,
         agent_name,
-        "in_progress"
+        "in_progress",
+        args=(agent_name,)
     )
     
     # Call the appropriate agent based on the name
-    if agent_name == "project_manager":
-        await start_project_manager(task_id)
-    elif agent_name == "architect":
-        await start_architect(task_id)
-    elif agent_name == "security":
-        await start_security(task_id)
-    elif agent_name == "tester":
-        await start_tester(task_id)
-    elif agent_name == "reviewer":
-        await start_reviewer(task_id)
+    stage = _STAGE_RUNNERS.get(agent_name)
+    if stage is not None:
+        try:
+            await stage(task_id)
+        except OperationCancelled as e:
+            # Stopped mid-run (the task was paused); its worker and stage slot are free again
+            print(f"Task {task_id}: {agent_name} stage stopped ({e.reason})")
+            return
+        _speculate(task_id)
 
 async def start_project_manager(task_id):
     """Execute the project manager agent with DSPy framework"""
@@ -551,9 +1098,13 @@ async def start_project_manager(task_id):
     if task.paused:
         return  # Don't proceed if task is paused
     
+    # Pausing the task fires this token, which stops the crew and its LLM calls
+    token = stage_tokens.open((task_id, "project_manager"))
+    # Replays the steps an earlier, interrupted attempt completed
+    journal = _open_journal(task_id, "project_manager")
     try:
         # Get the original problem description
-        problem = task.step_messages[0].replace("Task created: ", "")
+        problem = task.problem
         
         update_task_status(
             task_id,
@@ -566,7 +1117,12 @@ async def start_project_manager(task_id):
         # Use DSPy to process the user input and get structured output
         try:
             # Process with DSPy first
-            dspy_result = process_with_dspy(problem)
+            if stage_executor.kind == "process":
+                dspy_result = await stage_executor.run(process_with_dspy, problem, portable=True)
+                # The other process is out of the token's reach; drop its result if paused meanwhile
+                token.raise_if_cancelled()
+            else:
+                dspy_result = await stage_executor.run(run_cancellable, token, process_with_dspy, problem)
             result = dspy_result
             
             update_task_status(
@@ -576,19 +1132,23 @@ async def start_project_manager(task_id):
                 "project_manager",
                 "in_progress"
             )
+        except LLMError:
+            # The backend itself is failing; a CrewAI fallback would hit it again
+            raise
         except Exception as dspy_error:
             # Log the DSPy error
             print(f"Error using DSPy: {str(dspy_error)}. Falling back to CrewAI.")
             update_task_status(
                 task_id,
-                f"DSPy processing failed: {str(dspy_error)}. Falling back to CrewAI.",
+                "DSPy processing failed: {}. Falling back to CrewAI.",
                 0,
                 "project_manager",
-                "in_progress"
+                "in_progress",
+                args=(str(dspy_error),)
             )
             
             # Fall back to CrewAI if DSPy fails
-            agents = CustomAgents()
+            agents = CustomAgents(on_token=begin_agent_stream(task_id, "project_manager"), task_id=task_id, cancel_token=token)
             tasks_obj = CustomTasks()
             
             # Create PM agent
@@ -604,11 +1164,12 @@ async def start_project_manager(task_id):
                 verbose=True,
             )
             
-            # Run the agent
-            result = mini_crew.kickoff()
+            # Run the agent on the stage executor so status polls stay responsive
+            result = await stage_executor.run(run_cancellable, token, run_journaled, journal, mini_crew.kickoff)
         
         # Store output
         task.agent_outputs["project_manager"] = str(result)
+        _close_journal(journal, completed=True)
         
         # Mark as awaiting approval
         task.awaiting_user_approval = True
@@ -632,6 +1193,143 @@ async def start_project_manager(task_id):
             "error"
         )
         task.error = str(e)
+    finally:
+        end_agent_stream(task_id, "project_manager")
+        stage_tokens.close((task_id, "project_manager"), token)
+        _close_journal(journal, completed=False)
+
+def _architect_crew(task, agents):
+    """Architect crew working from the approved project specification"""
+    # Get the project management output as input for architect
+    pm_output = task.agent_outputs.get("project_manager", "No project specification provided")
+    problem = task.problem
+    enhanced_problem = f"{problem}\n\nProject Specification:\n{pm_output}"
+    
+    # Create tasks
+    tasks_obj = CustomTasks()
+    
+    # Create architect agent
+    agent = agents.architect_agent(architect_tools)
+    
+    # Create architecture task with enhanced problem
+    architecture_task = tasks_obj.architecture_task(agent, architect_tools, enhanced_problem)
+    
+    # Create mini crew with just this agent
+    mini_crew = Crew(
+        agents=[agent],
+        tasks=[architecture_task],
+        verbose=True,
+    )
+    
+    return mini_crew
+
+def _tester_crew(task, agents):
+    """Tester crew planning tests against the approved architecture"""
+    # Get architect output, the stage's declared pipeline input
+    architect_output = task.agent_outputs.get("architect", "No architecture provided")
+    
+    # Create tasks
+    tasks_obj = CustomTasks()
+    
+    # Create tester agent
+    agent = agents.tester_agent(tester_tools)
+    
+    # Create context task
+    context_task = Task(
+        description=f"Architecture: {architect_output}",
+        agent=agent,
+        expected_output="Context information for testing."
+    )
+    
+    # Create testing task based on context
+    testing_task = tasks_obj.testing_task(agent, tester_tools, [context_task])
+    
+    # Create mini crew
+    mini_crew = Crew(
+        agents=[agent],
+        tasks=[testing_task],
+        verbose=True,
+    )
+    
+    return mini_crew
+
+def _security_crew(task, agents):
+    """Security crew reviewing the architecture"""
+    # Get architect output
+    architect_output = task.agent_outputs.get("architect", "No architecture provided")
+    
+    # Create tasks
+    tasks_obj = CustomTasks()
+    
+    # Create security agent
+    agent = agents.security_agent(security_tools)
+    
+    # Create context task
+    context_task = Task(
+        description=f"Architecture: {architect_output}",
+        agent=agent,
+        expected_output="Context information for security analysis."
+    )
+    
+    # Create security task based on context
+    security_task = tasks_obj.security_task(agent, security_tools, [context_task])
+    
+    # Create mini crew
+    mini_crew = Crew(
+        agents=[agent],
+        tasks=[security_task],
+        verbose=True,
+    )
+    
+    return mini_crew
+
+def _reviewer_crew(task, agents):
+    """Reviewer crew checking the architecture, security review and tests"""
+    # Get the outputs of the stage's declared pipeline inputs
+    architecture = task.agent_outputs.get("architect", "No architecture provided")
+    security = task.agent_outputs.get("security", "No security review provided")
+    tests = task.agent_outputs.get("tester", "No tests provided")
+    
+    # Create tasks
+    tasks_obj = CustomTasks()
+    
+    # Create reviewer agent
+    agent = agents.reviewer_agent(reviewer_tools)
+    
+    # Create context tasks
+    arch_context = Task(
+        description=f"Architecture: {architecture}",
+        agent=agent,
+        expected_output="Context information for architecture review."
+    )
+    
+    security_context = Task(
+        description=f"Security review: {security}",
+        agent=agent,
+        expected_output="Context information for security review."
+    )
+    
+    test_context = Task(
+        description=f"Tests: {tests}",
+        agent=agent,
+        expected_output="Context information for test results review."
+    )
+    
+    # Create reviewing task based on all contexts
+    reviewing_task = tasks_obj.reviewing_task(
+        agent,
+        reviewer_tools,
+        [arch_context, security_context, test_context]
+    )
+    
+    # Create mini crew
+    mini_crew = Crew(
+        agents=[agent],
+        tasks=[reviewing_task],
+        verbose=True,
+    )
+    
+    return mini_crew
 
 async def start_architect(task_id):
     """Execute the architect agent"""
@@ -642,34 +1340,21 @@ async def start_architect(task_id):
     if task.paused:
         return  # Don't proceed if task is paused
     
+    # Pausing the task fires this token, which stops the crew and its LLM calls
+    token = stage_tokens.open((task_id, "architect"))
+    # Replays the steps an earlier, interrupted attempt completed
+    journal = _open_journal(task_id, "architect")
     try:
-        # Get the project management output as input for architect
-        pm_output = task.agent_outputs.get("project_manager", "No project specification provided")
-        problem = task.step_messages[0].replace("Task created: ", "")
-        enhanced_problem = f"{problem}\n\nProject Specification:\n{pm_output}"
-        
-        # Create agents and tasks
-        agents = CustomAgents()
-        tasks_obj = CustomTasks()
-        
-        # Create architect agent
-        agent = agents.architect_agent(architect_tools)
-        
-        # Create architecture task with enhanced problem
-        architecture_task = tasks_obj.architecture_task(agent, architect_tools, enhanced_problem)
-        
-        # Create mini crew with just this agent
-        mini_crew = Crew(
-            agents=[agent],
-            tasks=[architecture_task],
-            verbose=True,
-        )
+        # Create agents and the crew
+        agents = CustomAgents(on_token=begin_agent_stream(task_id, "architect"), task_id=task_id, cancel_token=token)
+        mini_crew = _architect_crew(task, agents)
         
-        # Run the agent
-        result = mini_crew.kickoff()
+        # Run the agent on the stage executor so status polls stay responsive
+        result = await stage_executor.run(run_cancellable, token, run_journaled, journal, mini_crew.kickoff)
         
         # Store output
         task.agent_outputs["architect"] = str(result)
+        _close_journal(journal, completed=True)
         
         # Mark as awaiting approval
         task.awaiting_user_approval = True
@@ -693,72 +1378,10 @@ async def start_architect(task_id):
             "error"
         )
         task.error = str(e)
-
-async def start_programmer(task_id):
-    """Execute the programmer agent"""
-    task = tasks_store.get(task_id)
-    if not task:
-        return
-        
-    if task.paused:
-        return  # Don't proceed if task is paused
-    
-    try:
-        # Get architect output
-        architect_output = task.agent_outputs.get("architect", "No architecture provided")
-        
-        # Create agents and tasks
-        agents = CustomAgents()
-        tasks_obj = CustomTasks()
-        
-        # Create programmer agent
-        agent = agents.programmer_agent(programmer_tools)
-        
-        # Create context task
-        context_task = Task(
-            description=f"Architecture: {architect_output}",
-            agent=agent,
-            expected_output="Context information for security analysis."
-        )
-        
-        # Create implementation task based on context
-        implementation_task = tasks_obj.implementation_task(agent, programmer_tools, [context_task])
-        
-        # Create mini crew
-        mini_crew = Crew(
-            agents=[agent],
-            tasks=[implementation_task],
-            verbose=True,
-        )
-        
-        # Run the agent
-        result = mini_crew.kickoff()
-        
-        # Store output
-        task.agent_outputs["programmer"] = str(result)
-        
-        # Mark as awaiting approval
-        task.awaiting_user_approval = True
-        
-        update_task_status(
-            task_id,
-            "Programmer has completed work. Awaiting user approval.",
-            15,
-            "programmer",
-            "awaiting_approval"
-        )
-        
-    except Exception as e:
-        error_msg = f"Error during Programmer execution: {str(e)}"
-        print(error_msg)
-        update_task_status(
-            task_id,
-            error_msg,
-            0,
-            "programmer",
-            "error"
-        )
-        task.error = str(e)
+    finally:
+        end_agent_stream(task_id, "architect")
+        stage_tokens.close((task_id, "architect"), token)
+        _close_journal(journal, completed=False)
 
 async def start_tester(task_id):
     """Execute the tester agent"""
@@ -769,39 +1392,21 @@ async def start_tester(task_id):
     if task.paused:
         return  # Don't proceed if task is paused
     
+    # Pausing the task fires this token, which stops the crew and its LLM calls
+    token = stage_tokens.open((task_id, "tester"))
+    # Replays the steps an earlier, interrupted attempt completed
+    journal = _open_journal(task_id, "tester")
     try:
-        # Get programmer output
-        programmer_output = task.agent_outputs.get("programmer", "No implementation provided")
+        # Create agents and the crew
+        agents = CustomAgents(on_token=begin_agent_stream(task_id, "tester"), task_id=task_id, cancel_token=token)
+        mini_crew = _tester_crew(task, agents)
         
-        # Create agents and tasks
-        agents = CustomAgents()
-        tasks_obj = CustomTasks()
-        
-        # Create tester agent
-        agent = agents.tester_agent(tester_tools)
-        
-        # Create context task
-        context_task = Task(
-            description=f"Implementation: {programmer_output}",
-            agent=agent,
-            expected_output="Context information for testing."
-        )
-        
-        # Create testing task based on context
-        testing_task = tasks_obj.testing_task(agent, tester_tools, [context_task])
-        
-        # Create mini crew
-        mini_crew = Crew(
-            agents=[agent],
-            tasks=[testing_task],
-            verbose=True,
-        )
-        
-        # Run the agent
-        result = mini_crew.kickoff()
+        # Run the agent on the stage executor so status polls stay responsive
+        result = await stage_executor.run(run_cancellable, token, run_journaled, journal, mini_crew.kickoff)
         
         # Store output
         task.agent_outputs["tester"] = str(result)
+        _close_journal(journal, completed=True)
         
         # Mark as awaiting approval
         task.awaiting_user_approval = True
@@ -825,6 +1430,10 @@ async def start_tester(task_id):
             "error"
         )
         task.error = str(e)
+    finally:
+        end_agent_stream(task_id, "tester")
+        stage_tokens.close((task_id, "tester"), token)
+        _close_journal(journal, completed=False)
 
 async def start_security(task_id):
     """Execute the security agent"""
@@ -835,39 +1444,21 @@ async def start_security(task_id):
     if task.paused:
         return  # Don't proceed if task is paused
     
+    # Pausing the task fires this token, which stops the crew and its LLM calls
+    token = stage_tokens.open((task_id, "security"))
+    # Replays the steps an earlier, interrupted attempt completed
+    journal = _open_journal(task_id, "security")
     try:
-        # Get architect output
-        architect_output = task.agent_outputs.get("architect", "No architecture provided")
+        # Create agents and the crew
+        agents = CustomAgents(on_token=begin_agent_stream(task_id, "security"), task_id=task_id, cancel_token=token)
+        mini_crew = _security_crew(task, agents)
         
-        # Create agents and tasks
-        agents = CustomAgents()
-        tasks_obj = CustomTasks()
-        
-        # Create security agent
-        agent = agents.security_agent(security_tools)
-        
-        # Create context task
-        context_task = Task(
-            description=f"Architecture: {architect_output}",
-            agent=agent,
-            expected_output="Context information for security analysis."
-        )
-        
-        # Create security task based on context
-        security_task = tasks_obj.security_task(agent, security_tools, [context_task])
-        
-        # Create mini crew
-        mini_crew = Crew(
-            agents=[agent],
-            tasks=[security_task],
-            verbose=True,
-        )
-        
-        # Run the agent
-        result = mini_crew.kickoff()
+        # Run the agent on the stage executor so status polls stay responsive
+        result = await stage_executor.run(run_cancellable, token, run_journaled, journal, mini_crew.kickoff)
         
         # Store output
         task.agent_outputs["security"] = str(result)
+        _close_journal(journal, completed=True)
         
         # Mark as awaiting approval
         task.awaiting_user_approval = True
@@ -891,6 +1482,10 @@ async def start_security(task_id):
             "error"
         )
         task.error = str(e)
+    finally:
+        end_agent_stream(task_id, "security")
+        stage_tokens.close((task_id, "security"), token)
+        _close_journal(journal, completed=False)
 
 async def start_reviewer(task_id):
     """Execute the reviewer agent"""
@@ -901,57 +1496,21 @@ async def start_reviewer(task_id):
     if task.paused:
         return  # Don't proceed if task is paused
     
+    # Pausing the task fires this token, which stops the crew and its LLM calls
+    token = stage_tokens.open((task_id, "reviewer"))
+    # Replays the steps an earlier, interrupted attempt completed
+    journal = _open_journal(task_id, "reviewer")
     try:
-        # Get previous outputs
-        architecture = task.agent_outputs.get("architect", "No architecture provided")
-        implementation = task.agent_outputs.get("programmer", "No implementation provided")
-        tests = task.agent_outputs.get("tester", "No tests provided")
-        
-        # Create agents and tasks
-        agents = CustomAgents()
-        tasks_obj = CustomTasks()
-        
-        # Create reviewer agent
-        agent = agents.reviewer_agent(reviewer_tools)
-        
-        # Create context tasks
-        arch_context = Task(
-            description=f"Architecture: {architecture}",
-            agent=agent,
-            expected_output="Context information for architecture review."
-        )
-        
-        impl_context = Task(
-            description=f"Implementation: {implementation}",
-            agent=agent,
-            expected_output="Context information for implementation review."
-        )
+        # Create agents and the crew
+        agents = CustomAgents(on_token=begin_agent_stream(task_id, "reviewer"), task_id=task_id, cancel_token=token)
+        mini_crew = _reviewer_crew(task, agents)
         
-        test_context = Task(
-            description=f"Tests: {tests}",
-            agent=agent,
-            expected_output="Context information for test results review."
-        )
-        
-        # Create reviewing task based on all contexts
-        reviewing_task = tasks_obj.reviewing_task(
-            agent,
-            reviewer_tools,
-            [arch_context, impl_context, test_context]
-        )
-        
-        # Create mini crew
-        mini_crew = Crew(
-            agents=[agent],
-            tasks=[reviewing_task],
-            verbose=True,
-        )
-        
-        # Run the agent
-        result = mini_crew.kickoff()
+        # Run the agent on the stage executor so status polls stay responsive
+        result = await stage_executor.run(run_cancellable, token, run_journaled, journal, mini_crew.kickoff)
         
         # Store output
         task.agent_outputs["reviewer"] = str(result)
+        _close_journal(journal, completed=True)
         
         # Mark as awaiting approval
         task.awaiting_user_approval = True
@@ -975,3 +1534,24 @@ async def start_reviewer(task_id):
             "error"
         )
         task.error = str(e)
+    finally:
+        end_agent_stream(task_id, "reviewer")
+        stage_tokens.close((task_id, "reviewer"), token)
+        _close_journal(journal, completed=False)
+
+# Coroutine that runs each pipeline stage
+_STAGE_RUNNERS = {
+    "project_manager": start_project_manager,
+    "architect": start_architect,
+    "security": start_security,
+    "tester": start_tester,
+    "reviewer": start_reviewer,
+}
+
+# Builds the crew of each stage that has inputs, for speculative runs
+_STAGE_CREWS = {
+    "architect": _architect_crew,
+    "security": _security_crew,
+    "tester": _tester_crew,
+    "reviewer": _reviewer_crew,
+}
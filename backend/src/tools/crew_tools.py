@@ -4,28 +4,34 @@ from tools.search_utils import CachedSearch
 from tools.file_write import FileWriteTool
 from tools.directory_write import DirWriteTool
 from tools.crewai_tools import FileReadTool
+from agents.cancellation import check_cancelled
+from agents.step_journal import journaled_step
 
 file_read_tool = FileReadTool()
 cached_search = CachedSearch()
 @tool("Search the web")
 def search_web(query: str) -> str:
     """Search the web for information with caching and retry logic."""
-    return cached_search.search(query)
+    check_cancelled()
+    return journaled_step("search_web", (query,), lambda: cached_search.search(query))
 
 @tool("Read file")
 def read_file(file_path: str) -> str:
     """Read content from a file."""
-    return file_read_tool.run(file_path)
+    check_cancelled()
+    return journaled_step("read_file", (file_path,), lambda: file_read_tool.run(file_path))
 
 @tool("Write file")
 def write_file(filename: str, content: str) -> str:
     """Write content to a file."""
-    return FileWriteTool().run(filename, content)
+    check_cancelled()
+    return journaled_step("write_file", (filename, content), lambda: FileWriteTool().run(filename, content))
 
 @tool("Create directory")
 def create_directory(directory_path: str) -> str:
     """Create a new directory."""
-    return DirWriteTool().run(directory_path)
+    check_cancelled()
+    return journaled_step("create_directory", (directory_path,), lambda: DirWriteTool().run(directory_path))
 
 # Tool lists
 architect_tools = [
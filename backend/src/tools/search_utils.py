@@ -4,6 +4,7 @@ import json
 import os
 from typing import Optional, Dict, Any
 from langchain_community.tools import DuckDuckGoSearchRun
+from agents.cancellation import cancellable_sleep, check_cancelled
 
 class CachedSearch:
     def __init__(self, cache_file="search_cache.json", max_retries=3, base_delay=2):
@@ -42,6 +43,7 @@ class CachedSearch:
         # If not in cache, perform search with retry logic
         for attempt in range(self.max_retries):
             try:
+                check_cancelled()
                 print(f"Search attempt {attempt + 1} for query: {query}")
                 result = self.search_tool.run(query)
                 
@@ -60,10 +62,10 @@ class CachedSearch:
                     # Calculate delay with exponential backoff and jitter
                     delay = (self.base_delay * (2 ** attempt)) + (random.random() * 2)
                     print(f"Rate limit hit. Retrying in {delay:.2f} seconds...")
-                    time.sleep(delay)
+                    cancellable_sleep(delay)
                 else:
                     # If it's not a rate limit issue, just pause briefly before retry
-                    time.sleep(1)
+                    cancellable_sleep(1)
         
         # If all retries failed, return a fallback message
         fallback_message = "I couldn't complete the web search due to rate limiting. Proceeding with the task based on my existing knowledge."
@@ -0,0 +1,87 @@
+import time
+import unittest
+
+from agents.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from agents.llm_errors import LLMCircuitOpenError
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_success_resets_the_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_probe_closes_on_success(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        with breaker.guard():
+            self.assertEqual(breaker.state, HALF_OPEN)
+            breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertIsNone(breaker.before_call())
+
+    def test_half_open_probe_reopens_on_failure(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        with breaker.guard():
+            breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+
+    def test_only_half_open_calls_probes_go_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertIsNotNone(breaker.before_call())
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+
+    def test_abandoned_probe_is_released(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        with self.assertRaises(KeyboardInterrupt):
+            with breaker.guard():
+                raise KeyboardInterrupt
+        self.assertEqual(breaker.state, HALF_OPEN)
+        self.assertIsNotNone(breaker.before_call())
+
+    def test_leaked_probe_is_rearmed_after_recovery_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        breaker.before_call()  # never released
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+        time.sleep(0.06)
+        self.assertIsNotNone(breaker.before_call())
+
+    def test_stale_probe_does_not_free_a_newer_slot(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, half_open_calls=1)
+        breaker.record_failure()
+        time.sleep(0.06)
+        stale = breaker.before_call()
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.release(stale)
+        with self.assertRaises(LLMCircuitOpenError):
+            breaker.before_call()
+
+
+if __name__ == '__main__':
+    unittest.main()
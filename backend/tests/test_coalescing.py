@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+from functions.coalescing import ProblemCoalescer, problem_key
+
+
+def joinable(task_id):
+    return True
+
+
+class TestProblemKey(unittest.TestCase):
+    def test_normalizes_case_whitespace_and_unicode_form(self):
+        self.assertEqual(problem_key("Build a  TODO app"), problem_key(" build a todo app\n"))
+        self.assertEqual(problem_key("caf\u00e9"), problem_key("cafe\u0301"))
+        self.assertNotEqual(problem_key("build a todo app"), problem_key("build a todo list"))
+
+
+class TestProblemCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.coalescer = ProblemCoalescer(enabled=True, window=60.0)
+        self.coalescer.lead("leader", "Build a TODO app")
+
+    def test_finds_an_open_run_for_the_same_problem(self):
+        self.assertEqual(self.coalescer.find("build a todo app", joinable), "leader")
+        self.assertIsNone(self.coalescer.find("something else", joinable))
+        self.assertIsNone(self.coalescer.find("build a todo app", lambda task_id: False))
+
+    def test_disabled_coalescer_never_matches(self):
+        coalescer = ProblemCoalescer(enabled=False)
+        coalescer.lead("leader", "problem")
+        self.assertIsNone(coalescer.find("problem", joinable))
+
+    def test_runs_close_after_the_window(self):
+        with mock.patch("functions.coalescing.time.time", return_value=10 ** 12):
+            self.assertIsNone(self.coalescer.find("build a todo app", joinable))
+        self.assertEqual(self.coalescer.stats()["open_runs"], 0)
+
+    def test_a_newer_run_takes_over_the_problem(self):
+        self.coalescer.lead("newer", "build a todo app")
+        self.assertEqual(self.coalescer.find("build a todo app", joinable), "newer")
+        self.assertEqual(self.coalescer.stats()["open_runs"], 1)
+
+    def test_follow(self):
+        self.coalescer.follow("f1", "leader")
+        self.coalescer.follow("f2", "leader")
+        self.assertEqual(self.coalescer.leader_of("f1"), "leader")
+        self.assertIsNone(self.coalescer.leader_of("leader"))
+        self.assertEqual(self.coalescer.followers("leader"), ["f1", "f2"])
+
+    def test_detached_follower_leaves_the_rest_of_the_group(self):
+        self.coalescer.follow("f1", "leader")
+        self.coalescer.follow("f2", "leader")
+        self.assertEqual(self.coalescer.detach("f1"), ["f1"])
+        self.assertIsNone(self.coalescer.leader_of("f1"))
+        self.assertEqual(self.coalescer.followers("leader"), ["f2"])
+        self.assertEqual(self.coalescer.find("build a todo app", joinable), "leader")
+
+    def test_detached_leader_releases_its_followers(self):
+        self.coalescer.follow("f1", "leader")
+        self.coalescer.follow("f2", "leader")
+        self.assertEqual(self.coalescer.detach("leader"), ["f1", "f2"])
+        self.assertIsNone(self.coalescer.leader_of("f2"))
+        self.assertIsNone(self.coalescer.find("build a todo app", joinable))
+        self.assertEqual(self.coalescer.stats()["detached"], 2)
+
+    def test_disband_closes_the_run(self):
+        self.coalescer.follow("f1", "leader")
+        self.assertEqual(self.coalescer.disband("leader"), ["f1"])
+        self.assertEqual(self.coalescer.disband("leader"), [])
+        self.assertIsNone(self.coalescer.find("build a todo app", joinable))
+        self.assertEqual(self.coalescer.stats()["followers"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
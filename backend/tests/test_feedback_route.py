@@ -0,0 +1,53 @@
+import unittest
+from unittest import mock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from functions.functions import TaskStatus, tasks_store
+from routes import api_routes
+
+
+class TestLegacyFeedbackApproval(unittest.TestCase):
+    def setUp(self):
+        self.started = []
+
+        def runner(name):
+            async def run(task_id):
+                self.started.append(name)
+            return run
+
+        runners = {name: runner(name) for name in api_routes._STAGE_RUNNERS}
+        patcher = mock.patch.dict(api_routes._STAGE_RUNNERS, runners)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        app = FastAPI()
+        app.include_router(api_routes.router)
+        self.client = TestClient(app)
+
+        self.task_id = "feedback-route-test"
+        task = TaskStatus("Build a TODO app")
+        task.agent_status["project_manager"] = "approved"
+        task.completed_agents.append("project_manager")
+        task.agent_status["architect"] = "awaiting_approval"
+        task.current_agent = "architect"
+        task.awaiting_user_approval = True
+        tasks_store[self.task_id] = task
+        self.addCleanup(tasks_store.__delitem__, self.task_id)
+
+    def test_approving_architect_starts_security_and_tester_only(self):
+        response = self.client.post(
+            f"/feedback/{self.task_id}/architect", json={"feedback": "looks good", "approved": True}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        task = tasks_store[self.task_id]
+        self.assertEqual(sorted(self.started), ["security", "tester"])
+        self.assertIn("architect", task.completed_agents)
+        self.assertEqual(task.agent_status["architect"], "approved")
+        self.assertEqual(task.agent_status["reviewer"], "pending")
+        self.assertFalse(task.awaiting_user_approval)
+
+
+if __name__ == '__main__':
+    unittest.main()
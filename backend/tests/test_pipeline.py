@@ -0,0 +1,83 @@
+import unittest
+from types import SimpleNamespace
+
+from functions.pipeline import PIPELINE, Pipeline, Stage
+
+
+class TestPipelineGraph(unittest.TestCase):
+    def test_inputs_come_before_their_consumers(self):
+        order = PIPELINE.order
+        for name, stage in PIPELINE.stages.items():
+            for dependency in stage.inputs:
+                self.assertLess(order.index(dependency), order.index(name))
+        self.assertEqual(order[0], "project_manager")
+        self.assertEqual(order[-1], "reviewer")
+
+    def test_successors(self):
+        self.assertEqual(PIPELINE.successors("architect"), ["security", "tester", "reviewer"])
+        self.assertEqual(PIPELINE.successors("reviewer"), [])
+
+    def test_rejects_bad_graphs(self):
+        with self.assertRaises(ValueError):
+            Pipeline((Stage("a"), Stage("a")))
+        with self.assertRaises(ValueError):
+            Pipeline((Stage("a", inputs=("missing",)),))
+        with self.assertRaises(ValueError):
+            Pipeline((Stage("a", inputs=("b",)), Stage("b", inputs=("a",))))
+
+
+class TestPipelineProgress(unittest.TestCase):
+    def setUp(self):
+        self.task = SimpleNamespace(agent_status={name: "pending" for name in PIPELINE.order}, completed_agents=[])
+
+    def approve(self, *names):
+        # Recorded the way the approval gate records it
+        for name in names:
+            self.task.agent_status[name] = "approved"
+            self.task.completed_agents.append(name)
+
+    def test_first_stage_is_ready_on_a_new_task(self):
+        self.assertEqual(PIPELINE.ready(self.task), ["project_manager"])
+        self.assertEqual(PIPELINE.started(self.task), [])
+        self.assertFalse(PIPELINE.finished(self.task))
+
+    def test_parallel_stages_become_ready_together(self):
+        self.approve("project_manager", "architect")
+        self.assertEqual(PIPELINE.ready(self.task), ["security", "tester"])
+
+    def test_stage_waits_for_every_input_gate(self):
+        self.approve("project_manager", "architect", "security")
+        self.task.agent_status["tester"] = "awaiting_approval"
+        self.assertEqual(PIPELINE.ready(self.task), [])
+        self.assertEqual(PIPELINE.speculatable(self.task), ["reviewer"])
+        self.assertEqual(PIPELINE.active(self.task), ["tester"])
+
+    def test_speculation_needs_output_from_every_input(self):
+        self.approve("project_manager", "architect", "tester")
+        self.task.agent_status["security"] = "in_progress"
+        self.assertEqual(PIPELINE.speculatable(self.task), [])
+
+    def test_started_lists_stages_without_output(self):
+        self.approve("project_manager", "architect")
+        self.task.agent_status["security"] = "queued"
+        self.task.agent_status["tester"] = "in_progress"
+        self.assertEqual(PIPELINE.started(self.task), ["security", "tester"])
+        self.assertEqual(PIPELINE.active(self.task), ["security", "tester"])
+        # Stages that have produced output are not restarted
+        self.task.agent_status["tester"] = "awaiting_approval"
+        self.assertEqual(PIPELINE.started(self.task), ["security"])
+
+    def test_legacy_paused_status_counts_as_started(self):
+        self.task.agent_status["project_manager"] = "paused"
+        self.assertEqual(PIPELINE.started(self.task), ["project_manager"])
+        self.assertEqual(PIPELINE.ready(self.task), [])
+
+    def test_finished_once_every_gate_has_passed(self):
+        self.approve(*PIPELINE.order)
+        self.assertTrue(PIPELINE.finished(self.task))
+        self.assertEqual(PIPELINE.ready(self.task), [])
+        self.assertEqual(PIPELINE.active(self.task), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
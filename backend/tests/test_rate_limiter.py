@@ -0,0 +1,81 @@
+import time
+import unittest
+
+from agents.rate_limiter import AdaptiveRateLimiter, INTERACTIVE, is_retryable_status, parse_retry_after
+
+
+class TestRetryHelpers(unittest.TestCase):
+    def test_retryable_statuses(self):
+        self.assertTrue(is_retryable_status(429))
+        self.assertTrue(is_retryable_status(503))
+        self.assertFalse(is_retryable_status(400))
+        self.assertFalse(is_retryable_status(200))
+
+    def test_parse_retry_after_seconds(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertEqual(parse_retry_after("-1"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_parse_retry_after_http_date(self):
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+
+
+class TestAdaptiveRateLimiter(unittest.TestCase):
+    def test_backs_off_multiplicatively_down_to_min_rate(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, min_rate=1.0, decrease=0.5)
+        limiter.record(429)
+        self.assertEqual(limiter.rate, 5.0)
+        limiter.record(503)
+        self.assertEqual(limiter.rate, 2.5)
+        for _ in range(5):
+            limiter.record(500)
+        self.assertEqual(limiter.rate, 1.0)
+        self.assertEqual(limiter.stats()["throttled"], 7)
+
+    def test_recovers_additively_up_to_max_rate(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, increase=1.0, decrease=0.5)
+        limiter.record(429)
+        limiter.record(200)
+        self.assertEqual(limiter.rate, 6.0)
+        for _ in range(10):
+            limiter.record(200)
+        self.assertEqual(limiter.rate, 10.0)
+
+    def test_client_errors_leave_the_rate_alone(self):
+        limiter = AdaptiveRateLimiter(rate=10.0, decrease=0.5)
+        limiter.record(429)
+        limiter.record(404)
+        self.assertEqual(limiter.rate, 5.0)
+
+    def test_throttling_empties_the_bucket(self):
+        limiter = AdaptiveRateLimiter(burst=2)
+        limiter.record(429)
+        self.assertLessEqual(limiter.tokens, 0.0)
+
+    def test_retry_after_blocks_new_requests(self):
+        limiter = AdaptiveRateLimiter()
+        limiter.record(429, retry_after=30)
+        self.assertGreater(limiter.stats()["blocked_for"], 29)
+
+    def test_acquire_and_release_track_in_flight(self):
+        limiter = AdaptiveRateLimiter(max_concurrency=2, burst=2)
+        self.assertLess(limiter.acquire(INTERACTIVE), 0.01)
+        limiter.acquire()
+        self.assertEqual(limiter.stats()["in_flight"], 2)
+        limiter.release()
+        limiter.release()
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    def test_acquire_waits_for_a_token(self):
+        limiter = AdaptiveRateLimiter(rate=20.0, burst=1)
+        limiter.acquire()
+        limiter.release()
+        start = time.monotonic()
+        limiter.acquire()
+        limiter.release()
+        self.assertGreaterEqual(time.monotonic() - start, 0.03)
+
+
+if __name__ == '__main__':
+    unittest.main()
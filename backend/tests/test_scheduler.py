@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+
+from functions.scheduler import StageScheduler, StageWithdrawn, CONTINUATION, NEW_TASK, REVISION
+
+
+class TestStageScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_admits_up_to_max_in_flight(self):
+        scheduler = StageScheduler(max_in_flight=2, high_water=10)
+        async with scheduler.slot("a"):
+            async with scheduler.slot("b"):
+                self.assertEqual(scheduler.in_flight, 2)
+                self.assertFalse(scheduler.try_acquire())
+        self.assertEqual(scheduler.in_flight, 0)
+        self.assertEqual(scheduler.stats()["admitted"], 2)
+
+    async def test_try_acquire_keeps_a_reserve(self):
+        scheduler = StageScheduler(max_in_flight=2, high_water=10)
+        self.assertFalse(scheduler.try_acquire(reserve=2))
+        self.assertTrue(scheduler.try_acquire(reserve=1))
+        scheduler.release()
+        self.assertEqual(scheduler.in_flight, 0)
+
+    async def test_queued_stages_start_by_priority_then_arrival(self):
+        scheduler = StageScheduler(max_in_flight=1, high_water=10)
+        started = []
+
+        async def stage(name):
+            started.append(name)
+
+        async with scheduler.slot("running"):
+            waiters = [
+                asyncio.create_task(scheduler.run("new", NEW_TASK, stage, "new")),
+                asyncio.create_task(scheduler.run("next", CONTINUATION, stage, "next")),
+                asyncio.create_task(scheduler.run("revision", REVISION, stage, "revision")),
+                asyncio.create_task(scheduler.run("next2", CONTINUATION, stage, "next2")),
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.queue_depth(), 4)
+            self.assertEqual(scheduler.position("revision"), 1)
+            self.assertEqual(scheduler.position("new"), 4)
+        await asyncio.gather(*waiters)
+        self.assertEqual(started, ["revision", "next", "next2", "new"])
+        self.assertIsNone(scheduler.position("new"))
+
+    async def test_listeners_follow_queue_positions(self):
+        scheduler = StageScheduler(max_in_flight=1, high_water=10)
+        positions = []
+        scheduler.add_listener(lambda task_id, position: positions.append((task_id, position)))
+
+        async def stage():
+            pass
+
+        async with scheduler.slot("running"):
+            waiter = asyncio.create_task(scheduler.run("queued", NEW_TASK, stage))
+            await asyncio.sleep(0)
+        await waiter
+        self.assertEqual(positions, [("queued", 1), ("queued", None)])
+
+    async def test_saturation_and_retry_after(self):
+        scheduler = StageScheduler(max_in_flight=1, high_water=2)
+
+        async def stage():
+            pass
+
+        self.assertEqual(scheduler.retry_after(), 30)
+        async with scheduler.slot("running"):
+            waiters = [asyncio.create_task(scheduler.run(str(i), NEW_TASK, stage)) for i in range(2)]
+            await asyncio.sleep(0)
+            self.assertTrue(scheduler.saturated())
+            # Two queued stages plus the rejected one, one at a time
+            self.assertEqual(scheduler.retry_after(), 90)
+        await asyncio.gather(*waiters)
+        self.assertFalse(scheduler.saturated())
+
+    async def test_withdraw_drops_queued_runs_only(self):
+        scheduler = StageScheduler(max_in_flight=1, high_water=10)
+        started = []
+
+        async def stage(name):
+            started.append(name)
+            return name
+
+        async with scheduler.slot("a"):
+            withdrawn = asyncio.create_task(scheduler.run("a", CONTINUATION, stage, "a"))
+            kept = asyncio.create_task(scheduler.run("b", CONTINUATION, stage, "b"))
+            await asyncio.sleep(0)
+            self.assertEqual(scheduler.withdraw("a"), 1)
+            self.assertEqual(scheduler.withdraw("a"), 0)
+            self.assertEqual(scheduler.position("b"), 1)
+        self.assertIsNone(await withdrawn)
+        self.assertEqual(await kept, "b")
+        self.assertEqual(started, ["b"])
+        self.assertEqual(scheduler.stats()["withdrawn"], 1)
+
+    async def test_withdrawable_slot_raises(self):
+        scheduler = StageScheduler(max_in_flight=1, high_water=10)
+
+        async def wait_for_slot():
+            async with scheduler.slot("a", withdrawable=True):
+                pass
+
+        async with scheduler.slot("running"):
+            waiter = asyncio.create_task(wait_for_slot())
+            await asyncio.sleep(0)
+            scheduler.withdraw("a")
+        with self.assertRaises(StageWithdrawn):
+            await waiter
+
+    async def test_cancelled_waiter_leaves_the_queue(self):
+        scheduler = StageScheduler(max_in_flight=1, high_water=10)
+
+        async def stage():
+            pass
+
+        async with scheduler.slot("running"):
+            waiter = asyncio.create_task(scheduler.run("a", NEW_TASK, stage))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(scheduler.queue_depth(), 0)
+        self.assertEqual(scheduler.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+
+from agents.step_journal import StageJournal, current_run, journaled_step, run_journaled, step_key
+
+
+class TestStageJournal(unittest.TestCase):
+    def setUp(self):
+        self.journal = StageJournal(":memory:")
+        self.calls = []
+
+    def step(self, run, name):
+        def fn():
+            self.calls.append(name)
+            return f"result of {name}"
+        return run.run("llm", step_key(name), fn)
+
+    def test_step_key_is_stable(self):
+        self.assertEqual(step_key("llm", {"b": 1, "a": 2}), step_key("llm", {"a": 2, "b": 1}))
+        self.assertNotEqual(step_key("llm", "x"), step_key("tool", "x"))
+
+    def test_rerun_replays_completed_steps(self):
+        run = self.journal.open("t1", "architect", "inputs")
+        self.step(run, "one")
+        self.step(run, "two")
+        self.journal.close(run, completed=False)
+
+        run = self.journal.open("t1", "architect", "inputs")
+        self.assertEqual(self.step(run, "one"), "result of one")
+        self.assertEqual(self.step(run, "two"), "result of two")
+        self.step(run, "three")
+        self.assertEqual(self.calls, ["one", "two", "three"])
+        self.assertEqual((run.replayed, run.recorded), (2, 1))
+        self.assertEqual(self.journal.stats()["resumed"], 1)
+
+    def test_divergent_step_drops_the_rest_of_the_recording(self):
+        run = self.journal.open("t1", "architect", "inputs")
+        for name in ("one", "two", "three"):
+            self.step(run, name)
+        self.journal.close(run, completed=False)
+
+        run = self.journal.open("t1", "architect", "inputs")
+        self.step(run, "one")
+        self.step(run, "other")
+        self.step(run, "three")
+        self.assertEqual(self.calls, ["one", "two", "three", "other", "three"])
+        self.journal.close(run, completed=False)
+        self.assertEqual(self.journal.stats()["steps"], 3)
+
+    def test_new_inputs_start_the_stage_over(self):
+        run = self.journal.open("t1", "architect", "inputs")
+        self.step(run, "one")
+        self.journal.close(run, completed=False)
+
+        run = self.journal.open("t1", "architect", "revised inputs")
+        self.step(run, "one")
+        self.assertEqual(self.calls, ["one", "one"])
+
+    def test_completed_run_is_dropped(self):
+        run = self.journal.open("t1", "architect", "inputs")
+        self.step(run, "one")
+        self.journal.close(run, completed=True)
+        self.assertEqual(self.journal.stats()["steps"], 0)
+
+    def test_superseded_run_stops_writing(self):
+        old = self.journal.open("t1", "architect", "inputs")
+        new = self.journal.open("t1", "architect", "inputs")
+        self.step(old, "late")
+        self.journal.close(old, completed=True)
+        self.assertEqual(self.journal.stats()["steps"], 0)
+        self.assertEqual(self.journal.stats()["open_runs"], 1)
+        self.journal.close(new, completed=False)
+
+    def test_forget_drops_every_stage_of_a_task(self):
+        for stage in ("architect", "security"):
+            run = self.journal.open("t1", stage, "inputs")
+            self.step(run, stage)
+            self.journal.close(run, completed=False)
+        run = self.journal.open("t2", "architect", "inputs")
+        self.step(run, "other task")
+        self.journal.close(run, completed=False)
+
+        self.journal.forget("t1")
+        self.assertEqual(self.journal.stats()["steps"], 1)
+        run = self.journal.open("t1", "architect", "inputs")
+        self.assertIsNone(run.replay("llm", step_key("architect")))
+
+    def test_journaled_step_uses_the_current_run(self):
+        self.assertIsNone(current_run())
+        self.assertEqual(journaled_step("tool", ("x",), lambda: "direct"), "direct")
+
+        run = self.journal.open("t1", "architect", "inputs")
+        run_journaled(run, journaled_step, "tool", ("x",), lambda: "recorded")
+        self.journal.close(run, completed=False)
+        self.assertIsNone(current_run())
+
+        run = self.journal.open("t1", "architect", "inputs")
+        self.assertEqual(run_journaled(run, journaled_step, "tool", ("x",), lambda: "live"), "recorded")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from types import SimpleNamespace
+
+from functions.task_store import TaskIndex, task_state
+
+
+def new_task(created_at):
+    """A task the Project Manager has just started on"""
+    return SimpleNamespace(
+        created_at=created_at, updated_at=created_at, current_agent="project_manager",
+        complete=False, error=None, paused=False, awaiting_user_approval=False,
+    )
+
+
+class TestTaskState(unittest.TestCase):
+    def test_each_state_wins_over_the_ones_before_it(self):
+        task = new_task(1.0)
+        self.assertEqual(task_state(task), "running")
+        task.awaiting_user_approval = True
+        self.assertEqual(task_state(task), "awaiting_approval")
+        task.paused = True
+        self.assertEqual(task_state(task), "paused")
+        task.complete = True
+        self.assertEqual(task_state(task), "complete")
+        task.error = "boom"
+        self.assertEqual(task_state(task), "error")
+
+
+class TestTaskIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = TaskIndex()
+        self.tasks = {task_id: new_task(created_at) for task_id, created_at in zip("abcd", (1.0, 2.0, 3.0, 4.0))}
+        self.tasks["b"].current_agent = "architect"
+        self.tasks["b"].awaiting_user_approval = True
+        self.tasks["c"].current_agent = "complete"
+        self.tasks["c"].complete = True
+        self.tasks["d"].current_agent = "architect"
+        for task_id, task in self.tasks.items():
+            self.index.update(task_id, task)
+
+    def ids(self, **filters):
+        return [task_id for _, task_id in self.index.query(**filters)]
+
+    def test_lists_tasks_oldest_first(self):
+        self.assertEqual(self.ids(), ["a", "b", "c", "d"])
+        self.assertEqual(len(self.index), 4)
+
+    def test_filters_by_state_agent_and_approval(self):
+        self.assertEqual(self.ids(status="running"), ["a", "d"])
+        self.assertEqual(self.ids(current_agent="architect"), ["b", "d"])
+        self.assertEqual(self.ids(awaiting_approval=True), ["b"])
+        self.assertEqual(self.ids(awaiting_approval=False), ["a", "c", "d"])
+        self.assertEqual(self.ids(status="running", current_agent="architect"), ["d"])
+
+    def test_filters_by_time(self):
+        self.assertEqual(self.ids(created_after=1.0, created_before=4.0), ["b", "c"])
+        self.tasks["a"].updated_at = 10.0
+        self.index.update("a", self.tasks["a"])
+        self.assertEqual(self.ids(updated_after=5.0), ["a"])
+
+    def test_pages_with_a_cursor(self):
+        first = self.index.query(limit=2)
+        self.assertEqual([task_id for _, task_id in first], ["a", "b"])
+        self.assertEqual(self.ids(after=first[-1], limit=2), ["c", "d"])
+        self.assertEqual(self.ids(status="running", after=(1.0, "a")), ["d"])
+
+    def test_update_moves_a_task_between_entries(self):
+        task = self.tasks["b"]
+        task.awaiting_user_approval = False
+        task.error = "failed"
+        self.index.update("b", task)
+        self.assertEqual(self.ids(awaiting_approval=True), [])
+        self.assertEqual(self.ids(status="error"), ["b"])
+        self.assertEqual(self.ids(status="awaiting_approval"), [])
+        self.assertEqual(self.ids(), ["a", "b", "c", "d"])
+
+    def test_remove(self):
+        self.index.remove("b")
+        self.index.remove("missing")
+        self.assertEqual(self.ids(), ["a", "c", "d"])
+        self.assertEqual(self.ids(current_agent="architect"), ["d"])
+        self.assertEqual(self.ids(awaiting_approval=True), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
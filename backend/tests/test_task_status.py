@@ -0,0 +1,110 @@
+import unittest
+
+from functions.functions import TaskStatus
+from functions.task_fields import MessageLog
+
+
+class TestMessageLog(unittest.TestCase):
+    def test_formats_templates_on_read(self):
+        log = MessageLog()
+        log.add("Starting {} agent...", ("architect",))
+        log.append("plain")
+        self.assertEqual(list(log), ["Starting architect agent...", "plain"])
+        self.assertEqual(log[-1], "plain")
+
+    def test_drops_the_oldest_message_when_full(self):
+        log = MessageLog(maxlen=3)
+        for i in range(5):
+            log.add("message {}", (i,))
+        self.assertEqual(list(log), ["message 2", "message 3", "message 4"])
+        self.assertEqual(log.dropped, 2)
+        self.assertEqual(log.total, 5)
+
+    def test_since_returns_new_messages_and_flags_evicted_ones(self):
+        log = MessageLog(maxlen=3)
+        for i in range(5):
+            log.append(f"m{i}")
+        self.assertEqual(log.since(3), (["m3", "m4"], False, 5))
+        self.assertEqual(log.since(5), ([], False, 5))
+        self.assertEqual(log.since(0), (["m2", "m3", "m4"], True, 5))
+
+    def test_round_trips_through_to_list(self):
+        log = MessageLog()
+        log.add("{} done", ("architect",))
+        log.append("plain")
+        restored = MessageLog()
+        restored.extend_from(log.to_list())
+        self.assertEqual(list(restored), list(log))
+
+    def test_copy_is_independent(self):
+        log = MessageLog(maxlen=2)
+        for i in range(3):
+            log.append(f"m{i}")
+        copied = log.copy()
+        log.append("m3")
+        self.assertEqual(list(copied), ["m1", "m2"])
+        self.assertEqual(copied.total, 3)
+
+
+class TestTaskStatusVersions(unittest.TestCase):
+    def test_status_fields_bump_the_version(self):
+        task = TaskStatus("problem")
+        version = task.version
+        task.progress = 10
+        self.assertEqual(task.version, version + 1)
+        self.assertEqual(task.changed_since(version), ["progress"])
+
+    def test_other_fields_do_not_bump_the_version(self):
+        task = TaskStatus("problem")
+        version = task.version
+        task.final_result = "done"
+        self.assertEqual(task.version, version)
+        self.assertEqual(task.changed_since(version), [])
+
+    def test_agent_fields_and_touch_are_versioned(self):
+        task = TaskStatus("problem")
+        version = task.version
+        task.agent_status["architect"] = "in_progress"
+        task.completed_agents.append("project_manager")
+        task.touch("completed_agents")
+        self.assertEqual(task.version, version + 2)
+        self.assertEqual(task.changed_since(version), ["agent_status", "completed_agents"])
+        self.assertEqual(task.changed_since(version + 1), ["completed_agents"])
+
+    def test_snapshot_is_rebuilt_only_after_a_change(self):
+        task = TaskStatus("problem")
+        builds = []
+
+        def build(version):
+            builds.append(version)
+            return f"body {version}"
+
+        self.assertEqual(task.snapshot(build), (task.version, f"body {task.version}"))
+        task.snapshot(build)
+        task.progress = 50
+        task.snapshot(build)
+        self.assertEqual(len(builds), 2)
+
+    def test_unset_optional_agent_is_a_missing_key(self):
+        task = TaskStatus("problem")
+        self.assertNotIn("programmer", task.agent_outputs)
+        self.assertIsNone(task.agent_status.get("programmer"))
+        self.assertEqual(task.revision_counts["architect"], 0)
+        task.agent_status["programmer"] = "in_progress"
+        self.assertEqual(task.agent_status.copy()["programmer"], "in_progress")
+
+    def test_restored_task_does_not_go_back_in_version(self):
+        task = TaskStatus("problem")
+        task.agent_outputs["architect"] = "design"
+        task.step_messages.add("{} done", ("architect",))
+        task.progress = 30
+        restored = TaskStatus.from_dict(task.to_dict())
+        self.assertGreaterEqual(restored.version, task.version)
+        self.assertEqual(restored.agent_outputs["architect"], "design")
+        self.assertEqual(list(restored.step_messages), ["architect done"])
+        # A client whose cursor predates the restore gets every field again
+        self.assertEqual(restored.changed_since(task.version - 1), list(TaskStatus.STATUS_FIELDS))
+
+
+if __name__ == '__main__':
+    unittest.main()